@@ -7,6 +7,11 @@ Usage:
     python -m data.pipeline --step score             # Score extracted sessions
     python -m data.pipeline --sessions-dir ~/.claude/projects  # Custom source
     python -m data.pipeline --output-dir output/datasets       # Custom output
+    python -m data.pipeline --tokenizer Qwen/Qwen2.5-7B-Instruct  # Exact token budgets
+    python -m data.pipeline --chunk-mode packed --sequence-len 4096  # Packing-aware chunks
+    python -m data.pipeline --prepack                # Also write pre-packed per-role datasets
+    python -m data.pipeline --pretokenize            # Also write pretokenized per-role train/val arrays
+    python -m data.pipeline --compact                # Write *.compact.jsonl with a shared prompt table
 """
 
 from __future__ import annotations
@@ -15,23 +20,42 @@ import argparse
 import json
 import logging
 import sys
+from collections import Counter
 from pathlib import Path
 
 from data.extract.sessions import ExtractedSession, discover_sessions, extract_session
-from data.transform.chat_formatter import append_jsonl, format_sharegpt
-from data.transform.chunker import Chunk, chunk_turns
-from data.transform.deduplicator import deduplicate
-from data.transform.quality_filter import assess_turns
-from data.transform.role_tagger import tag_role
-from data.transform.secret_scrubber import scrub_sample
+from data.transform.chat_formatter import DEFAULT_SYSTEM_PROMPT, ROLE_SYSTEM_PROMPTS, append_jsonl, format_sharegpt
+from data.transform.chunker import DEFAULT_MAX_TOKENS, Chunk, chunk_turns, plan_packed_chunks
+from data.transform.dedup_index import DedupIndex, default_version
+from data.transform.deduplicator import (
+    TURN_FINGERPRINTS_KEY,
+    deduplicate,
+    fingerprint_turns,
+    near_deduplicate,
+    overlap_deduplicate,
+)
+from data.transform.packing import export_packed_by_role, packing_efficiency
+from data.transform.pretokenized import export_pretokenized_by_role
+from data.transform.prompt_table import compact_path_for, write_compact_jsonl
+from data.transform.quality_filter import TurnFeatures
+from data.transform.role_tagger import RoleCache, directory_role_counts, tag_role
+from data.transform.secret_scrubber import SecretScrubber
 from data.transform.session_linker import SessionLinker
 from data.transform.session_scorer import score_session
-from data.transform.tool_normalizer import normalize_turn_content
+from data.transform.token_counter import (
+    CHARS_PER_TOKEN,
+    CHATML_MESSAGE_OVERHEAD,
+    DEFAULT_TOKENIZER,
+    TokenCounter,
+    make_counter,
+)
+from data.transform.tool_normalizer import TRUNCATION_MODES, normalize_turn
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_SESSIONS_DIR = Path.home() / ".claude" / "projects"
 DEFAULT_OUTPUT_DIR = Path("output") / "datasets"
+CHUNK_MODES = ("window", "packed")
 
 
 def session_to_scorer_dict(session: ExtractedSession) -> dict:
@@ -55,10 +79,16 @@ def session_to_scorer_dict(session: ExtractedSession) -> dict:
     return result
 
 
-def extract_all(sessions_dir: Path) -> list[ExtractedSession]:
-    """Extract all Gas Town sessions from the Claude projects directory."""
+def extract_all(sessions_dir: Path, role_cache: RoleCache | None = None) -> list[ExtractedSession]:
+    """Extract all Gas Town sessions from the Claude projects directory.
+
+    With a role_cache, the role of every discovered project directory is
+    resolved once up front.
+    """
     session_files = discover_sessions(sessions_dir)
     logger.info("Discovered %d session files", len(session_files))
+    if role_cache is not None:
+        role_cache.add_paths(session_files)
 
     sessions: list[ExtractedSession] = []
     for i, path in enumerate(session_files):
@@ -73,10 +103,31 @@ def extract_all(sessions_dir: Path) -> list[ExtractedSession]:
     return sessions
 
 
-def transform_session(session: ExtractedSession) -> list[dict]:
+def transform_session(
+    session: ExtractedSession,
+    token_counter: TokenCounter | None = None,
+    chunk_mode: str = "window",
+    sequence_len: int = DEFAULT_MAX_TOKENS,
+    turn_fingerprints: bool = False,
+    scrubber: SecretScrubber | None = None,
+    truncation: str = "chars",
+    role_cache: RoleCache | None = None,
+) -> list[dict]:
     """Transform an extracted session into training samples.
 
-    Pipeline: score → role tag → tool normalize → chunk → quality filter → format
+    Pipeline: score → role tag → tool normalize → scrub → chunk → quality filter → format
+
+    With a token_counter, chunks are budgeted against real tokens.
+    chunk_mode="packed" sizes chunks to fill sequence_len (see
+    chunker.plan_packed_chunks) instead of using fixed turn windows.
+    turn_fingerprints attaches per-assistant-turn fingerprints for
+    deduplicator.overlap_deduplicate, hashing each turn once per session.
+    With a scrubber, secrets are scrubbed once per unique turn (and once
+    per role for the system prompt) before chunking, and per-sample hits
+    are recorded in scrubber.emitted_hits. truncation="smart" truncates
+    oversized tool results to a token budget keeping errors, tracebacks
+    and diff hunks (see tool_normalizer.smart_truncate). With a
+    role_cache, the role comes from its per-directory map.
     """
     # 1. Score the session for quality signal (outcome_score).
     scorer_dict = session_to_scorer_dict(session)
@@ -89,22 +140,53 @@ def transform_session(session: ExtractedSession) -> list[dict]:
         if turn.role == "user":
             first_user_content = turn.content
             break
-    role = tag_role(Path(session.source_path), first_user_content)
+    if role_cache is not None:
+        role = role_cache.tag(Path(session.source_path), first_user_content)
+    else:
+        role = tag_role(Path(session.source_path), first_user_content)
 
     # 3. Normalize tool results in each turn.
     for turn in session.turns:
-        turn.content = normalize_turn_content(turn.content)
+        normalize_turn(turn, truncation=truncation, token_counter=token_counter)
+
+    # 3b. Scrub secrets once per unique turn, before chunks duplicate them.
+    system_prompt = ROLE_SYSTEM_PROMPTS.get(role, DEFAULT_SYSTEM_PROMPT)
+    turn_hits: dict[int, Counter] = {}
+    system_hits: Counter = Counter()
+    if scrubber is not None:
+        turn_hits = scrubber.scrub_turns(session.turns)
+        system_prompt, system_hits = scrubber.scrub(system_prompt)
 
     # 4. Chunk long sessions.
-    chunks = chunk_turns(session.turns)
+    counter = token_counter or make_counter(None)
+    if chunk_mode == "packed":
+        chunks = plan_packed_chunks(
+            session.turns,
+            counter,
+            sequence_len=sequence_len,
+            reserved_tokens=counter.count(system_prompt),
+        )
+    else:
+        # Windows budget the whole sample: system prompt and chatml framing too.
+        chunks = chunk_turns(
+            session.turns,
+            token_counter=token_counter,
+            max_tokens=sequence_len,
+            max_chars=sequence_len * CHARS_PER_TOKEN,
+            reserved_tokens=counter.count(system_prompt),
+            turn_overhead=CHATML_MESSAGE_OVERHEAD,
+        )
 
     # 5. Quality filter and format each chunk.
+    features = TurnFeatures(session.turns)
     samples = []
+    fingerprint_memo: dict = {}
     for chunk in chunks:
-        quality = assess_turns(chunk.turns, outcome_score)
+        quality = features.assess(chunk.turns, outcome_score)
         if not quality.keep:
             continue
 
+        kept_turns: list = []
         sample = format_sharegpt(
             turns=chunk.turns,
             role=role,
@@ -113,15 +195,27 @@ def transform_session(session: ExtractedSession) -> list[dict]:
             quality_score=quality.score,
             runtime_type=session.runtime_type,
             mcp_servers=session.mcp_servers,
+            system_prompt=system_prompt,
+            kept_turns=kept_turns,
         )
 
         # Add outcome_score to sample metadata.
         sample["metadata"]["outcome_score"] = outcome_score
+        if turn_fingerprints:
+            sample["metadata"][TURN_FINGERPRINTS_KEY] = fingerprint_turns(
+                kept_turns, fingerprint_memo, token_counter.count if token_counter else None,
+            )
 
         # Only keep samples with at least one human and one gpt message.
         roles_present = {msg["from"] for msg in sample["conversations"]}
         if "human" in roles_present and "gpt" in roles_present:
             samples.append(sample)
+            if scrubber is not None:
+                scrubber.record(system_hits)
+                # Only turns that made it into the sample count as emitted.
+                for turn in kept_turns:
+                    if id(turn) in turn_hits:
+                        scrubber.record(turn_hits[id(turn)])
 
     return samples
 
@@ -174,9 +268,39 @@ def run_pipeline(
     sessions_dir: Path = DEFAULT_SESSIONS_DIR,
     output_dir: Path = DEFAULT_OUTPUT_DIR,
     step: str = "all",
+    tokenizer: str | None = None,
+    chunk_mode: str = "window",
+    sequence_len: int = DEFAULT_MAX_TOKENS,
+    prepack: bool = False,
+    pretokenize: bool = False,
+    compact: bool = False,
+    near_dedup: float | None = None,
+    truncation: str = "chars",
+    overlap_dedup: float | None = None,
+    dedup_index: Path | None = None,
+    dataset_version: str | None = None,
+    since_version: str | None = None,
 ) -> dict:
     """Run the full pipeline or a specific step.
 
+    tokenizer names a HuggingFace tokenizer for exact token budgets;
+    None keeps the chars/4 estimate. chunk_mode and sequence_len select
+    the chunk planner; packing efficiency per role is reported either way.
+    prepack additionally writes tokenized, bin-packed per-role datasets to
+    output_dir/packed (see data.transform.packing); pretokenize writes
+    per-role train/val token arrays to output_dir/pretokenized (see
+    data.transform.pretokenized). compact writes *.compact.jsonl files whose
+    system prompts live in a sidecar prompt table (see
+    data.transform.prompt_table). near_dedup is a Jaccard threshold for
+    MinHash near-duplicate removal after exact dedup (None disables it).
+    truncation selects tool-result truncation ("chars" or token-aware
+    "smart"). overlap_dedup is a coverage threshold: chunks whose assistant tokens
+    are already covered by kept chunks at or above it are dropped.
+    dedup_index names a persistent index (see data.transform.dedup_index):
+    samples shipped in an earlier version are dropped, or with
+    since_version only samples first shipped after that version are kept;
+    this run registers under dataset_version (default: run timestamp).
+
     Returns statistics about the pipeline run.
     """
     output_dir.mkdir(parents=True, exist_ok=True)
@@ -188,7 +312,8 @@ def run_pipeline(
     
     if step in ("all", "extract", "transform", "score"):
         # Always extract first - we need full session data with turns
-        sessions = extract_all(sessions_dir)
+        role_cache = RoleCache()
+        sessions = extract_all(sessions_dir, role_cache)
         stats["sessions_extracted"] = len(sessions)
         stats["total_turns"] = sum(len(s.turns) for s in sessions)
 
@@ -237,9 +362,15 @@ def run_pipeline(
     if step in ("all", "transform"):
         all_samples: list[dict] = []
         role_counts: dict[str, int] = {}
+        token_counter = make_counter(tokenizer) if tokenizer else None
+        scrubber = SecretScrubber()
 
         for session in sessions:
-            samples = transform_session(session)
+            samples = transform_session(
+                session, token_counter, chunk_mode, sequence_len,
+                turn_fingerprints=overlap_dedup is not None, scrubber=scrubber, truncation=truncation,
+                role_cache=role_cache,
+            )
             for sample in samples:
                 role = sample.get("metadata", {}).get("role", "unknown")
                 role_counts[role] = role_counts.get(role, 0) + 1
@@ -247,14 +378,21 @@ def run_pipeline(
 
         logger.info("Generated %d samples before dedup", len(all_samples))
 
-        # Scrub secrets from all samples.
-        total_secrets = 0
-        for sample in all_samples:
-            _, count = scrub_sample(sample)
-            total_secrets += count
+        # Per-directory role map for data.validate.stats/reporter --role-map.
+        role_map_path = output_dir / "role_map.json"
+        role_cache.save(role_map_path)
+        stats["role_map_path"] = str(role_map_path)
+        stats["directory_roles"] = directory_role_counts(role_cache.role_map())
+        stats["role_cache"] = role_cache.stats()
+
+        # Secrets were scrubbed per unique turn in transform_session; totals
+        # count every emitted copy, as scrubbing each sample would.
+        total_secrets = sum(scrubber.emitted_hits.values())
         if total_secrets:
             logger.info("Scrubbed %d secrets from training data", total_secrets)
         stats["secrets_scrubbed"] = total_secrets
+        stats["secrets_by_pattern"] = dict(scrubber.emitted_hits.most_common())
+        stats["scrub_cache"] = scrubber.stats()
 
         # Deduplicate.
         before_dedup = len(all_samples)
@@ -264,22 +402,40 @@ def run_pipeline(
         stats["duplicates_removed"] = before_dedup - len(all_samples)
         stats["role_distribution"] = role_counts
 
+        if overlap_dedup is not None:
+            before_overlap = len(all_samples)
+            all_samples, overlap_stats = overlap_deduplicate(all_samples, threshold=overlap_dedup)
+            stats["overlap_duplicates_removed"] = before_overlap - len(all_samples)
+            stats["overlap_dedup"] = overlap_stats
+            logger.info("Removed %d chunks with >= %.0f%% assistant overlap",
+                        stats["overlap_duplicates_removed"], overlap_dedup * 100)
+
+        if near_dedup is not None:
+            before_near = len(all_samples)
+            all_samples, near_stats = near_deduplicate(all_samples, threshold=near_dedup)
+            stats["near_duplicates_removed"] = before_near - len(all_samples)
+            stats["near_dedup"] = near_stats
+            logger.info("Removed %d near-duplicates at threshold %.2f", stats["near_duplicates_removed"], near_dedup)
+
+        if dedup_index is not None:
+            index = DedupIndex(dedup_index)
+            version = dataset_version or default_version("pipeline")
+            before_index = len(all_samples)
+            all_samples = index.filter_new(all_samples, version, since=since_version)
+            index.flush()
+            stats["dataset_version"] = version
+            stats["previously_shipped_removed"] = before_index - len(all_samples)
+            logger.info("Dedup index %s: kept %d/%d samples new in %s", dedup_index, len(all_samples), before_index,
+                        f"versions after {since_version}" if since_version else version)
+
         # Split into train/val (95/5).
         val_size = max(1, len(all_samples) // 20)
         val_samples = all_samples[:val_size]
         train_samples = all_samples[val_size:]
 
         # Write output.
-        train_path = output_dir / "gastown_train.jsonl"
-        val_path = output_dir / "gastown_val.jsonl"
-
-        with open(train_path, "w") as f:
-            for sample in train_samples:
-                append_jsonl(sample, f)
-
-        with open(val_path, "w") as f:
-            for sample in val_samples:
-                append_jsonl(sample, f)
+        train_path = _write_dataset(train_samples, output_dir / "gastown_train.jsonl", compact)
+        val_path = _write_dataset(val_samples, output_dir / "gastown_val.jsonl", compact)
 
         stats["train_samples"] = len(train_samples)
         stats["val_samples"] = len(val_samples)
@@ -301,23 +457,78 @@ def run_pipeline(
             by_role.setdefault(role, []).append(sample)
 
         for role, samples in by_role.items():
-            role_path = output_dir / f"{role}_train.jsonl"
-            with open(role_path, "w") as f:
-                for sample in samples:
-                    append_jsonl(sample, f)
+            _write_dataset(samples, output_dir / f"{role}_train.jsonl", compact)
             role_files[role] = len(samples)
 
         stats["per_role_files"] = role_files
         logger.info("Wrote per-role datasets: %s", ", ".join(f"{r}={c}" for r, c in sorted(role_files.items())))
 
+        # Expected sample_packing efficiency (useful tokens / total slots) per role.
+        counter = token_counter or make_counter(None)
+        packing: dict[str, float] = {}
+        for role, samples in by_role.items():
+            lengths = [counter.count_conversation(s["conversations"]) for s in samples]
+            packing[role] = packing_efficiency(lengths, sequence_len)["efficiency"]
+        stats["packing_efficiency"] = packing
+        logger.info("Packing efficiency at sequence_len=%d: %s", sequence_len,
+                    ", ".join(f"{r}={e:.1%}" for r, e in sorted(packing.items())))
+
+        if prepack:
+            packed = export_packed_by_role(
+                train_samples,
+                output_dir / "packed",
+                tokenizer_name=tokenizer or DEFAULT_TOKENIZER,
+                sequence_len=sequence_len,
+            )
+            stats["prepacked_rows"] = {role: s["bins"] for role, s in packed.items()}
+
+        if pretokenize:
+            pretok_dir = output_dir / "pretokenized"
+            tokenizer_name = tokenizer or DEFAULT_TOKENIZER
+            train_meta = export_pretokenized_by_role(train_samples, pretok_dir, "train", tokenizer_name)
+            export_pretokenized_by_role(val_samples, pretok_dir, "val", tokenizer_name)
+            stats["pretokenized_tokens"] = {role: m["tokens"] for role, m in train_meta.items()}
+
+        if token_counter is not None:
+            token_counter.save()
+            stats["token_counts"] = token_counter.stats()
+
     return stats
 
 
+def _write_dataset(samples: list[dict], path: Path, compact: bool = False) -> Path:
+    """Write samples as plain sharegpt JSONL, or compact form next to it. Returns the path written."""
+    if compact:
+        path = compact_path_for(path)
+        write_compact_jsonl(samples, path)
+        return path
+
+    with open(path, "w") as f:
+        for sample in samples:
+            append_jsonl(sample, f)
+    return path
+
+
 def main():
     parser = argparse.ArgumentParser(description="Gas Town LoRA training data pipeline")
     parser.add_argument("--sessions-dir", type=Path, default=DEFAULT_SESSIONS_DIR, help="Claude projects directory")
     parser.add_argument("--output-dir", type=Path, default=DEFAULT_OUTPUT_DIR, help="Output directory for datasets")
     parser.add_argument("--step", choices=["all", "extract", "transform", "score"], default="all", help="Pipeline step to run")
+    parser.add_argument("--tokenizer", default=None, help="HuggingFace tokenizer for exact token budgets (default: chars/4)")
+    parser.add_argument("--chunk-mode", choices=CHUNK_MODES, default="window", help="Chunk planner: fixed turn windows or packing-aware")
+    parser.add_argument("--sequence-len", type=int, default=DEFAULT_MAX_TOKENS, help="Axolotl sequence_len for packed chunks and packing report")
+    parser.add_argument("--prepack", action="store_true", help="Write tokenized, bin-packed per-role datasets to <output-dir>/packed")
+    parser.add_argument("--pretokenize", action="store_true", help="Write pretokenized per-role train/val arrays to <output-dir>/pretokenized")
+    parser.add_argument("--compact", action="store_true", help="Write *.compact.jsonl with system prompts in a sidecar table")
+    parser.add_argument("--near-dedup", type=float, default=None, metavar="THRESHOLD",
+                        help="Also drop near-duplicates above this Jaccard similarity (e.g. 0.85; needs numpy)")
+    parser.add_argument("--truncation", choices=TRUNCATION_MODES, default="chars",
+                        help="Tool-result truncation: fixed head/tail chars or token-aware smart truncation")
+    parser.add_argument("--overlap-dedup", type=float, default=None, metavar="COVERAGE",
+                        help="Drop chunks whose assistant tokens are already covered by kept chunks at this share (e.g. 0.8)")
+    parser.add_argument("--dedup-index", type=Path, default=None, help="Persistent dedup index shared across runs (e.g. output/dedup_index.bin)")
+    parser.add_argument("--dataset-version", default=None, help="Version label recorded in the dedup index (default: run timestamp)")
+    parser.add_argument("--since", default=None, help="With --dedup-index, emit only samples first shipped after this version")
     parser.add_argument("--verbose", "-v", action="store_true", help="Enable debug logging")
     args = parser.parse_args()
 
@@ -331,6 +542,18 @@ def main():
         sessions_dir=args.sessions_dir,
         output_dir=args.output_dir,
         step=args.step,
+        tokenizer=args.tokenizer,
+        chunk_mode=args.chunk_mode,
+        sequence_len=args.sequence_len,
+        prepack=args.prepack,
+        pretokenize=args.pretokenize,
+        compact=args.compact,
+        near_dedup=args.near_dedup,
+        overlap_dedup=args.overlap_dedup,
+        truncation=args.truncation,
+        dedup_index=args.dedup_index,
+        dataset_version=args.dataset_version,
+        since_version=args.since,
     )
 
     print("\n--- Pipeline Statistics ---")
@@ -23,6 +23,7 @@ from pathlib import Path
 from typing import TextIO
 
 from data.extract.sessions import Turn
+from data.transform.prompt_table import write_compact_jsonl
 
 
 # System prompts per role — loaded from gt_prime_prompts.json (captured from
@@ -54,27 +55,43 @@ def format_sharegpt(
     source: str = "claude-session",
     runtime_type: str = "unknown",
     mcp_servers: list[str] | None = None,
+    system_prompt: str | None = None,
+    kept_turns: list[Turn] | None = None,
 ) -> dict:
     """Format a list of turns into Axolotl's sharegpt format.
 
+    system_prompt overrides the role's prompt (e.g. an already-scrubbed copy).
+    If kept_turns is given, the turns whose content ends up in the sample
+    are appended to it (turns dropped to keep alternation are not).
+
     Returns a dict ready for JSON serialization.
     """
-    system_prompt = ROLE_SYSTEM_PROMPTS.get(role, DEFAULT_SYSTEM_PROMPT)
+    if system_prompt is None:
+        system_prompt = ROLE_SYSTEM_PROMPTS.get(role, DEFAULT_SYSTEM_PROMPT)
 
     conversations = [{"from": "system", "value": system_prompt}]
+    # id(message) → turns merged into it.
+    sources: dict[int, list[Turn]] = {}
 
     for turn in turns:
         if turn.role == "user":
             conversations.append({"from": "human", "value": turn.content})
         elif turn.role == "assistant":
             conversations.append({"from": "gpt", "value": turn.content})
+        else:
+            continue
+        sources[id(conversations[-1])] = [turn]
 
     # Merge consecutive same-role messages (can happen after filtering).
-    conversations = _merge_consecutive(conversations)
+    conversations = _merge_consecutive(conversations, sources)
 
     # Ensure conversation alternates human/gpt after system.
     conversations = _ensure_alternating(conversations)
 
+    if kept_turns is not None:
+        for msg in conversations:
+            kept_turns.extend(sources.get(id(msg), ()))
+
     return {
         "conversations": conversations,
         "metadata": {
@@ -89,8 +106,15 @@ def format_sharegpt(
     }
 
 
-def write_jsonl(samples: list[dict], output_path: Path) -> int:
-    """Write samples to a JSONL file. Returns count written."""
+def write_jsonl(samples: list[dict], output_path: Path, compact: bool = False) -> int:
+    """Write samples to a JSONL file. Returns count written.
+
+    With compact=True, system prompts are stored once in a sidecar prompt
+    table (see data.transform.prompt_table).
+    """
+    if compact:
+        return write_compact_jsonl(samples, output_path)
+
     output_path.parent.mkdir(parents=True, exist_ok=True)
     count = 0
     with open(output_path, "w", encoding="utf-8") as f:
@@ -105,8 +129,11 @@ def append_jsonl(sample: dict, f: TextIO) -> None:
     f.write(json.dumps(sample, ensure_ascii=False) + "\n")
 
 
-def _merge_consecutive(conversations: list[dict]) -> list[dict]:
-    """Merge consecutive messages from the same role."""
+def _merge_consecutive(conversations: list[dict], sources: dict[int, list] | None = None) -> list[dict]:
+    """Merge consecutive messages from the same role.
+
+    sources (id(message) → source turns) is updated to follow the merges.
+    """
     if not conversations:
         return []
 
@@ -114,6 +141,8 @@ def _merge_consecutive(conversations: list[dict]) -> list[dict]:
     for msg in conversations[1:]:
         if msg["from"] == merged[-1]["from"]:
             merged[-1]["value"] += "\n" + msg["value"]
+            if sources is not None:
+                sources.setdefault(id(merged[-1]), []).extend(sources.pop(id(msg), ()))
         else:
             merged.append(msg)
     return merged
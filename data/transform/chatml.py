@@ -0,0 +1,67 @@
+"""Render sharegpt conversations with the chatml template and tokenize them.
+
+Mirrors what Axolotl does for `type: sharegpt, conversation: chatml`:
+
+    <|im_start|>system\n{system}<|im_end|>\n
+    <|im_start|>user\n{human}<|im_end|>\n
+    <|im_start|>assistant\n{gpt}<|im_end|>\n
+
+Only assistant content (plus its closing <|im_end|>) is trained on; every
+other token gets the IGNORE_INDEX label. Segments of many conversations are
+encoded in a single tokenizer call.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+# Label value ignored by the cross-entropy loss.
+IGNORE_INDEX = -100
+
+# sharegpt "from" → chatml role.
+CHATML_ROLES = {"system": "system", "human": "user", "gpt": "assistant"}
+
+# Conversations encoded per tokenizer call.
+DEFAULT_ENCODE_BATCH = 256
+
+
+def chatml_segments(conversations: list[dict]) -> list[tuple[str, bool]]:
+    """Split a conversation into (text, trainable) chatml segments."""
+    segments: list[tuple[str, bool]] = []
+    for msg in conversations:
+        role = CHATML_ROLES.get(msg.get("from", ""), "user")
+        value = msg.get("value", "")
+        if role == "assistant":
+            segments.append(("<|im_start|>assistant\n", False))
+            segments.append((f"{value}<|im_end|>", True))
+            segments.append(("\n", False))
+        else:
+            segments.append((f"<|im_start|>{role}\n{value}<|im_end|>\n", False))
+    return segments
+
+
+def encode_conversations(
+    conversations_list: list[list[dict]],
+    tokenizer: Any,
+    batch_size: int = DEFAULT_ENCODE_BATCH,
+) -> list[tuple[list[int], list[int]]]:
+    """Tokenize conversations into (input_ids, labels) pairs."""
+    results: list[tuple[list[int], list[int]]] = []
+
+    for i in range(0, len(conversations_list), batch_size):
+        batch = [chatml_segments(c) for c in conversations_list[i:i + batch_size]]
+        texts = [text for segments in batch for text, _ in segments]
+        encoded = tokenizer(texts, add_special_tokens=False)["input_ids"] if texts else []
+
+        pos = 0
+        for segments in batch:
+            input_ids: list[int] = []
+            labels: list[int] = []
+            for _, trainable in segments:
+                ids = list(encoded[pos])
+                pos += 1
+                input_ids.extend(ids)
+                labels.extend(ids if trainable else [IGNORE_INDEX] * len(ids))
+            results.append((input_ids, labels))
+
+    return results
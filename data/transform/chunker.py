@@ -5,7 +5,12 @@ Strategy:
   - 50% overlap between windows for context continuity
   - Never split mid tool-call (if tool_use is in window, tool_result must be too)
   - Always prefix each chunk with the role system prompt
-  - Max token budget per chunk (approximate, using character count / 4 as estimate)
+  - Max token budget per chunk (approximate, using character count / 4 as
+    estimate, or exact when a TokenCounter is passed)
+
+plan_packed_chunks is an alternative planner for sample_packing: instead of
+a fixed turn count it grows each window until it fills sequence_len (minus
+the system prompt) as tightly as possible, so packed bins carry less padding.
 """
 
 from __future__ import annotations
@@ -13,11 +18,14 @@ from __future__ import annotations
 from dataclasses import dataclass, field
 
 from data.extract.sessions import Turn
+from data.transform.token_counter import CHARS_PER_TOKEN, CHATML_MESSAGE_OVERHEAD, TokenCounter
 
 # Default parameters.
 DEFAULT_WINDOW_TURNS = 16  # 8 user-assistant pairs
 DEFAULT_STRIDE = 8  # 50% overlap
 DEFAULT_MAX_CHARS = 16384  # ~4096 tokens at ~4 chars/token
+DEFAULT_MAX_TOKENS = 4096  # sequence_len in configs/base.yml
+DEFAULT_PACKED_OVERLAP = 0.5  # Fraction of turns shared by consecutive packed chunks
 
 
 @dataclass
@@ -35,15 +43,37 @@ def chunk_turns(
     window_size: int = DEFAULT_WINDOW_TURNS,
     stride: int = DEFAULT_STRIDE,
     max_chars: int = DEFAULT_MAX_CHARS,
+    token_counter: TokenCounter | None = None,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    reserved_tokens: int = 0,
+    turn_overhead: int = 0,
 ) -> list[Chunk]:
     """Split a list of turns into overlapping chunks.
 
     Each chunk contains up to window_size turns, with stride turns
     between chunk starts. Chunks are adjusted to respect tool-call
-    boundaries and max character limits.
+    boundaries and max character limits. When token_counter is given,
+    chunks are budgeted against max_tokens real tokens instead of
+    max_chars (all turns of the session are counted in one batch).
+
+    reserved_tokens (the system prompt) and turn_overhead (chatml framing
+    per message, system message included) come out of the budget, as in
+    plan_packed_chunks; in character mode they count CHARS_PER_TOKEN chars
+    per token. Sessions of at most window_size turns are trimmed as well.
     """
+    token_counts: list[int] | None = None
+    if token_counter is not None:
+        token_counts = [n + turn_overhead for n in token_counter.count_many([t.content for t in turns])]
+        token_budget = max_tokens - reserved_tokens - turn_overhead
+    char_budget = max_chars - (reserved_tokens + turn_overhead) * CHARS_PER_TOKEN
+    overhead_chars = turn_overhead * CHARS_PER_TOKEN
+
     if len(turns) <= window_size:
-        return [Chunk(turns=turns, chunk_index=0, total_chunks=1)]
+        if token_counts is not None:
+            trimmed = _trim_to_token_budget(turns, token_counts, token_budget)
+        else:
+            trimmed = _trim_to_char_budget(turns, char_budget, overhead_chars)
+        return [Chunk(turns=trimmed, chunk_index=0, total_chunks=1)]
 
     chunks: list[Chunk] = []
     start = 0
@@ -54,9 +84,12 @@ def chunk_turns(
         # Adjust end to not split mid tool-call.
         end = _adjust_for_tool_boundary(turns, end)
 
-        # Trim from end if over character budget.
+        # Trim from end if over character (or token) budget.
         chunk_turns_list = turns[start:end]
-        chunk_turns_list = _trim_to_char_budget(chunk_turns_list, max_chars)
+        if token_counts is not None:
+            chunk_turns_list = _trim_to_token_budget(chunk_turns_list, token_counts[start:end], token_budget)
+        else:
+            chunk_turns_list = _trim_to_char_budget(chunk_turns_list, char_budget, overhead_chars)
 
         if len(chunk_turns_list) >= 2:  # Minimum viable chunk.
             chunks.append(Chunk(turns=chunk_turns_list, chunk_index=len(chunks)))
@@ -75,6 +108,65 @@ def chunk_turns(
     return chunks
 
 
+def plan_packed_chunks(
+    turns: list[Turn],
+    token_counter: TokenCounter,
+    sequence_len: int = DEFAULT_MAX_TOKENS,
+    reserved_tokens: int = 0,
+    overlap: float = DEFAULT_PACKED_OVERLAP,
+) -> list[Chunk]:
+    """Split turns into chunks sized to fill sequence_len.
+
+    Each window grows turn by turn while the rendered sample (turns plus
+    chatml framing plus reserved_tokens for the system prompt) still fits
+    in sequence_len. Windows never end between a tool_call and its
+    tool_result. Consecutive windows share about `overlap` of their turns.
+    A single turn too large for the budget still yields a minimum
+    two-turn chunk (Axolotl truncates it).
+    """
+    counts = token_counter.count_many([t.content for t in turns])
+    costs = [n + CHATML_MESSAGE_OVERHEAD for n in counts]
+    budget = sequence_len - reserved_tokens - CHATML_MESSAGE_OVERHEAD
+
+    if sum(costs) <= budget:
+        return [Chunk(turns=turns, chunk_index=0, total_chunks=1)] if turns else []
+
+    chunks: list[Chunk] = []
+    start = 0
+
+    while start < len(turns):
+        end = start
+        used = 0
+        while end < len(turns) and used + costs[end] <= budget:
+            used += costs[end]
+            end += 1
+
+        # Back off rather than split a tool_call from its tool_result.
+        if end < len(turns) and end - start > 2 and _adjust_for_tool_boundary(turns, end) != end:
+            end -= 1
+
+        if end - start < 2:
+            end = _adjust_for_tool_boundary(turns, min(start + 2, len(turns)))
+
+        if end - start >= 2:
+            chunks.append(Chunk(
+                turns=turns[start:end],
+                chunk_index=len(chunks),
+                metadata={"planned_tokens": sum(costs[start:end]) + reserved_tokens + CHATML_MESSAGE_OVERHEAD},
+            ))
+
+        if end >= len(turns):
+            break
+        start += max(1, int((end - start) * (1 - overlap)))
+        if len(turns) - start < 2:
+            break
+
+    for chunk in chunks:
+        chunk.total_chunks = len(chunks)
+
+    return chunks
+
+
 def _adjust_for_tool_boundary(turns: list[Turn], end: int) -> int:
     """Adjust the end index to not split between tool_use and tool_result.
 
@@ -93,13 +185,31 @@ def _adjust_for_tool_boundary(turns: list[Turn], end: int) -> int:
     return end
 
 
-def _trim_to_char_budget(turns: list[Turn], max_chars: int) -> list[Turn]:
-    """Remove turns from the end until under the character budget."""
-    total = sum(len(t.content) for t in turns)
+def _trim_to_char_budget(turns: list[Turn], max_chars: int, overhead_chars: int = 0) -> list[Turn]:
+    """Remove turns from the end until under the character budget.
+
+    Each turn costs its content plus overhead_chars.
+    """
+    total = sum(len(t.content) + overhead_chars for t in turns)
     result = list(turns)
 
     while total > max_chars and len(result) > 2:
         removed = result.pop()
-        total -= len(removed.content)
+        total -= len(removed.content) + overhead_chars
 
     return result
+
+
+def _trim_to_token_budget(turns: list[Turn], token_counts: list[int], max_tokens: int) -> list[Turn]:
+    """Remove turns from the end until under the token budget.
+
+    token_counts[i] is the precomputed token count of turns[i].
+    """
+    total = sum(token_counts)
+    keep = len(turns)
+
+    while total > max_tokens and keep > 2:
+        keep -= 1
+        total -= token_counts[keep]
+
+    return list(turns[:keep])
@@ -0,0 +1,206 @@
+"""Persistent, append-only dedup index shared across pipeline runs.
+
+deduplicate() only sees the samples of the current run. The dedup index
+remembers every assistant-content hash (see deduplicator.content_hash)
+that has been emitted by any producer — data.pipeline, rejection_to_lora,
+build_v2/v3_dataset — together with the dataset version that first
+shipped it, so later runs can drop samples that already shipped or emit
+only what is new since a given version.
+
+On disk the index is two files:
+
+    output/dedup_index.bin             12-byte records: <u64 hash, u32 version ordinal>
+    output/dedup_index.versions.json   ["2026-10-01", "2026-10-08", ...]
+
+Records are only ever appended, so concurrent producers never rewrite
+each other's entries. A new version label is registered under an
+exclusive lock on dedup_index.versions.lock: the label list is re-read,
+extended and atomically replaced, so producers that start concurrently
+agree on every label's ordinal (the lock needs fcntl; elsewhere it is
+skipped). Without an explicit label each run registers its own version
+(timestamp + producer), so same-day producers dedup against each other.
+Loading reads the whole record file into a dict (hash → version ordinal);
+membership checks are then O(1) and no earlier dataset has to be re-read.
+
+Usage:
+    python -m data.transform.dedup_index stats
+    python -m data.transform.dedup_index filter output/datasets/witness_train.jsonl --version 2026-10-18 --since 2026-10-01 -o new.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import os
+import struct
+import sys
+from pathlib import Path
+
+from data.transform.deduplicator import content_hash
+
+try:
+    import fcntl
+except ImportError:  # Not POSIX: version registration runs unlocked.
+    fcntl = None
+
+DEFAULT_INDEX_PATH = Path("output") / "dedup_index.bin"
+
+_RECORD = struct.Struct("<QI")
+
+
+def default_version(producer: str) -> str:
+    """Default dataset version label: this run's start time and producer.
+
+    Unique per run, so producers building on the same day do not share a
+    version and each still drops what the others already shipped.
+    """
+    return f"{datetime.datetime.now().strftime('%Y-%m-%dT%H%M%S')}-{producer}"
+
+
+class DedupIndex:
+    """Content-hash → first-shipped-version map backed by an append-only file."""
+
+    def __init__(self, path: Path = DEFAULT_INDEX_PATH):
+        self.path = Path(path)
+        self.versions_path = self.path.with_suffix(".versions.json")
+        self.versions: list[str] = []
+        self._first_seen: dict[int, int] = {}
+        self._pending: list[tuple[int, int]] = []
+        self._load()
+
+    def _load(self) -> None:
+        if self.versions_path.exists():
+            with open(self.versions_path, "r") as f:
+                self.versions = json.load(f)
+        if self.path.exists():
+            data = self.path.read_bytes()
+            # Ignore a torn trailing record from an interrupted append.
+            usable = len(data) - len(data) % _RECORD.size
+            for h, ordinal in _RECORD.iter_unpack(data[:usable]):
+                self._first_seen.setdefault(h, ordinal)
+
+    def __len__(self) -> int:
+        return len(self._first_seen)
+
+    def __contains__(self, digest: str) -> bool:
+        return int(digest, 16) in self._first_seen
+
+    def version_ordinal(self, version: str, create: bool = False) -> int:
+        """Position of a version label; registers it when create is set."""
+        if version in self.versions:
+            return self.versions.index(version)
+        if not create:
+            raise ValueError(f"Unknown dataset version {version!r}; known: {', '.join(self.versions) or 'none'}")
+        self.versions_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.versions_path.with_suffix(".lock"), "w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            # Another producer may have registered versions since we loaded.
+            if self.versions_path.exists():
+                with open(self.versions_path, "r") as f:
+                    self.versions = json.load(f)
+            if version not in self.versions:
+                self.versions.append(version)
+                tmp = self.versions_path.with_suffix(".json.tmp")
+                with open(tmp, "w") as f:
+                    json.dump(self.versions, f, indent=1)
+                os.replace(tmp, self.versions_path)
+        return self.versions.index(version)
+
+    def first_seen(self, digest: str) -> str | None:
+        """Version that first shipped the content hash, or None if never seen."""
+        ordinal = self._first_seen.get(int(digest, 16))
+        return None if ordinal is None else self.versions[ordinal]
+
+    def add(self, digest: str, version: str) -> bool:
+        """Record a hash under version. Returns True if it was new."""
+        h = int(digest, 16)
+        if h in self._first_seen:
+            return False
+        ordinal = self.version_ordinal(version, create=True)
+        self._first_seen[h] = ordinal
+        self._pending.append((h, ordinal))
+        return True
+
+    def filter_new(self, samples: list[dict], version: str, since: str | None = None) -> list[dict]:
+        """Register samples under version and return those not shipped before.
+
+        By default keeps samples first seen in this version (re-running the
+        same version is idempotent). With since, keeps samples first seen
+        in any version after since, for incremental fine-tunes. Duplicates
+        within samples are dropped as well.
+        """
+        since_ordinal = self.version_ordinal(since) if since is not None else None
+        current = self.version_ordinal(version, create=True)
+        cutoff = since_ordinal if since_ordinal is not None else current - 1
+
+        kept: list[dict] = []
+        emitted: set[int] = set()
+        for sample in samples:
+            digest = content_hash(sample.get("conversations", []))
+            h = int(digest, 16)
+            self.add(digest, version)
+            if self._first_seen[h] > cutoff and h not in emitted:
+                emitted.add(h)
+                kept.append(sample)
+        return kept
+
+    def flush(self) -> int:
+        """Append pending records to disk. Returns the number written."""
+        if not self._pending:
+            return 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "ab") as f:
+            f.write(b"".join(_RECORD.pack(h, ordinal) for h, ordinal in self._pending))
+        written = len(self._pending)
+        self._pending.clear()
+        return written
+
+    def stats(self) -> dict:
+        per_version = [0] * len(self.versions)
+        for ordinal in self._first_seen.values():
+            per_version[ordinal] += 1
+        return {
+            "path": str(self.path),
+            "hashes": len(self._first_seen),
+            "per_version": dict(zip(self.versions, per_version)),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or apply the persistent dedup index")
+    parser.add_argument("command", choices=["stats", "filter"])
+    parser.add_argument("input_file", type=Path, nargs="?", help="JSONL to filter")
+    parser.add_argument("--index", type=Path, default=DEFAULT_INDEX_PATH, help="Index file")
+    parser.add_argument("--version", default=None, help="Version label to register samples under (default: timestamp)")
+    parser.add_argument("--since", default=None, help="Only emit samples first shipped after this version")
+    parser.add_argument("-o", "--output", type=Path, default=None, help="Output JSONL (default: stdout)")
+    args = parser.parse_args()
+
+    index = DedupIndex(args.index)
+    if args.command == "stats":
+        print(json.dumps(index.stats(), indent=2))
+        return
+
+    if args.input_file is None or not args.input_file.exists():
+        print(f"File not found: {args.input_file}", file=sys.stderr)
+        sys.exit(1)
+
+    with open(args.input_file, "r") as f:
+        samples = [json.loads(line) for line in f if line.strip()]
+    kept = index.filter_new(samples, args.version or default_version("filter"), since=args.since)
+    index.flush()
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        for sample in kept:
+            out.write(json.dumps(sample, ensure_ascii=False) + "\n")
+    finally:
+        if args.output:
+            out.close()
+    print(f"Kept {len(kept)}/{len(samples)} samples new since {args.since or 'previous versions'}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,11 +3,19 @@
 Strategy: hash the assistant responses (not user prompts, which are often
 templated) and remove near-duplicates. Many sessions start identically
 (hook check, mail check) — these should be deduplicated.
+
+near_deduplicate additionally collapses samples that differ only in
+volatile tokens (timestamps, bead IDs, polecat names) using MinHash + LSH.
+It needs numpy. overlap_deduplicate drops chunks whose assistant turns
+are mostly already covered by kept chunks (50%-stride windows, shared
+boilerplate prefixes).
 """
 
 from __future__ import annotations
 
 import hashlib
+import re
+import zlib
 
 
 def content_hash(conversations: list[dict]) -> str:
@@ -43,3 +51,291 @@ def deduplicate(samples: list[dict]) -> list[dict]:
             unique.append(sample)
 
     return unique
+
+
+# --- Near-duplicate detection (MinHash + LSH) --------------------------------
+
+DEFAULT_NEAR_DUP_THRESHOLD = 0.85
+DEFAULT_NUM_PERM = 128
+DEFAULT_SHINGLE_SIZE = 5
+# Shingles hashed per numpy batch; bounds the (shingles x num_perm) matrix.
+DEFAULT_BATCH_SHINGLES = 1 << 16
+
+# Volatile tokens that differ between otherwise identical patrol sessions,
+# each with a literal that must occur in the text for the pattern to match.
+# Applied in order; earlier patterns must not be broken up by later ones.
+_VOLATILE_PATTERNS = [
+    (":", re.compile(r"\b\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?"), "<ts>"),
+    (":", re.compile(r"\b\d{1,2}:\d{2}(?::\d{2})?\b"), "<ts>"),
+    ("", re.compile(r"\b1[5-9]\d{8}(?:\d{3})?\b"), "<ts>"),  # epoch seconds / ms
+    ("-", re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.IGNORECASE), "<uuid>"),
+    ("", re.compile(r"\b(?=[a-f]*\d)[0-9a-f]{7,64}\b"), "<hex>"),
+    # Bead / wisp IDs: gt-4tp, hq-3mn2, bcc-wisp-x8k3m, gt-kvo.6
+    ("-wisp-", re.compile(r"\b[a-z]{2,4}-wisp-[a-z0-9]{3,10}\b"), "<bead>"),
+    ("-", re.compile(r"\b[a-z]{2,4}-(?=[a-z]{0,7}\d)[a-z0-9]{3,8}(?:\.\d+)?\b"), "<bead>"),
+    # Agent addresses: bcc/polecats/nux, gastown/crew/max → keep rig and role, drop the name.
+    ("/", re.compile(r"\b([a-z][a-z0-9_-]*/(?:polecats|crew|witness|refinery))/[a-z][a-z0-9_-]*\b"), r"\1/<agent>"),
+    # Durations (12m, 3 minutes) and numeric IDs (#123, pid 4242);
+    # other numbers (counts, exit codes, line numbers) are content and stay.
+    ("", re.compile(r"\b\d+(?:\.\d+)?(?:ms|s|m|h|d|sec|min|hr)\b"), "<dur>"),
+    ("", re.compile(r"\b\d+ (?:second|minute|hour|day)s?\b"), "<dur>"),
+    ("#", re.compile(r"#\d+\b"), "#<n>"),
+    ("", re.compile(r"\b(pid|port|id|pr|issue)([ =:]?)\d+\b", re.IGNORECASE), r"\1\2<n>"),
+]
+_WORD_RE = re.compile(r"\S+")
+# Odd multiplier combining word hashes into a shingle hash (polynomial rolling).
+_SHINGLE_MULT = 0x9E3779B97F4A7C15
+
+
+def normalize_volatile(text: str) -> str:
+    """Replace timestamps, durations, IDs and agent names with placeholders."""
+    for literal, pattern, replacement in _VOLATILE_PATTERNS:
+        if literal in text:
+            text = pattern.sub(replacement, text)
+    return text
+
+
+def shingle_hashes(conversations: list[dict], size: int = DEFAULT_SHINGLE_SIZE, word_cache: dict | None = None):
+    """Unique 64-bit hashes of the word k-shingles of the normalized gpt messages.
+
+    Like content_hash, only assistant content is considered. Each word is
+    hashed once (crc32, memoized in word_cache) and shingle hashes are
+    combined from word hashes with numpy. Texts shorter than size words
+    yield a single shingle. Returns a uint64 array; requires numpy.
+    """
+    import numpy as np
+
+    text = "\n".join(msg.get("value", "") for msg in conversations if msg.get("from") == "gpt")
+    cache = word_cache if word_cache is not None else {}
+    ids = []
+    for word in _WORD_RE.findall(normalize_volatile(text)):
+        h = cache.get(word)
+        if h is None:
+            h = cache[word] = zlib.crc32(word.encode("utf-8"))
+        ids.append(h)
+
+    words = np.array(ids, dtype=np.uint64)
+    size = max(1, min(size, len(words)))
+    n = len(words) - size + 1
+    if n <= 0:
+        return np.zeros(1, dtype=np.uint64)
+    mult = np.uint64(_SHINGLE_MULT)
+    shingles = words[:n].copy()
+    for j in range(1, size):
+        shingles = shingles * mult + words[j:j + n]
+    return np.unique(shingles)
+
+
+def minhash_signatures(
+    shingle_sets: list,
+    num_perm: int = DEFAULT_NUM_PERM,
+    seed: int = 1,
+    batch_shingles: int = DEFAULT_BATCH_SHINGLES,
+):
+    """MinHash signatures for many shingle hash arrays, as a (n, num_perm) uint32 array.
+
+    Uses multiply-shift hashing (h = (a*x + b) >> 32 over uint64) and
+    computes signatures for as many sets as fit in batch_shingles at once
+    with np.minimum.reduceat. Requires numpy.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 1 << 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)
+    shift = np.uint64(32)
+
+    signatures = np.empty((len(shingle_sets), num_perm), dtype=np.uint32)
+    start = 0
+    while start < len(shingle_sets):
+        end, total = start, 0
+        while end < len(shingle_sets) and (end == start or total + len(shingle_sets[end]) <= batch_shingles):
+            total += len(shingle_sets[end])
+            end += 1
+
+        batch = shingle_sets[start:end]
+        sizes = np.fromiter((len(s) for s in batch), dtype=np.int64, count=len(batch))
+        flat = np.concatenate(batch).astype(np.uint64, copy=False)
+        hashed = ((flat[:, None] * a[None, :] + b[None, :]) >> shift).astype(np.uint32)
+        offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        signatures[start:end] = np.minimum.reduceat(hashed, offsets, axis=0)
+        start = end
+
+    return signatures
+
+
+def lsh_params(threshold: float, num_perm: int = DEFAULT_NUM_PERM) -> tuple[int, int]:
+    """Pick (bands, rows) with bands * rows == num_perm for a Jaccard threshold.
+
+    Chooses the most selective banding whose S-curve midpoint (1/b)^(1/r)
+    is still at or below the threshold, so pairs at the threshold are
+    almost always candidates; candidates are verified against the threshold
+    afterwards.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= threshold:
+            best = (bands, rows)
+    return best
+
+
+def near_deduplicate(
+    samples: list[dict],
+    threshold: float = DEFAULT_NEAR_DUP_THRESHOLD,
+    num_perm: int = DEFAULT_NUM_PERM,
+    shingle_size: int = DEFAULT_SHINGLE_SIZE,
+) -> tuple[list[dict], dict]:
+    """Remove samples whose assistant content is a near-duplicate of an earlier one.
+
+    Samples are compared by estimated Jaccard similarity of their shingle
+    sets (see shingle_hashes), using MinHash signatures and LSH banding so
+    only samples sharing a band bucket are compared. The first sample of
+    each cluster is kept and only kept samples are indexed, so the cost is
+    linear in the number of samples for realistic bucket sizes.
+
+    Returns (kept samples, per-role stats). Stats are keyed by role and
+    count samples, kept, removed, clusters (kept samples that absorbed at
+    least one near-duplicate) and max_cluster_size.
+    """
+    if not samples:
+        return [], {}
+
+    import numpy as np
+
+    word_cache: dict[str, int] = {}
+    signatures = minhash_signatures(
+        [shingle_hashes(s.get("conversations", []), shingle_size, word_cache) for s in samples],
+        num_perm=num_perm,
+    )
+    bands, rows = lsh_params(threshold, num_perm)
+    buckets: list[dict[bytes, list[int]]] = [{} for _ in range(bands)]
+
+    kept: list[int] = []
+    cluster_sizes: dict[int, int] = {}
+    assigned: list[int] = []
+
+    for i in range(len(samples)):
+        sig = signatures[i]
+        keys = [sig[band * rows:(band + 1) * rows].tobytes() for band in range(bands)]
+
+        candidates: set[int] = set()
+        for band, key in enumerate(keys):
+            candidates.update(buckets[band].get(key, ()))
+
+        rep = -1
+        if candidates:
+            cand = sorted(candidates)
+            similarity = (signatures[cand] == sig).mean(axis=1)
+            best = int(np.argmax(similarity))
+            if similarity[best] >= threshold:
+                rep = cand[best]
+
+        if rep < 0:
+            rep = i
+            kept.append(i)
+            cluster_sizes[i] = 0
+            for band, key in enumerate(keys):
+                buckets[band].setdefault(key, []).append(i)
+        cluster_sizes[rep] += 1
+        assigned.append(rep)
+
+    stats: dict[str, dict] = {}
+    for i, sample in enumerate(samples):
+        role = sample.get("metadata", {}).get("role", "unknown")
+        entry = stats.setdefault(role, {"samples": 0, "kept": 0, "removed": 0, "clusters": 0, "max_cluster_size": 1})
+        entry["samples"] += 1
+        if assigned[i] == i:
+            size = cluster_sizes[i]
+            entry["kept"] += 1
+            if size > 1:
+                entry["clusters"] += 1
+                entry["max_cluster_size"] = max(entry["max_cluster_size"], size)
+        else:
+            entry["removed"] += 1
+
+    return [samples[i] for i in kept], stats
+
+
+# --- Overlap-aware dedup (turn fingerprints) ---------------------------------
+
+DEFAULT_OVERLAP_THRESHOLD = 0.8
+TURN_FINGERPRINTS_KEY = "turn_fingerprints"
+
+
+def turn_fingerprint(text: str) -> str:
+    """Hash of a single assistant turn."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def fingerprint_turns(turns: list, memo: dict[int, tuple[str, int]], count=None) -> list[tuple[str, int]]:
+    """(fingerprint, tokens) for each assistant turn in a chunk.
+
+    memo is keyed by turn identity: overlapping chunks of a session share
+    Turn objects, so each turn is hashed and counted once per session no
+    matter how many chunks contain it. count defaults to len/4 tokens.
+    """
+    result = []
+    for turn in turns:
+        if turn.role != "assistant":
+            continue
+        entry = memo.get(id(turn))
+        if entry is None:
+            tokens = count(turn.content) if count else max(1, len(turn.content) // 4)
+            entry = memo[id(turn)] = (turn_fingerprint(turn.content), tokens)
+        result.append(entry)
+    return result
+
+
+def overlap_deduplicate(
+    samples: list[dict],
+    threshold: float = DEFAULT_OVERLAP_THRESHOLD,
+) -> tuple[list[dict], dict]:
+    """Drop samples whose assistant tokens are mostly covered by kept samples.
+
+    Coverage is the token-weighted share of a sample's assistant turns
+    whose fingerprint already appears in an earlier kept sample. Samples
+    at or above threshold are dropped; kept samples record their coverage
+    in metadata["overlap_coverage"] so trainers can down-weight them.
+
+    Fingerprints come from metadata["turn_fingerprints"] (attached by the
+    pipeline via fingerprint_turns, removed here) or, for samples read back
+    from JSONL, are computed from the gpt messages once per distinct text.
+
+    Returns (kept samples, per-role stats with samples/dropped counts).
+    """
+    covered: set[str] = set()
+    by_text: dict[str, tuple[str, int]] = {}
+    kept: list[dict] = []
+    stats: dict[str, dict] = {}
+
+    for sample in samples:
+        meta = sample.setdefault("metadata", {})
+        fingerprints = meta.pop(TURN_FINGERPRINTS_KEY, None)
+        if fingerprints is None:
+            fingerprints = []
+            for msg in sample.get("conversations", []):
+                if msg.get("from") == "gpt":
+                    text = msg.get("value", "")
+                    entry = by_text.get(text)
+                    if entry is None:
+                        entry = by_text[text] = (turn_fingerprint(text), max(1, len(text) // 4))
+                    fingerprints.append(entry)
+
+        total = sum(tokens for _, tokens in fingerprints)
+        overlap = sum(tokens for fp, tokens in fingerprints if fp in covered)
+        coverage = overlap / total if total else 0.0
+
+        entry = stats.setdefault(meta.get("role", "unknown"), {"samples": 0, "dropped": 0})
+        entry["samples"] += 1
+        if total and coverage >= threshold:
+            entry["dropped"] += 1
+            continue
+
+        meta["overlap_coverage"] = round(coverage, 3)
+        covered.update(fp for fp, _ in fingerprints)
+        kept.append(sample)
+
+    return kept, stats
@@ -0,0 +1,235 @@
+"""Detect high-entropy tokens that the known secret patterns miss.
+
+secret_scrubber only recognizes known token formats (gho_, sk-, AKIA...).
+Custom internal tokens look like long random base64/hex runs, so this
+detector finds candidate runs with one regex scan, then computes the
+Shannon entropy of all candidates of a batch at once with numpy (a byte
+histogram per run via a single bincount). Git commit SHAs (40 hex chars
+after "commit", "git ..." or a "[branch " prefix on the same line), UUIDs,
+model names, API message / tool-use IDs, bead IDs, code identifiers and
+already-redacted placeholders are allowlisted. Other hex runs (e.g. a
+hex-encoded 32-byte key) are scored like any other run.
+
+The report names the file, line, message index and character span of
+every hit; token values are masked.
+
+Usage:
+    python -m data.transform.entropy_detector output/datasets/gastown_train.jsonl
+    python -m data.transform.entropy_detector output/datasets/gastown_train.jsonl --report output/datasets/entropy_hits.json
+    python -m data.transform.entropy_detector output/datasets/gastown_train.jsonl --strict   # exit 1 on hits
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import re
+import sys
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+from data.transform.prompt_table import iter_expanded
+
+DEFAULT_MIN_LENGTH = 24
+# A run is flagged when its entropy (bits/char) reaches this share of the
+# maximum a random run of its length and alphabet could reach:
+# min(log2(length), alphabet bits), with 4 bits for hex and 6 for base64.
+ENTROPY_RATIO = 0.8
+_ALPHABET_BITS = {"hex": 4.0, "base64": 6.0}
+# Candidate runs entropy-scored per numpy batch.
+DEFAULT_BATCH_RUNS = 8192
+
+# "/" and "." are left out so file paths and dotted names split into short
+# pieces; "=" only as trailing padding so KEY=value splits at the "=".
+# Runs start at a run boundary and need a digit and a letter (lookaheads),
+# which skips long words and snake_case identifiers inside the regex scan.
+_RUN_PATTERN = r"(?<![A-Za-z0-9+_-])(?=[A-Za-z0-9+_-]*[0-9])(?=[A-Za-z0-9+_-]*[A-Za-z])[A-Za-z0-9+_-]{%d,}={0,2}"
+_RUN_RE = re.compile(_RUN_PATTERN % DEFAULT_MIN_LENGTH)
+_HEX_RE = re.compile(r"[0-9a-fA-F]+")
+_GIT_SHA_RE = re.compile(r"[0-9a-f]{40}")
+# Line text before a SHA: "commit <sha>", "git show <sha>", "[main <sha>]".
+_GIT_CONTEXT_RE = re.compile(r"\b(?:commit|git)\b|\[[\w./-]+ $", re.IGNORECASE)
+_ALLOWLIST = [
+    re.compile(r"(?:claude|gpt|gemini|llama|qwen|mistral|smollm)[0-9.]*-[A-Za-z0-9._-]+", re.IGNORECASE),  # model names
+    re.compile(r"(?:msg|toolu|srvtoolu|req|msgbatch)_(?:bdrk_|vrtx_)?[A-Za-z0-9]+"),  # Anthropic API / tool-use IDs
+    re.compile(r"_*[A-Za-z][a-z]+(?:_?[A-Z][a-z]+|[_-][a-z]+)*\d*"),  # snake_case / camelCase identifiers
+    re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"),  # UUID
+    re.compile(r"[a-z]{2,4}(?:-wisp)?-[a-z0-9]{3,10}(?:\.\d+)?"),  # bead / wisp IDs
+    re.compile(r"[A-Z_]+_REDACTED"),  # secret_scrubber placeholders
+]
+
+
+class EntropyHit(NamedTuple):
+    """A high-entropy run: texts[text_index][start:end]."""
+
+    text_index: int
+    start: int
+    end: int
+    entropy: float
+    kind: str  # "hex" or "base64"
+
+
+def is_allowlisted(token: str) -> bool:
+    return any(pattern.fullmatch(token) for pattern in _ALLOWLIST)
+
+
+def is_git_sha(text: str, start: int, end: int) -> bool:
+    """True if text[start:end] is a full commit SHA in a git context on its line."""
+    if not _GIT_SHA_RE.fullmatch(text, start, end):
+        return False
+    line_start = text.rfind("\n", 0, start) + 1
+    return _GIT_CONTEXT_RE.search(text, line_start, start) is not None
+
+
+def candidate_runs(text: str, min_length: int = DEFAULT_MIN_LENGTH) -> list[tuple[int, int]]:
+    """(start, end) spans of base64/hex-like runs that are not allowlisted.
+
+    Runs need both a letter and a digit, which skips long words and
+    snake_case identifiers before any entropy is computed.
+    """
+    pattern = _RUN_RE if min_length == DEFAULT_MIN_LENGTH else re.compile(_RUN_PATTERN % min_length)
+    spans = []
+    for match in pattern.finditer(text):
+        start, end = match.span()
+        if is_allowlisted(match.group(0)) or is_git_sha(text, start, end):
+            continue
+        spans.append((start, end))
+    return spans
+
+
+def shannon_entropy(tokens: list[str]):
+    """Entropy in bits per character of each token, as a float64 array.
+
+    All tokens are concatenated into one byte array; per-token byte
+    histograms come from a single bincount over (token_index * 256 + byte).
+    Requires numpy.
+    """
+    import numpy as np
+
+    if not tokens:
+        return np.zeros(0, dtype=np.float64)
+    encoded = [t.encode("ascii", "replace") for t in tokens]
+    lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.int64)
+    owner = np.repeat(np.arange(len(encoded), dtype=np.int64), lengths)
+    counts = np.bincount(owner * 256 + data, minlength=len(encoded) * 256).reshape(len(encoded), 256)
+    p = counts / lengths[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = np.where(counts > 0, p * np.log2(p), 0.0)
+    return 0.0 - terms.sum(axis=1)
+
+
+def entropy_threshold(length: int, kind: str) -> float:
+    """Minimum entropy (bits/char) for a run of this length and kind to be flagged."""
+    return ENTROPY_RATIO * min(math.log2(length), _ALPHABET_BITS[kind])
+
+
+def find_high_entropy(
+    texts: list[str],
+    min_length: int = DEFAULT_MIN_LENGTH,
+    batch_runs: int = DEFAULT_BATCH_RUNS,
+) -> list[EntropyHit]:
+    """High-entropy runs across texts, in text order."""
+    runs: list[tuple[int, int, int, str]] = []
+    for i, text in enumerate(texts):
+        for start, end in candidate_runs(text, min_length):
+            token = text[start:end]
+            kind = "hex" if _HEX_RE.fullmatch(token) else "base64"
+            runs.append((i, start, end, kind))
+
+    hits: list[EntropyHit] = []
+    for offset in range(0, len(runs), batch_runs):
+        batch = runs[offset:offset + batch_runs]
+        entropies = shannon_entropy([texts[i][start:end] for i, start, end, _ in batch])
+        for (i, start, end, kind), entropy in zip(batch, entropies.tolist()):
+            if entropy >= entropy_threshold(end - start, kind):
+                hits.append(EntropyHit(i, start, end, round(entropy, 3), kind))
+    return hits
+
+
+def mask(token: str) -> str:
+    """Short, non-reversible preview of a token for reports."""
+    return f"{token[:4]}…{token[-2:]} ({len(token)} chars)"
+
+
+def scan_samples(
+    samples: Iterable[tuple[int, dict]],
+    min_length: int = DEFAULT_MIN_LENGTH,
+    batch_messages: int = 4096,
+) -> list[dict]:
+    """Scan (line number, sample) pairs; returns one location dict per hit."""
+    report: list[dict] = []
+    texts: list[str] = []
+    where: list[tuple[int, int, str]] = []
+
+    def flush():
+        for hit in find_high_entropy(texts, min_length):
+            line, msg_index, from_role = where[hit.text_index]
+            report.append({
+                "line": line,
+                "message": msg_index,
+                "from": from_role,
+                "start": hit.start,
+                "end": hit.end,
+                "kind": hit.kind,
+                "entropy": hit.entropy,
+                "preview": mask(texts[hit.text_index][hit.start:hit.end]),
+            })
+        texts.clear()
+        where.clear()
+
+    for line, sample in samples:
+        for msg_index, msg in enumerate(sample.get("conversations", [])):
+            value = msg.get("value")
+            if isinstance(value, str) and len(value) >= min_length:
+                texts.append(value)
+                where.append((line, msg_index, msg.get("from", "")))
+        if len(texts) >= batch_messages:
+            flush()
+    flush()
+    return report
+
+
+def scan_file(path: Path, min_length: int = DEFAULT_MIN_LENGTH) -> list[dict]:
+    """Scan a (plain or compact) sharegpt JSONL file."""
+    hits = scan_samples(enumerate(iter_expanded(path), 1), min_length)
+    for hit in hits:
+        hit["file"] = str(path)
+    return hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report high-entropy tokens in training JSONL files")
+    parser.add_argument("input_files", type=Path, nargs="+", help="Input JSONL files")
+    parser.add_argument("--min-length", type=int, default=DEFAULT_MIN_LENGTH, help="Minimum candidate run length")
+    parser.add_argument("--report", type=Path, default=None, help="Write all hits as JSON")
+    parser.add_argument("--strict", action="store_true", help="Exit with error code if any high-entropy token is found")
+    args = parser.parse_args()
+
+    hits: list[dict] = []
+    for path in args.input_files:
+        if not path.exists():
+            print(f"File not found: {path}")
+            sys.exit(1)
+        hits.extend(scan_file(path, args.min_length))
+
+    print(f"\nEntropy audit: {len(args.input_files)} file(s), {len(hits)} high-entropy token(s)")
+    for hit in hits[:20]:
+        print(f"  {hit['file']}:{hit['line']} msg {hit['message']} ({hit['from']}) "
+              f"[{hit['start']}:{hit['end']}] {hit['kind']} H={hit['entropy']} {hit['preview']}")
+    if len(hits) > 20:
+        print(f"  ... and {len(hits) - 20} more")
+
+    if args.report:
+        args.report.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.report, "w") as f:
+            json.dump(hits, f, indent=2)
+        print(f"  Report written to {args.report}")
+
+    if hits and args.strict:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""Estimate how tightly samples pack into Axolotl's sample_packing bins.
+
+With sample_packing + pad_to_sequence_len, Axolotl concatenates samples
+into sequence_len-sized bins and pads the remainder. Every padded slot is
+wasted GPU time, so we report packing efficiency (useful tokens / total
+slots) per role using best-fit-decreasing bin packing.
+
+Samples longer than sequence_len are clipped (Axolotl truncates them) and
+counted as truncated.
+
+The same packer can also pre-pack a dataset offline: samples are tokenized
+once with the chatml template and written as packed rows (input_ids,
+labels, position_ids restarting at 0 at every sample boundary), with the
+packing statistics next to them. Loading the packed rows on the GPU box
+skips Axolotl's own tokenize-and-pack step.
+
+Usage:
+    python -m data.transform.packing output/datasets/witness_train.jsonl --tokenizer Qwen/Qwen2.5-7B-Instruct
+    python -m data.transform.packing output/datasets/gastown_train.jsonl --sequence-len 2048 --output-dir output/datasets/packed
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sys
+from bisect import bisect_left, insort
+from collections import defaultdict
+from pathlib import Path
+from typing import Any
+
+from data.transform.chatml import encode_conversations
+from data.transform.prompt_table import iter_expanded
+from data.transform.token_counter import DEFAULT_TOKENIZER, load_tokenizer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEQUENCE_LEN = 4096
+DEFAULT_PACKED_DIR = Path("output") / "datasets" / "packed"
+
+
+def pack_lengths(lengths: list[int], capacity: int) -> list[list[int]]:
+    """Best-fit-decreasing bin packing of sample lengths.
+
+    Returns a list of bins, each a list of indices into lengths.
+    Free space is kept in a sorted list so each placement is a bisect
+    rather than a scan over all open bins.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: -lengths[i])
+    free: list[tuple[int, int]] = []  # (remaining capacity, bin index), sorted
+    bins: list[list[int]] = []
+
+    for i in order:
+        size = min(lengths[i], capacity)
+        pos = bisect_left(free, (size, -1))
+        if pos < len(free):
+            remaining, b = free.pop(pos)
+            bins[b].append(i)
+            remaining -= size
+        else:
+            b = len(bins)
+            bins.append([i])
+            remaining = capacity - size
+        if remaining > 0:
+            insort(free, (remaining, b))
+
+    return bins
+
+
+def packing_efficiency(lengths: list[int], sequence_len: int) -> dict:
+    """Summarize packing quality for a list of sample token lengths."""
+    bins = pack_lengths(lengths, sequence_len)
+    useful = sum(min(n, sequence_len) for n in lengths)
+    total_slots = len(bins) * sequence_len
+
+    return {
+        "samples": len(lengths),
+        "bins": len(bins),
+        "useful_tokens": useful,
+        "total_slots": total_slots,
+        "efficiency": round(useful / total_slots, 4) if total_slots else 0.0,
+        "truncated_samples": sum(1 for n in lengths if n > sequence_len),
+        "truncated_tokens": sum(n - sequence_len for n in lengths if n > sequence_len),
+    }
+
+
+def pack_encoded(
+    encoded: list[tuple[list[int], list[int]]],
+    sequence_len: int,
+) -> list[dict]:
+    """Pack tokenized (input_ids, labels) samples into sequence_len rows.
+
+    Each row concatenates the samples of one bin. position_ids restart at
+    0 for every sample so attention can be bounded per sample;
+    sample_lengths lists the segment lengths in order.
+    """
+    clipped = [(ids[:sequence_len], labels[:sequence_len]) for ids, labels in encoded]
+    bins = pack_lengths([len(ids) for ids, _ in clipped], sequence_len)
+
+    rows = []
+    for b in bins:
+        input_ids: list[int] = []
+        labels: list[int] = []
+        position_ids: list[int] = []
+        lengths: list[int] = []
+        for i in b:
+            ids, lab = clipped[i]
+            input_ids.extend(ids)
+            labels.extend(lab)
+            position_ids.extend(range(len(ids)))
+            lengths.append(len(ids))
+        rows.append({
+            "input_ids": input_ids,
+            "labels": labels,
+            "attention_mask": [1] * len(input_ids),
+            "position_ids": position_ids,
+            "sample_lengths": lengths,
+        })
+    return rows
+
+
+def export_packed(
+    samples: list[dict],
+    tokenizer: Any,
+    output_dir: Path,
+    name: str,
+    sequence_len: int = DEFAULT_SEQUENCE_LEN,
+    tokenizer_name: str = "",
+) -> dict:
+    """Tokenize, pack and write {name}_packed.jsonl plus {name}_packed.stats.json.
+
+    Returns the packing statistics.
+    """
+    encoded = encode_conversations([s.get("conversations", []) for s in samples], tokenizer)
+    stats = packing_efficiency([len(ids) for ids, _ in encoded], sequence_len)
+    rows = pack_encoded(encoded, sequence_len)
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    rows_path = output_dir / f"{name}_packed.jsonl"
+    with open(rows_path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, separators=(",", ":")) + "\n")
+
+    stats.update({
+        "name": name,
+        "sequence_len": sequence_len,
+        "tokenizer": tokenizer_name,
+        "trainable_tokens": sum(1 for _, labels in encoded for t in labels[:sequence_len] if t >= 0),
+        "path": str(rows_path),
+    })
+    with open(output_dir / f"{name}_packed.stats.json", "w") as f:
+        json.dump(stats, f, indent=2)
+
+    logger.info(
+        "Packed %s: %d samples into %d rows (%.1f%% efficiency)",
+        name, stats["samples"], stats["bins"], stats["efficiency"] * 100,
+    )
+    return stats
+
+
+def export_packed_by_role(
+    samples: list[dict],
+    output_dir: Path,
+    tokenizer_name: str = DEFAULT_TOKENIZER,
+    sequence_len: int = DEFAULT_SEQUENCE_LEN,
+    tokenizer: Any = None,
+) -> dict[str, dict]:
+    """Pre-pack one dataset per role. Returns stats keyed by role."""
+    by_role: dict[str, list[dict]] = defaultdict(list)
+    for sample in samples:
+        by_role[sample.get("metadata", {}).get("role", "unknown")].append(sample)
+
+    if tokenizer is None:
+        tokenizer = load_tokenizer(tokenizer_name)
+
+    return {
+        role: export_packed(role_samples, tokenizer, output_dir, role, sequence_len, tokenizer_name)
+        for role, role_samples in sorted(by_role.items())
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-pack a sharegpt JSONL dataset into sequence_len rows per role")
+    parser.add_argument("input_file", type=Path, help="Input sharegpt JSONL file (plain or compact)")
+    parser.add_argument("--tokenizer", default=DEFAULT_TOKENIZER, help="HuggingFace tokenizer (base model)")
+    parser.add_argument("--sequence-len", type=int, default=DEFAULT_SEQUENCE_LEN, help="Axolotl sequence_len")
+    parser.add_argument("--output-dir", type=Path, default=DEFAULT_PACKED_DIR, help="Output directory for packed rows")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s", datefmt="%H:%M:%S")
+
+    if not args.input_file.exists():
+        print(f"File not found: {args.input_file}")
+        sys.exit(1)
+
+    samples = list(iter_expanded(args.input_file))
+
+    results = export_packed_by_role(samples, args.output_dir, args.tokenizer, args.sequence_len)
+
+    print(f"\n--- Packed datasets ({args.sequence_len} tokens/row) ---")
+    for role, stats in results.items():
+        print(f"  {role:12s} {stats['samples']:6d} samples -> {stats['bins']:6d} rows  "
+              f"efficiency {stats['efficiency']:.1%}  truncated {stats['truncated_samples']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Pretokenized, memory-mapped dataset format per role.
+
+Axolotl re-parses and re-tokenizes sharegpt JSONL before every training run
+and every Optuna trial. This module applies the chatml template once on the
+CPU box and stores each dataset as flat NumPy arrays:
+
+    {name}.tokens.npy   uint32  all token ids, samples back to back
+    {name}.offsets.npy  uint64  sample i is tokens[offsets[i]:offsets[i+1]]
+    {name}.labels.npy   uint8   1 where the token is trained on (assistant)
+    {name}.meta.json            tokenizer, sample and token counts
+
+PretokenizedDataset opens the arrays with mmap_mode="r", so loading is
+zero-copy and samples are sliced straight out of the page cache.
+
+Usage:
+    python -m data.transform.pretokenized output/datasets/witness_train.jsonl --name witness_train
+    python -m data.transform.pretokenized output/datasets/gastown_train.jsonl --by-role --split train
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sys
+from array import array
+from collections import defaultdict
+from pathlib import Path
+from typing import Any
+
+from data.transform.chatml import IGNORE_INDEX, encode_conversations
+from data.transform.prompt_table import iter_expanded
+from data.transform.token_counter import DEFAULT_TOKENIZER, load_tokenizer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRETOKENIZED_DIR = Path("output") / "datasets" / "pretokenized"
+
+FORMAT_VERSION = 1
+
+
+def export_pretokenized(
+    samples: list[dict],
+    tokenizer: Any,
+    output_dir: Path,
+    name: str,
+    tokenizer_name: str = "",
+) -> dict:
+    """Tokenize samples once and write the flat token/offset/label arrays.
+
+    Returns the metadata written to {name}.meta.json.
+    """
+    import numpy as np
+
+    tokens = array("I")
+    labels = array("B")
+    offsets = array("Q", [0])
+
+    encoded = encode_conversations([s.get("conversations", []) for s in samples], tokenizer)
+    for ids, sample_labels in encoded:
+        tokens.extend(ids)
+        labels.extend(0 if t == IGNORE_INDEX else 1 for t in sample_labels)
+        offsets.append(len(tokens))
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    np.save(output_dir / f"{name}.tokens.npy", np.frombuffer(tokens, dtype=np.uint32))
+    np.save(output_dir / f"{name}.offsets.npy", np.frombuffer(offsets, dtype=np.uint64))
+    np.save(output_dir / f"{name}.labels.npy", np.frombuffer(labels, dtype=np.uint8))
+
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "name": name,
+        "tokenizer": tokenizer_name,
+        "template": "chatml",
+        "samples": len(encoded),
+        "tokens": len(tokens),
+        "trainable_tokens": sum(labels),
+    }
+    with open(output_dir / f"{name}.meta.json", "w") as f:
+        json.dump(meta, f, indent=2)
+
+    logger.info("Pretokenized %s: %d samples, %d tokens", name, meta["samples"], meta["tokens"])
+    return meta
+
+
+def export_pretokenized_by_role(
+    samples: list[dict],
+    output_dir: Path,
+    split: str = "train",
+    tokenizer_name: str = DEFAULT_TOKENIZER,
+    tokenizer: Any = None,
+) -> dict[str, dict]:
+    """Write one pretokenized {role}_{split} dataset per role. Returns meta keyed by role."""
+    by_role: dict[str, list[dict]] = defaultdict(list)
+    for sample in samples:
+        by_role[sample.get("metadata", {}).get("role", "unknown")].append(sample)
+
+    if tokenizer is None:
+        tokenizer = load_tokenizer(tokenizer_name)
+
+    return {
+        role: export_pretokenized(role_samples, tokenizer, output_dir, f"{role}_{split}", tokenizer_name)
+        for role, role_samples in sorted(by_role.items())
+    }
+
+
+class PretokenizedDataset:
+    """Zero-copy reader for a dataset written by export_pretokenized.
+
+    Indexing returns {"input_ids", "labels"}; input_ids is a read-only view
+    into the memory-mapped token array, labels are materialized with
+    IGNORE_INDEX for untrained positions.
+    """
+
+    def __init__(self, directory: Path, name: str):
+        import numpy as np
+
+        self._np = np
+        self.directory = Path(directory)
+        self.name = name
+        with open(self.directory / f"{name}.meta.json") as f:
+            self.meta = json.load(f)
+        self.tokens = np.load(self.directory / f"{name}.tokens.npy", mmap_mode="r")
+        self.offsets = np.load(self.directory / f"{name}.offsets.npy", mmap_mode="r")
+        self.label_mask = np.load(self.directory / f"{name}.labels.npy", mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> dict:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+
+        start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+        input_ids = self.tokens[start:end]
+        labels = self._np.where(self.label_mask[start:end] == 1, input_ids.astype(self._np.int64), IGNORE_INDEX)
+        return {"input_ids": input_ids, "labels": labels}
+
+    def lengths(self) -> Any:
+        """Token length of every sample (for packing/bucketing without reading tokens)."""
+        return self._np.diff(self.offsets)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a sharegpt JSONL dataset as pretokenized memory-mapped arrays")
+    parser.add_argument("input_file", type=Path, help="Input sharegpt JSONL file (plain or compact)")
+    parser.add_argument("--tokenizer", default=DEFAULT_TOKENIZER, help="HuggingFace tokenizer (base model)")
+    parser.add_argument("--output-dir", type=Path, default=DEFAULT_PRETOKENIZED_DIR, help="Output directory")
+    parser.add_argument("--name", default=None, help="Dataset name (default: input file stem)")
+    parser.add_argument("--by-role", action="store_true", help="Split into one dataset per metadata.role")
+    parser.add_argument("--split", default="train", help="Split suffix used with --by-role")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s", datefmt="%H:%M:%S")
+
+    if not args.input_file.exists():
+        print(f"File not found: {args.input_file}")
+        sys.exit(1)
+
+    samples = list(iter_expanded(args.input_file))
+
+    if args.by_role:
+        by_role = export_pretokenized_by_role(samples, args.output_dir, args.split, args.tokenizer)
+        results = {meta["name"]: meta for meta in by_role.values()}
+    else:
+        name = args.name or args.input_file.stem
+        tokenizer = load_tokenizer(args.tokenizer)
+        results = {name: export_pretokenized(samples, tokenizer, args.output_dir, name, args.tokenizer)}
+
+    json_bytes = args.input_file.stat().st_size
+    out_bytes = sum(
+        (args.output_dir / f"{name}.{part}.npy").stat().st_size
+        for name in results
+        for part in ("tokens", "offsets", "labels")
+    )
+    print(f"\n--- Pretokenized datasets ({args.output_dir}) ---")
+    for name, meta in results.items():
+        print(f"  {name:20s} {meta['samples']:6d} samples  {meta['tokens']:10,d} tokens  "
+              f"{meta['trainable_tokens']:10,d} trainable")
+    print(f"  Size: {json_bytes:,} bytes JSONL -> {out_bytes:,} bytes pretokenized")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Compact dataset format: store each system prompt once, reference it by ID.
+
+Every sharegpt sample carries the full gt prime prompt for its role as the
+system message, so most bytes in a role dataset are copies of one string.
+The compact format replaces the system message value with a content-hash
+reference and keeps the prompts in a sidecar table:
+
+    witness_train.compact.jsonl
+        {"conversations": [{"from": "system", "prompt_id": "sp-1a2b..."}, ...], ...}
+    witness_train.compact.prompts.json
+        {"sp-1a2b...": "[GAS TOWN ROLE: witness] ..."}
+
+expand_sample / iter_expanded turn compact samples back into standard
+sharegpt; the expanded samples share one string object per prompt, so
+expansion costs a dict lookup. Non-compact samples pass through unchanged.
+
+Usage:
+    python -m data.transform.prompt_table compact output/datasets/witness_train.jsonl
+    python -m data.transform.prompt_table expand output/datasets/witness_train.compact.jsonl
+    python -m data.transform.prompt_table expand witness_train.compact.jsonl -o witness_train.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import sys
+from pathlib import Path
+from typing import Iterable, Iterator, TextIO
+
+PROMPT_ID_PREFIX = "sp-"
+COMPACT_SUFFIX = ".compact.jsonl"
+
+
+def prompt_id(text: str) -> str:
+    """Content-hash ID for a system prompt."""
+    return PROMPT_ID_PREFIX + hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def table_path_for(path: Path) -> Path:
+    """Sidecar prompt table for a dataset file (x.compact.jsonl → x.compact.prompts.json)."""
+    return path.with_suffix(".prompts.json")
+
+
+class PromptTable:
+    """Mapping of prompt ID → system prompt text."""
+
+    def __init__(self, prompts: dict[str, str] | None = None):
+        self.prompts: dict[str, str] = dict(prompts or {})
+
+    def add(self, text: str) -> str:
+        """Register a prompt and return its ID."""
+        pid = prompt_id(text)
+        self.prompts.setdefault(pid, text)
+        return pid
+
+    def get(self, pid: str) -> str | None:
+        return self.prompts.get(pid)
+
+    def __len__(self) -> int:
+        return len(self.prompts)
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.prompts, f, ensure_ascii=False, indent=1, sort_keys=True)
+
+    @classmethod
+    def load(cls, path: Path) -> "PromptTable":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @classmethod
+    def for_dataset(cls, path: Path) -> "PromptTable":
+        """Load the sidecar table of a dataset, or an empty table if there is none."""
+        sidecar = table_path_for(Path(path))
+        return cls.load(sidecar) if sidecar.exists() else cls()
+
+
+def compact_sample(sample: dict, table: PromptTable) -> dict:
+    """Return a copy of sample with system messages replaced by prompt references."""
+    conversations = []
+    for msg in sample.get("conversations", []):
+        if msg.get("from") == "system" and isinstance(msg.get("value"), str):
+            conversations.append({"from": "system", "prompt_id": table.add(msg["value"])})
+        else:
+            conversations.append(msg)
+    return {**sample, "conversations": conversations}
+
+
+def expand_sample(sample: dict, table: PromptTable) -> dict:
+    """Resolve prompt references in place and return the sample.
+
+    Unknown IDs are left unresolved (no "value"), so schema validation
+    reports them instead of silently training on an empty prompt.
+    """
+    for msg in sample.get("conversations", []):
+        pid = msg.get("prompt_id")
+        if pid is not None and "value" not in msg:
+            text = table.get(pid)
+            if text is not None:
+                msg["value"] = text
+                del msg["prompt_id"]
+    return sample
+
+
+def is_compact_sample(sample: dict) -> bool:
+    """True if any message references the prompt table."""
+    return any("prompt_id" in msg for msg in sample.get("conversations", []))
+
+
+def write_compact_jsonl(samples: Iterable[dict], output_path: Path) -> int:
+    """Write samples in compact form plus the sidecar prompt table. Returns count written."""
+    table = PromptTable()
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    count = 0
+    with open(output_path, "w", encoding="utf-8") as f:
+        for sample in samples:
+            f.write(json.dumps(compact_sample(sample, table), ensure_ascii=False) + "\n")
+            count += 1
+    table.save(table_path_for(output_path))
+    return count
+
+
+def iter_expanded(path: Path, table: PromptTable | None = None) -> Iterator[dict]:
+    """Stream standard sharegpt samples from a compact (or plain) JSONL file."""
+    if table is None:
+        table = PromptTable.for_dataset(path)
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield expand_sample(json.loads(line), table)
+
+
+def expand_to(path: Path, out: TextIO) -> int:
+    """Write the expanded form of a compact file to an open handle. Returns count written."""
+    count = 0
+    for sample in iter_expanded(path):
+        out.write(json.dumps(sample, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+def compact_path_for(path: Path) -> Path:
+    """x.jsonl → x.compact.jsonl"""
+    return path.with_name(path.name.removesuffix(".jsonl") + COMPACT_SUFFIX)
+
+
+def expanded_path_for(path: Path) -> Path:
+    """x.compact.jsonl → x.jsonl"""
+    return path.with_name(path.name.removesuffix(COMPACT_SUFFIX) + ".jsonl")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert sharegpt JSONL to and from the compact prompt-table format")
+    parser.add_argument("command", choices=["compact", "expand"])
+    parser.add_argument("input_file", type=Path, help="Input JSONL file")
+    parser.add_argument("-o", "--output", default=None,
+                        help="Output path ('-' for stdout; default: x.compact.jsonl / x.jsonl next to the input)")
+    args = parser.parse_args()
+
+    if not args.input_file.exists():
+        print(f"File not found: {args.input_file}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.command == "compact":
+        output = Path(args.output) if args.output else compact_path_for(args.input_file)
+        with open(args.input_file, "r", encoding="utf-8") as f:
+            count = write_compact_jsonl((json.loads(line) for line in f if line.strip()), output)
+        before, after = args.input_file.stat().st_size, output.stat().st_size + table_path_for(output).stat().st_size
+        print(f"Compacted {count} samples: {before:,} → {after:,} bytes ({after / max(before, 1):.1%})", file=sys.stderr)
+        return
+
+    if args.output == "-":
+        expand_to(args.input_file, sys.stdout)
+        return
+
+    output = Path(args.output) if args.output else expanded_path_for(args.input_file)
+    if output.resolve() == args.input_file.resolve():
+        print(f"Refusing to overwrite input {args.input_file}; pass -o", file=sys.stderr)
+        sys.exit(1)
+    with open(output, "w", encoding="utf-8") as f:
+        count = expand_to(args.input_file, f)
+    print(f"Expanded {count} samples to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -37,6 +37,60 @@ class QualityResult:
     outcome_score: float | None = None  # External scoring signal (-1 or None for unavailable)
 
 
+class TurnFeatures:
+    """Per-session turn features as prefix sums, so any window is O(1).
+
+    Each turn is stripped and boilerplate-checked once; overlapping chunk
+    windows then read their substantive count, content length and tool
+    call counts from prefix-sum differences.
+    """
+
+    def __init__(self, turns: list[Turn]):
+        self.turns = turns
+        self._index = {id(turn): i for i, turn in enumerate(turns)}
+        self.substantive = [0]
+        self.content_len = [0]
+        self.tool_calls = [0]
+        for turn in turns:
+            content = turn.content.strip()
+            substantive = False
+            calls = 0
+            if turn.role == "assistant":
+                calls = len(turn.tool_calls) if turn.tool_calls else 0
+                substantive = not _is_boilerplate(content)
+            elif turn.role == "user":
+                substantive = not _is_boilerplate(content) and not content.startswith("<tool_result")
+            self.substantive.append(self.substantive[-1] + substantive)
+            self.content_len.append(self.content_len[-1] + len(content))
+            self.tool_calls.append(self.tool_calls[-1] + calls)
+
+    def window(self, turns: list[Turn]) -> tuple[int, int] | None:
+        """(start, end) of turns as a contiguous slice of the session, else None."""
+        if not turns:
+            return None
+        start = self._index.get(id(turns[0]))
+        end = None if start is None else start + len(turns)
+        if end is None or end > len(self.turns) or self.turns[end - 1] is not turns[-1]:
+            return None
+        return start, end
+
+    def assess(self, turns: list[Turn], outcome_score: float | None = None) -> QualityResult:
+        """assess_turns for a window of this session's turns."""
+        if len(turns) < 2:
+            return _assess_counts(len(turns), 0, 0, 0, outcome_score)
+        span = self.window(turns)
+        if span is None:
+            return TurnFeatures(turns).assess(turns, outcome_score)
+        start, end = span
+        return _assess_counts(
+            total_turns=end - start,
+            substantive=self.substantive[end] - self.substantive[start],
+            total_content_len=self.content_len[end] - self.content_len[start],
+            tool_call_count=self.tool_calls[end] - self.tool_calls[start],
+            outcome_score=outcome_score,
+        )
+
+
 def assess_turns(turns: list[Turn], outcome_score: float | None = None) -> QualityResult:
     """Assess the quality of a list of conversation turns.
 
@@ -47,86 +101,39 @@ def assess_turns(turns: list[Turn], outcome_score: float | None = None) -> Quali
 
     Returns:
         QualityResult with keep=True/False and a quality score.
+
+    To assess many windows of one session, build TurnFeatures once and
+    call its assess method instead.
     """
-    # Use outcome_score when available, heuristic fallback otherwise.
-    if outcome_score is not None:
-        # Use outcome_score as the quality score with same keep/reject logic as heuristic
-        score = outcome_score
-        if len(turns) < 2:
-            return QualityResult(
-                keep=False,
-                score=score,
-                reason="too few turns",
-                outcome_score=outcome_score,
-            )
-        # Count substantive turns (non-boilerplate).
-        substantive = 0
-        total_content_len = 0
-        tool_call_count = 0
-        tool_result_count = 0
+    return TurnFeatures(turns).assess(turns, outcome_score)
 
-        for turn in turns:
-            content = turn.content.strip()
-            total_content_len += len(content)
 
-            if turn.role == "assistant":
-                if turn.tool_calls:
-                    tool_call_count += len(turn.tool_calls)
-                if not _is_boilerplate(content):
-                    substantive += 1
-            elif turn.role == "user":
-                if turn.tool_results:
-                    tool_result_count += len(turn.tool_results)
-                if not _is_boilerplate(content) and not content.startswith("<tool_result"):
-                    substantive += 1
+def _assess_counts(
+    total_turns: int,
+    substantive: int,
+    total_content_len: int,
+    tool_call_count: int,
+    outcome_score: float | None,
+) -> QualityResult:
+    """Keep/reject and score a window from its aggregated features.
 
+    Uses outcome_score as the quality score when available, with the same
+    keep/reject logic as the heuristic fallback.
+    """
+    if outcome_score is not None:
+        score = outcome_score
+        if total_turns < 2:
+            return QualityResult(keep=False, score=score, reason="too few turns", outcome_score=outcome_score)
         if substantive < MIN_SUBSTANTIVE_TURNS:
-            return QualityResult(
-                keep=False,
-                score=score,
-                reason="too few substantive turns",
-                outcome_score=outcome_score,
-            )
-
+            return QualityResult(keep=False, score=score, reason="too few substantive turns", outcome_score=outcome_score)
         if total_content_len < MIN_CONTENT_LENGTH:
-            return QualityResult(
-                keep=False,
-                score=score,
-                reason="content too short",
-                outcome_score=outcome_score,
-            )
-
-        return QualityResult(
-            keep=True,
-            score=round(score, 3),
-            outcome_score=outcome_score,
-        )
+            return QualityResult(keep=False, score=score, reason="content too short", outcome_score=outcome_score)
+        return QualityResult(keep=True, score=round(score, 3), outcome_score=outcome_score)
 
     # Heuristic fallback - compute score from signal density.
-    if len(turns) < 2:
+    if total_turns < 2:
         return QualityResult(keep=False, score=0.0, reason="too few turns")
 
-    # Count substantive turns (non-boilerplate).
-    substantive = 0
-    total_content_len = 0
-    tool_call_count = 0
-    tool_result_count = 0
-
-    for turn in turns:
-        content = turn.content.strip()
-        total_content_len += len(content)
-
-        if turn.role == "assistant":
-            if turn.tool_calls:
-                tool_call_count += len(turn.tool_calls)
-            if not _is_boilerplate(content):
-                substantive += 1
-        elif turn.role == "user":
-            if turn.tool_results:
-                tool_result_count += len(turn.tool_results)
-            if not _is_boilerplate(content) and not content.startswith("<tool_result"):
-                substantive += 1
-
     if substantive < MIN_SUBSTANTIVE_TURNS:
         return QualityResult(keep=False, score=0.1, reason="too few substantive turns")
 
@@ -137,7 +144,6 @@ def assess_turns(turns: list[Turn], outcome_score: float | None = None) -> Quali
     score = 0.0
 
     # Base score from substantive turn ratio.
-    total_turns = len(turns)
     score += 0.3 * min(substantive / max(total_turns, 1), 1.0)
 
     # Tool usage is high-signal (agents use tools to accomplish tasks).
@@ -157,5 +163,5 @@ def assess_turns(turns: list[Turn], outcome_score: float | None = None) -> Quali
 def _is_boilerplate(content: str) -> bool:
     """Check if content is boilerplate (startup protocol, etc.)."""
     # Check first line only (multi-line responses are usually substantive).
-    first_line = content.split("\n")[0].strip()
+    first_line = content.split("\n", 1)[0].strip()
     return any(p.match(first_line) for p in _BOILERPLATE_PATTERNS)
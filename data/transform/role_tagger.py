@@ -15,7 +15,9 @@ Content-based fallback: first user message often contains [GAS TOWN] role <- sou
 
 from __future__ import annotations
 
+import json
 import re
+from collections import Counter
 from pathlib import Path
 
 # Canonical roles in Gas Town.
@@ -33,6 +35,19 @@ _DIR_PATTERNS = [
     (re.compile(r"-polecats-"), "polecat"),
 ]
 
+# The same patterns as one regex. Every alternative is anchored at the start
+# with ".*", so alternatives are tried in list order (not leftmost match) and
+# the first named group that matches gives the role.
+_DIR_GROUPS = [f"p{i}" for i in range(len(_DIR_PATTERNS))]
+_DIR_RE = re.compile("|".join(
+    f"(?P<{group}>.*{pattern.pattern})" for group, (pattern, _) in zip(_DIR_GROUPS, _DIR_PATTERNS)
+))
+_GROUP_ROLES = {group: role for group, (_, role) in zip(_DIR_GROUPS, _DIR_PATTERNS)}
+
+# Sessions of an untagged directory that must agree on their content role
+# before the directory is tagged with it.
+CONTENT_AGREEMENT = 3
+
 # Content pattern: [GAS TOWN] role <- source
 _CONTENT_PATTERN = re.compile(r"\[GAS TOWN\]\s+(\w+)\s+<-")
 
@@ -42,11 +57,13 @@ def role_from_path(session_path: Path) -> str | None:
 
     Returns the canonical role string, or None if unrecognized.
     """
-    dir_name = session_path.parent.name
-    for pattern, role in _DIR_PATTERNS:
-        if pattern.search(dir_name):
-            return role
-    return None
+    return role_from_dir_name(session_path.parent.name)
+
+
+def role_from_dir_name(dir_name: str) -> str | None:
+    """Role for a project directory name, or None if unrecognized."""
+    match = _DIR_RE.match(dir_name)
+    return _GROUP_ROLES[match.lastgroup] if match else None
 
 
 def role_from_content(first_user_content: str) -> str | None:
@@ -78,3 +95,86 @@ def tag_role(session_path: Path, first_user_content: str = "") -> str:
             return role
 
     return "unknown"
+
+
+class RoleCache:
+    """Per-directory role map, so tagging a session is a dict lookup.
+
+    Directory roles are resolved once per project directory when sessions
+    are discovered (add_paths). Directories the path patterns do not
+    recognize fall back to each session's first user message; once
+    CONTENT_AGREEMENT sessions of a directory agree on a role (and none
+    disagree), the directory is tagged with it and later sessions skip
+    the content search. Directories whose sessions disagree stay
+    per-session.
+    """
+
+    def __init__(self):
+        self.dir_roles: dict[str, str | None] = {}
+        self._content_votes: dict[str, tuple[str | None, int]] = {}
+        self._mixed: set[str] = set()
+        self.lookups = 0
+        self.content_checks = 0
+
+    def add_paths(self, session_paths) -> None:
+        """Resolve the role of each session's parent directory once."""
+        for path in session_paths:
+            dir_name = Path(path).parent.name
+            if dir_name not in self.dir_roles:
+                self.dir_roles[dir_name] = role_from_dir_name(dir_name)
+
+    def tag(self, session_path: Path, first_user_content: str = "") -> str:
+        """Cached equivalent of tag_role."""
+        self.lookups += 1
+        dir_name = session_path.parent.name
+        if dir_name not in self.dir_roles:
+            self.dir_roles[dir_name] = role_from_dir_name(dir_name)
+        role = self.dir_roles[dir_name]
+        if role:
+            return role
+
+        if not first_user_content:
+            return "unknown"
+        self.content_checks += 1
+        role = role_from_content(first_user_content)
+        if role and dir_name not in self._mixed:
+            voted, count = self._content_votes.get(dir_name, (role, 0))
+            if voted != role:
+                self._mixed.add(dir_name)
+                self._content_votes.pop(dir_name, None)
+            elif count + 1 >= CONTENT_AGREEMENT:
+                self.dir_roles[dir_name] = role
+                self._content_votes.pop(dir_name, None)
+            else:
+                self._content_votes[dir_name] = (role, count + 1)
+        return role or "unknown"
+
+    def role_map(self) -> dict[str, str]:
+        """Directory name → role ("mixed" or "unknown" when untagged), sorted by name."""
+        return {
+            name: role or ("mixed" if name in self._mixed else "unknown")
+            for name, role in sorted(self.dir_roles.items())
+        }
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.role_map(), f, indent=2)
+
+    def stats(self) -> dict:
+        return {
+            "directories": len(self.dir_roles),
+            "lookups": self.lookups,
+            "content_checks": self.content_checks,
+        }
+
+
+def load_role_map(path: Path) -> dict[str, str]:
+    """Read a role map written by RoleCache.save."""
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def directory_role_counts(role_map: dict[str, str]) -> dict[str, int]:
+    """Number of project directories per role, most common first."""
+    return dict(Counter(role_map.values()).most_common())
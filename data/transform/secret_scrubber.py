@@ -2,11 +2,18 @@
 
 Session transcripts often contain real tokens (GitHub OAuth, Google OAuth,
 API keys, etc.) that must be removed before training or pushing to repos.
+
+Every pattern needs one of a few literals (gho_, sk-, AKIA, Bearer, ...)
+to match, so a substring prefilter over the lowercased text finds which
+patterns can possibly apply; most messages have no candidates and skip
+the regexes entirely. Candidate patterns run in their original order, so
+the output is the same as applying every pattern in turn.
 """
 
 from __future__ import annotations
 
 import re
+from collections import Counter
 
 # Patterns that match common secret formats.
 # Each tuple: (pattern, replacement, description)
@@ -54,26 +61,75 @@ _SECRET_PATTERNS: list[tuple[re.Pattern, str, str]] = [
 ]
 
 
-def scrub_secrets(text: str) -> tuple[str, int]:
+# Lowercase literals of which at least one must occur (case-insensitively)
+# for the pattern at the same index in _SECRET_PATTERNS to match.
+_PATTERN_TRIGGERS: list[tuple[str, ...]] = [
+    ("gho_",),
+    ("ghp_",),
+    ("ghs_",),
+    ("github_pat_",),
+    ("ya29.",),
+    ("1//",),
+    ("api", "secret", "token", "password", "credential"),
+    ("akia",),
+    ("secret",),
+    ("sk-",),  # sk-ant-
+    ("sk-",),
+    ("-----begin",),
+    ("bearer", "authorization"),
+    ("api",),  # kimi_api_key
+    ("token",),  # GH_TOKEN
+]
+
+_TRIGGER_PATTERNS: dict[str, list[int]] = {}
+for _index, _literals in enumerate(_PATTERN_TRIGGERS):
+    for _literal in _literals:
+        _TRIGGER_PATTERNS.setdefault(_literal, []).append(_index)
+
+# Non-ASCII letters that re.IGNORECASE matches to i/s but str.lower() does not map there.
+_IGNORECASE_FOLD = str.maketrans({"\u0130": "i", "\u0131": "i", "\u017f": "s"})
+
+
+def _candidate_patterns(text: str) -> list[int]:
+    """Indices of patterns whose trigger literals occur in text, in pattern order."""
+    lowered = text.translate(_IGNORECASE_FOLD).lower()
+    return sorted({i for literal, indices in _TRIGGER_PATTERNS.items() if literal in lowered for i in indices})
+
+
+def scrub_secrets_by_pattern(text: str) -> tuple[str, Counter]:
     """Scrub all detected secrets from text.
 
-    Returns (scrubbed_text, count_of_secrets_found).
+    Returns (scrubbed_text, hits per pattern description).
     """
-    total_found = 0
+    hits: Counter = Counter()
+    candidates = _candidate_patterns(text)
 
-    for pattern, replacement, _desc in _SECRET_PATTERNS:
-        if callable(replacement):
-            text, count = pattern.subn(replacement, text)
-        else:
-            text, count = pattern.subn(replacement, text)
-        total_found += count
+    while candidates:
+        index = candidates.pop(0)
+        pattern, replacement, desc = _SECRET_PATTERNS[index]
+        text, count = pattern.subn(replacement, text)
+        if count:
+            hits[desc] += count
+            # Replacements can introduce literals for later patterns.
+            candidates = [i for i in _candidate_patterns(text) if i > index]
 
-    return text, total_found
+    return text, hits
 
 
-def scrub_sample(sample: dict) -> tuple[dict, int]:
+def scrub_secrets(text: str) -> tuple[str, int]:
+    """Scrub all detected secrets from text.
+
+    Returns (scrubbed_text, count_of_secrets_found).
+    """
+    text, hits = scrub_secrets_by_pattern(text)
+    return text, sum(hits.values())
+
+
+def scrub_sample(sample: dict, pattern_hits: Counter | None = None) -> tuple[dict, int]:
     """Scrub secrets from all conversation messages in a training sample.
 
+    pattern_hits, if given, accumulates hits per pattern description.
+
     Returns (scrubbed_sample, total_secrets_found).
     """
     total = 0
@@ -81,9 +137,58 @@ def scrub_sample(sample: dict) -> tuple[dict, int]:
 
     for msg in conversations:
         value = msg.get("value", "")
-        scrubbed, count = scrub_secrets(value)
-        if count > 0:
+        scrubbed, hits = scrub_secrets_by_pattern(value)
+        if hits:
             msg["value"] = scrubbed
-            total += count
+            total += sum(hits.values())
+            if pattern_hits is not None:
+                pattern_hits.update(hits)
 
     return sample, total
+
+
+class SecretScrubber:
+    """Memoized scrubber: each distinct text is scrubbed once per run.
+
+    Overlapping chunks and the per-role system prompt repeat the same
+    strings across many samples; scrubbing turns before chunking through
+    this memo makes the cost scale with unique content. unique_hits counts
+    secrets per distinct text, emitted_hits per emitted sample (what
+    scrub_sample over every sample would have reported).
+    """
+
+    def __init__(self):
+        self._memo: dict[str, tuple[str, Counter]] = {}
+        self.lookups = 0
+        self.unique_hits: Counter = Counter()
+        self.emitted_hits: Counter = Counter()
+
+    def scrub(self, text: str) -> tuple[str, Counter]:
+        """Scrubbed text and its hits per pattern, computed once per distinct text."""
+        self.lookups += 1
+        cached = self._memo.get(text)
+        if cached is None:
+            cached = self._memo[text] = scrub_secrets_by_pattern(text)
+            self.unique_hits.update(cached[1])
+        return cached
+
+    def scrub_turns(self, turns: list) -> dict[int, Counter]:
+        """Scrub Turn.content in place. Returns hits keyed by id(turn) for turns that had any."""
+        hits_by_turn: dict[int, Counter] = {}
+        for turn in turns:
+            scrubbed, hits = self.scrub(turn.content)
+            if hits:
+                turn.content = scrubbed
+                hits_by_turn[id(turn)] = hits
+        return hits_by_turn
+
+    def record(self, hits: Counter) -> None:
+        """Account hits for one emitted sample."""
+        self.emitted_hits.update(hits)
+
+    def stats(self) -> dict:
+        return {
+            "lookups": self.lookups,
+            "unique_texts": len(self._memo),
+            "unique_secrets": sum(self.unique_hits.values()),
+        }
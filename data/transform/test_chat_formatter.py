@@ -0,0 +1,26 @@
+"""Unit tests for chat_formatter.py covering alternation and kept-turn reporting."""
+
+from data.extract.sessions import Turn
+from data.transform.chat_formatter import format_sharegpt
+
+
+def test_reports_only_emitted_turns():
+    turns = [
+        Turn(role="assistant", content="leading reply, dropped"),
+        Turn(role="user", content="check the polecats"),
+        Turn(role="user", content="and the inbox"),
+        Turn(role="assistant", content="all clear"),
+        Turn(role="user", content="trailing question, dropped"),
+    ]
+    kept = []
+    sample = format_sharegpt(turns, role="witness", system_prompt="sys", kept_turns=kept)
+
+    assert [m["from"] for m in sample["conversations"]] == ["system", "human", "gpt"]
+    assert sample["conversations"][1]["value"] == "check the polecats\nand the inbox"
+    assert [id(t) for t in kept] == [id(t) for t in turns[1:4]]
+
+
+def test_kept_turns_optional():
+    turns = [Turn(role="user", content="go"), Turn(role="assistant", content="done")]
+    sample = format_sharegpt(turns, role="witness", system_prompt="sys")
+    assert [m["value"] for m in sample["conversations"]] == ["sys", "go", "done"]
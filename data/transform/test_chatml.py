@@ -0,0 +1,86 @@
+"""Unit tests for chatml.py and offline pre-packing in packing.py."""
+
+import json
+from data.transform.chatml import IGNORE_INDEX, chatml_segments, encode_conversations
+from data.transform.packing import export_packed, pack_encoded
+
+
+class CharTokenizer:
+    """One token per character; special chatml tags count as one token."""
+
+    SPECIALS = ("<|im_start|>", "<|im_end|>")
+
+    def __call__(self, texts, add_special_tokens=False):
+        return {"input_ids": [self._encode(t) for t in texts]}
+
+    def _encode(self, text):
+        ids = []
+        i = 0
+        while i < len(text):
+            for j, special in enumerate(self.SPECIALS):
+                if text.startswith(special, i):
+                    ids.append(100000 + j)
+                    i += len(special)
+                    break
+            else:
+                ids.append(ord(text[i]))
+                i += 1
+        return ids
+
+
+CONV = [
+    {"from": "system", "value": "sys"},
+    {"from": "human", "value": "hi"},
+    {"from": "gpt", "value": "ok"},
+]
+
+
+class TestChatml:
+    def test_segments(self):
+        segments = chatml_segments(CONV)
+        assert segments[0] == ("<|im_start|>system\nsys<|im_end|>\n", False)
+        assert segments[1] == ("<|im_start|>user\nhi<|im_end|>\n", False)
+        assert ("ok<|im_end|>", True) in segments
+        assert "".join(t for t, _ in segments).endswith("<|im_start|>assistant\nok<|im_end|>\n")
+
+    def test_only_assistant_content_trained(self):
+        [(ids, labels)] = encode_conversations([CONV], CharTokenizer())
+        assert len(ids) == len(labels)
+        trained = [t for t in labels if t != IGNORE_INDEX]
+        assert trained == [ord("o"), ord("k"), 100001]
+
+    def test_batches_match_single(self):
+        tok = CharTokenizer()
+        convs = [CONV, CONV[:1], CONV]
+        assert encode_conversations(convs, tok, batch_size=1) == encode_conversations(convs, tok)
+
+
+class TestPrepack:
+    def test_position_ids_restart_per_sample(self):
+        encoded = [([1, 2, 3], [1, 2, 3]), ([4, 5], [-100, 5])]
+        rows = pack_encoded(encoded, sequence_len=8)
+        assert len(rows) == 1
+        row = rows[0]
+        assert row["sample_lengths"] == [3, 2]
+        assert row["position_ids"] == [0, 1, 2, 0, 1]
+        assert row["input_ids"] == [1, 2, 3, 4, 5]
+        assert row["labels"] == [1, 2, 3, -100, 5]
+
+    def test_rows_never_exceed_sequence_len(self):
+        encoded = [([7] * n, [7] * n) for n in (5, 9, 3, 12, 4)]
+        rows = pack_encoded(encoded, sequence_len=10)
+        assert all(len(r["input_ids"]) <= 10 for r in rows)
+        # The 12-token sample is truncated to 10.
+        assert sum(len(r["input_ids"]) for r in rows) == 5 + 9 + 3 + 10 + 4
+
+    def test_export_writes_rows_and_stats(self, tmp_path):
+        samples = [{"conversations": CONV, "metadata": {"role": "witness"}}] * 3
+        stats = export_packed(samples, CharTokenizer(), tmp_path, "witness", sequence_len=128, tokenizer_name="char")
+
+        rows = [json.loads(l) for l in (tmp_path / "witness_packed.jsonl").read_text().splitlines()]
+        saved = json.loads((tmp_path / "witness_packed.stats.json").read_text())
+        assert saved == stats
+        assert stats["samples"] == 3
+        assert stats["bins"] == len(rows)
+        assert stats["trainable_tokens"] == 9
+        assert sum(len(r["sample_lengths"]) for r in rows) == 3
@@ -6,6 +6,7 @@ from data.transform.chunker import (
     chunk_turns,
     _adjust_for_tool_boundary,
     _trim_to_char_budget,
+    plan_packed_chunks,
     DEFAULT_WINDOW_TURNS,
     DEFAULT_STRIDE,
     DEFAULT_MAX_CHARS
@@ -188,4 +189,61 @@ class TestChunker:
             Turn(role="assistant", content="B" * 6000)
         ]
         result = _trim_to_char_budget(turns, max_chars=1000)
-        assert len(result) == 2  # Minimum of 2 turns preserved despite being over budget
\ No newline at end of file
+        assert len(result) == 2  # Minimum of 2 turns preserved despite being over budget
+
+class FixedCounter:
+    """Counts every turn as len(content) tokens (no tokenizer needed)."""
+
+    def count(self, text):
+        return len(text)
+
+    def count_many(self, texts):
+        return [len(t) for t in texts]
+
+
+class TestPackedPlanner:
+    def _turns(self, n, size=100):
+        return [
+            Turn(role="user" if i % 2 == 0 else "assistant", content="x" * size)
+            for i in range(n)
+        ]
+
+    def test_small_session_single_chunk(self):
+        chunks = plan_packed_chunks(self._turns(4), FixedCounter(), sequence_len=4096)
+        assert len(chunks) == 1
+        assert chunks[0].total_chunks == 1
+
+    def test_chunks_fill_sequence_len(self):
+        # Each turn costs 100 + 5 framing; budget 1000 - 5 → 9 turns per chunk.
+        chunks = plan_packed_chunks(self._turns(40), FixedCounter(), sequence_len=1000, overlap=0.0)
+        for chunk in chunks[:-1]:
+            assert len(chunk.turns) == 9
+            assert chunk.metadata["planned_tokens"] <= 1000
+            assert chunk.metadata["planned_tokens"] > 1000 - 105
+
+    def test_reserved_tokens_shrink_windows(self):
+        chunks = plan_packed_chunks(self._turns(40), FixedCounter(), sequence_len=1000, reserved_tokens=400, overlap=0.0)
+        assert len(chunks[0].turns) == 5
+
+    def test_overlap_between_chunks(self):
+        turns = self._turns(40)
+        chunks = plan_packed_chunks(turns, FixedCounter(), sequence_len=1000, overlap=0.5)
+        assert len(chunks) > 1
+        # 9-turn windows advance by 4 turns.
+        assert chunks[1].turns[0] is turns[4]
+
+    def test_no_split_between_tool_call_and_result(self):
+        turns = self._turns(40)
+        # Place a tool call at the last position of the first window.
+        turns[8] = Turn(role="assistant", content="x" * 100, tool_calls=[{"id": "t1"}])
+        turns[9] = Turn(role="user", content="x" * 100, tool_results=[{"tool_use_id": "t1"}])
+        chunks = plan_packed_chunks(turns, FixedCounter(), sequence_len=1000, overlap=0.0)
+        assert len(chunks[0].turns) == 8
+        last = chunks[0].turns[-1]
+        assert not last.tool_calls
+
+    def test_oversized_turn_keeps_minimum_chunk(self):
+        turns = self._turns(6)
+        turns[0] = Turn(role="user", content="x" * 5000)
+        chunks = plan_packed_chunks(turns, FixedCounter(), sequence_len=1000, overlap=0.0)
+        assert len(chunks[0].turns) == 2
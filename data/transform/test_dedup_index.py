@@ -0,0 +1,89 @@
+"""Unit tests for dedup_index.py covering persistence and version filtering."""
+
+import pytest
+from data.transform.dedup_index import DedupIndex, default_version
+from data.transform.deduplicator import content_hash
+
+
+def _sample(text):
+    return {"conversations": [{"from": "human", "value": "go"}, {"from": "gpt", "value": text}]}
+
+
+class TestDedupIndex:
+    def test_add_and_persist(self, tmp_path):
+        path = tmp_path / "index.bin"
+        index = DedupIndex(path)
+        h = content_hash(_sample("a")["conversations"])
+        assert index.add(h, "v1")
+        assert not index.add(h, "v2")
+        assert index.flush() == 1
+
+        reloaded = DedupIndex(path)
+        assert h in reloaded
+        assert reloaded.first_seen(h) == "v1"
+        assert len(reloaded) == 1
+
+    def test_drops_previously_shipped(self, tmp_path):
+        path = tmp_path / "index.bin"
+        index = DedupIndex(path)
+        assert len(index.filter_new([_sample("a"), _sample("b")], "v1")) == 2
+        index.flush()
+
+        index = DedupIndex(path)
+        kept = index.filter_new([_sample("a"), _sample("c"), _sample("c")], "v2")
+        assert kept == [_sample("c")]
+
+    def test_rerun_same_version_is_idempotent(self, tmp_path):
+        index = DedupIndex(tmp_path / "index.bin")
+        samples = [_sample("a"), _sample("b")]
+        index.filter_new(samples, "v1")
+        index.flush()
+        assert DedupIndex(tmp_path / "index.bin").filter_new(samples, "v1") == samples
+
+    def test_since_version(self, tmp_path):
+        index = DedupIndex(tmp_path / "index.bin")
+        index.filter_new([_sample("a")], "v1")
+        index.filter_new([_sample("b")], "v2")
+        kept = index.filter_new([_sample("a"), _sample("b"), _sample("c")], "v3", since="v1")
+        assert kept == [_sample("b"), _sample("c")]
+
+    def test_unknown_since_version(self, tmp_path):
+        index = DedupIndex(tmp_path / "index.bin")
+        with pytest.raises(ValueError):
+            index.filter_new([_sample("a")], "v1", since="v0")
+
+    def test_ignores_torn_record(self, tmp_path):
+        path = tmp_path / "index.bin"
+        index = DedupIndex(path)
+        index.filter_new([_sample("a")], "v1")
+        index.flush()
+        with open(path, "ab") as f:
+            f.write(b"\x01\x02\x03")
+        assert len(DedupIndex(path)) == 1
+
+    def test_stats(self, tmp_path):
+        index = DedupIndex(tmp_path / "index.bin")
+        index.filter_new([_sample("a"), _sample("b")], "v1")
+        index.filter_new([_sample("c")], "v2")
+        assert index.stats()["per_version"] == {"v1": 2, "v2": 1}
+
+    def test_concurrent_producers_share_version_ordinals(self, tmp_path):
+        path = tmp_path / "index.bin"
+        first, second = DedupIndex(path), DedupIndex(path)
+        a, b = (content_hash(_sample(t)["conversations"]) for t in "ab")
+        first.add(a, "v1")
+        second.add(b, "v2")
+        first.flush()
+        second.flush()
+
+        reloaded = DedupIndex(path)
+        assert reloaded.versions == ["v1", "v2"]
+        assert reloaded.first_seen(a) == "v1"
+        assert reloaded.first_seen(b) == "v2"
+
+    def test_same_day_producers_dedup_each_other(self, tmp_path):
+        index = DedupIndex(tmp_path / "index.bin")
+        first, second = default_version("pipeline"), default_version("build_v2")
+        assert first != second
+        assert index.filter_new([_sample("a")], first) == [_sample("a")]
+        assert index.filter_new([_sample("a"), _sample("b")], second) == [_sample("b")]
@@ -2,7 +2,17 @@
 
 import hashlib
 import pytest
-from data.transform.deduplicator import deduplicate, content_hash
+from data.transform.deduplicator import (
+    content_hash,
+    deduplicate,
+    fingerprint_turns,
+    lsh_params,
+    near_deduplicate,
+    normalize_volatile,
+    overlap_deduplicate,
+    shingle_hashes,
+    turn_fingerprint,
+)
 
 
 class TestDeduplicator:
@@ -141,4 +151,125 @@ class TestDeduplicator:
             {"from": "gpt", "value": "Second"},
             {"from": "gpt", "value": "First"}
         ]
-        assert content_hash(conv1) != content_hash(conv2)
\ No newline at end of file
+        assert content_hash(conv1) != content_hash(conv2)
+
+def _patrol(bead, polecat, ts, role="witness", extra=""):
+    text = (
+        f"Checked {bead} at {ts}. gastown/polecats/{polecat} is working, last activity 3 minutes ago. "
+        f"No nudge needed; mail inbox empty, refinery queue idle, patrol report filed. {extra}"
+    )
+    return {"conversations": [{"from": "gpt", "value": text}], "metadata": {"role": role}}
+
+
+class TestNearDeduplicator:
+    def test_normalize_volatile(self):
+        a = normalize_volatile("gt-4tp at 2026-01-02T10:11:12Z by gastown/polecats/furiosa, commit 3f9a2c1")
+        b = normalize_volatile("hq-3mn2 at 2026-02-03T09:00:01Z by gastown/polecats/nux, commit 0be77d4")
+        assert a == b
+        assert "gastown/polecats/<agent>" in a
+
+    def test_normalize_volatile_numbers(self):
+        a = normalize_volatile("idle 12m (3 minutes since nudge), PR #41, pid 4242 at 1760000000")
+        b = normalize_volatile("idle 7m (45 minutes since nudge), PR #9, pid 77 at 1760003600")
+        assert a == b == "idle <dur> (<dur> since nudge), PR #<n>, pid <n> at <ts>"
+
+    def test_normalize_keeps_content_numbers_and_paths(self):
+        text = "3 tests failed in src/app.py line 42, exit code 1; see docs/setup and gastown/witness"
+        assert normalize_volatile(text) == text
+
+    def test_normalize_keeps_plain_words(self):
+        assert normalize_volatile("re-run the patrol, defaced") == "re-run the patrol, defaced"
+
+    def test_shingles_ignore_human_turns(self):
+        pytest.importorskip("numpy")
+        conv1 = [{"from": "human", "value": "a"}, {"from": "gpt", "value": "one two three four five six"}]
+        conv2 = [{"from": "human", "value": "b"}, {"from": "gpt", "value": "one two three four five six"}]
+        assert list(shingle_hashes(conv1)) == list(shingle_hashes(conv2))
+        assert len(shingle_hashes(conv1)) == 2
+        assert len(shingle_hashes([{"from": "gpt", "value": "short"}])) == 1
+
+    def test_lsh_params(self):
+        bands, rows = lsh_params(0.85, 128)
+        assert bands * rows == 128
+        assert (1 / bands) ** (1 / rows) <= 0.85
+
+    def test_collapses_volatile_variants(self):
+        pytest.importorskip("numpy")
+        samples = [
+            _patrol("gt-4tp", "furiosa", "2026-01-02T10:11:12Z"),
+            _patrol("hq-3mn2", "nux", "2026-01-03T08:00:00Z"),
+            _patrol("bcc-8rlwh", "rust", "2026-01-04T07:30:00Z"),
+            _patrol("gt-4tp", "furiosa", "2026-01-02T10:11:12Z", role="deacon",
+                    extra="Escalated a stuck merge to the mayor with full context and a proposed fix."),
+        ]
+        kept, stats = near_deduplicate(samples, threshold=0.8)
+        assert kept == [samples[0], samples[3]]
+        assert stats["witness"] == {"samples": 3, "kept": 1, "removed": 2, "clusters": 1, "max_cluster_size": 3}
+        assert stats["deacon"]["kept"] == 1
+
+    def test_distinct_samples_kept(self):
+        pytest.importorskip("numpy")
+        samples = [
+            {"conversations": [{"from": "gpt", "value": f"response about topic {w} with unique words {w}{w}"}]}
+            for w in ("alpha", "bravo", "charlie", "delta")
+        ]
+        kept, stats = near_deduplicate(samples)
+        assert kept == samples
+        assert stats["unknown"]["removed"] == 0
+
+    def test_empty(self):
+        assert near_deduplicate([]) == ([], {})
+
+
+class TestOverlapDeduplicator:
+    def _chunk(self, *texts, role="mayor"):
+        conv = []
+        for t in texts:
+            conv += [{"from": "human", "value": "next"}, {"from": "gpt", "value": t}]
+        return {"conversations": conv, "metadata": {"role": role}}
+
+    def test_half_overlap_kept(self):
+        samples = [self._chunk("a" * 40, "b" * 40), self._chunk("b" * 40, "c" * 40)]
+        kept, stats = overlap_deduplicate(samples, threshold=0.8)
+        assert len(kept) == 2
+        assert kept[1]["metadata"]["overlap_coverage"] == 0.5
+        assert stats["mayor"] == {"samples": 2, "dropped": 0}
+
+    def test_covered_chunk_dropped(self):
+        samples = [
+            self._chunk("hook check " * 10, "mail check " * 10, "real work"),
+            self._chunk("hook check " * 10, "mail check " * 10, "x"),
+        ]
+        kept, stats = overlap_deduplicate(samples, threshold=0.8)
+        assert kept == [samples[0]]
+        assert stats["mayor"]["dropped"] == 1
+
+    def test_coverage_is_token_weighted(self):
+        samples = [self._chunk("short"), self._chunk("short", "a much longer unique assistant answer " * 5)]
+        kept, _ = overlap_deduplicate(samples, threshold=0.5)
+        assert len(kept) == 2
+
+    def test_fingerprints_from_metadata_computed_once_per_turn(self):
+        from data.extract.sessions import Turn
+
+        turns = [Turn(role="user", content="go"), Turn(role="assistant", content="done " * 20)]
+        memo = {}
+        calls = []
+
+        def count(text):
+            calls.append(text)
+            return 7
+
+        fp1 = fingerprint_turns(turns, memo, count)
+        fp2 = fingerprint_turns(turns, memo, count)
+        assert fp1 == fp2 == [(turn_fingerprint("done " * 20), 7)]
+        assert len(calls) == 1
+
+        samples = []
+        for fps in (fp1, fp2):
+            sample = self._chunk("ignored")
+            sample["metadata"]["turn_fingerprints"] = fps
+            samples.append(sample)
+        kept, _ = overlap_deduplicate(samples)
+        assert len(kept) == 1
+        assert "turn_fingerprints" not in kept[0]["metadata"]
@@ -0,0 +1,95 @@
+"""Unit tests for entropy_detector.py covering candidate runs, allowlists and scanning."""
+
+import json
+
+import pytest
+from data.transform.entropy_detector import candidate_runs, entropy_threshold, is_allowlisted
+
+TOKEN = "Xq7vR2mK9pL4sT8wZ1nB6yC3hF5jD0gA"  # 32 chars, all distinct
+
+
+class TestCandidates:
+    def test_allowlist(self):
+        assert is_allowlisted("123e4567-e89b-12d3-a456-426614174000")  # UUID
+        assert is_allowlisted("bcc-wisp-2fgi4p")
+        assert is_allowlisted("GOOGLE_ACCESS_TOKEN_REDACTED")
+        assert not is_allowlisted(TOKEN)
+
+    def test_allowlist_common_ids(self):
+        assert is_allowlisted("claude-3-5-sonnet-20241022")
+        assert is_allowlisted("msg_01XFDUDYJgAACzvnptvVoYEL")
+        assert is_allowlisted("toolu_01A09q90qw90lq917835lq9")
+        assert is_allowlisted("_trim_to_token_budget123")
+        assert not is_allowlisted("a8f3k2j9d7s6l5q4w3e2r1t0y9u8")
+
+    def test_candidate_runs(self):
+        text = f"auth {TOKEN} at /home/ubuntu/gt/mayor/rig/training/rejection_to_lora.py"
+        assert candidate_runs(text) == [(5, 5 + len(TOKEN))]
+
+    def test_git_sha_only_in_commit_context(self):
+        sha = "a94a8fe5ccb19ba61c4c0873d391e987982fbbd3"
+        assert candidate_runs(f"commit {sha}") == []
+        assert candidate_runs(f"ran git show {sha} --stat") == []
+        assert candidate_runs(f"[main {sha}] Fix merge queue") == []
+        assert candidate_runs(f"commit abc\nkey {sha}") == [(15, 55)]
+        key = "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08"  # hex(32 bytes)
+        assert candidate_runs(f"commit {key}") == [(7, 71)]
+        assert candidate_runs("d41d8cd98f00b204e9800998ecf8427e") == [(0, 32)]
+
+    def test_runs_need_letters_and_digits(self):
+        assert candidate_runs("a_very_long_snake_case_identifier_name") == []
+        assert candidate_runs("1234567890123456789012345678") == []
+
+    def test_threshold_scales_with_length(self):
+        assert entropy_threshold(24, "base64") < entropy_threshold(64, "base64")
+        assert entropy_threshold(64, "hex") == pytest.approx(0.8 * 4)
+
+
+class TestEntropy:
+    def test_shannon_entropy(self):
+        np = pytest.importorskip("numpy")
+        from data.transform.entropy_detector import shannon_entropy
+
+        result = shannon_entropy(["aaaa", "abcd", "aabb"])
+        assert np.allclose(result, [0.0, 2.0, 1.0])
+
+    def test_find_high_entropy(self):
+        pytest.importorskip("numpy")
+        from data.transform.entropy_detector import find_high_entropy
+
+        texts = ["no secrets here", f"export INTERNAL={TOKEN}", "test_pretokenized_dataset_roundtrip2"]
+        hits = find_high_entropy(texts)
+        assert len(hits) == 1
+        assert hits[0].text_index == 1
+        assert texts[1][hits[0].start:hits[0].end] == TOKEN
+        assert hits[0].kind == "base64"
+
+    def test_scan_file_reports_locations(self, tmp_path):
+        pytest.importorskip("numpy")
+        from data.transform.entropy_detector import scan_file
+
+        path = tmp_path / "train.jsonl"
+        samples = [
+            {"conversations": [{"from": "human", "value": "hi"}, {"from": "gpt", "value": "ok"}]},
+            {"conversations": [{"from": "human", "value": "go"}, {"from": "gpt", "value": f"using {TOKEN}"}]},
+        ]
+        path.write_text("".join(json.dumps(s) + "\n" for s in samples))
+        hits = scan_file(path)
+        assert len(hits) == 1
+        assert (hits[0]["file"], hits[0]["line"], hits[0]["message"], hits[0]["from"]) == (str(path), 2, 1, "gpt")
+        assert TOKEN not in hits[0]["preview"]
+
+    def test_cli_reports_without_failing(self, tmp_path, monkeypatch):
+        pytest.importorskip("numpy")
+        from data.transform import entropy_detector
+
+        path = tmp_path / "train.jsonl"
+        sample = {"conversations": [{"from": "human", "value": "go"}, {"from": "gpt", "value": f"using {TOKEN}"}]}
+        path.write_text(json.dumps(sample) + "\n")
+
+        monkeypatch.setattr("sys.argv", ["entropy_detector", str(path)])
+        entropy_detector.main()
+
+        monkeypatch.setattr("sys.argv", ["entropy_detector", str(path), "--strict"])
+        with pytest.raises(SystemExit):
+            entropy_detector.main()
@@ -0,0 +1,43 @@
+"""Unit tests for packing.py covering best-fit-decreasing bin packing."""
+
+import pytest
+from data.transform.packing import pack_lengths, packing_efficiency
+
+
+class TestPacking:
+    def test_perfect_fit(self):
+        bins = pack_lengths([3000, 1096, 2048, 2048], 4096)
+        assert len(bins) == 2
+        assert sorted(sorted(b) for b in bins) == [[0, 1], [2, 3]]
+
+    def test_every_sample_placed_once(self):
+        lengths = [100, 4000, 50, 2000, 2000, 96, 3900]
+        bins = pack_lengths(lengths, 4096)
+        placed = sorted(i for b in bins for i in b)
+        assert placed == list(range(len(lengths)))
+        for b in bins:
+            assert sum(lengths[i] for i in b) <= 4096
+
+    def test_best_fit_prefers_tightest_bin(self):
+        # 3000 and 3500 open two bins; 500 must go into the 3500 bin (tightest fit).
+        bins = pack_lengths([3500, 3000, 500], 4096)
+        assert len(bins) == 2
+        bin_with_500 = next(b for b in bins if 2 in b)
+        assert 0 in bin_with_500
+
+    def test_efficiency(self):
+        result = packing_efficiency([2048, 2048, 1024], 4096)
+        assert result["bins"] == 2
+        assert result["useful_tokens"] == 5120
+        assert result["efficiency"] == pytest.approx(5120 / 8192, abs=1e-4)
+
+    def test_oversized_samples_are_truncated(self):
+        result = packing_efficiency([5000, 100], 4096)
+        assert result["truncated_samples"] == 1
+        assert result["truncated_tokens"] == 904
+        assert result["useful_tokens"] == 4196
+
+    def test_empty(self):
+        result = packing_efficiency([], 4096)
+        assert result["bins"] == 0
+        assert result["efficiency"] == 0.0
@@ -0,0 +1,66 @@
+"""Unit tests for pretokenized.py covering the memmap round trip."""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from data.transform.chatml import encode_conversations
+from data.transform.pretokenized import (
+    PretokenizedDataset,
+    export_pretokenized,
+    export_pretokenized_by_role,
+)
+from data.transform.test_chatml import CONV, CharTokenizer
+
+
+def _sample(role, text):
+    return {
+        "conversations": [
+            {"from": "system", "value": "sys"},
+            {"from": "human", "value": "q"},
+            {"from": "gpt", "value": text},
+        ],
+        "metadata": {"role": role},
+    }
+
+
+class TestPretokenized:
+    def test_round_trip(self, tmp_path):
+        tok = CharTokenizer()
+        samples = [_sample("witness", "short"), _sample("witness", "a longer answer")]
+        meta = export_pretokenized(samples, tok, tmp_path, "witness_train", "char")
+
+        ds = PretokenizedDataset(tmp_path, "witness_train")
+        assert len(ds) == 2
+        assert ds.meta == meta
+        expected = encode_conversations([s["conversations"] for s in samples], tok)
+        for i, (ids, labels) in enumerate(expected):
+            item = ds[i]
+            assert item["input_ids"].dtype == np.uint32
+            assert item["input_ids"].tolist() == ids
+            assert item["labels"].tolist() == labels
+        assert ds.lengths().tolist() == [len(ids) for ids, _ in expected]
+
+    def test_arrays_are_memory_mapped(self, tmp_path):
+        export_pretokenized([_sample("witness", "x")], CharTokenizer(), tmp_path, "w")
+        ds = PretokenizedDataset(tmp_path, "w")
+        assert isinstance(ds.tokens, np.memmap)
+        assert not ds[0]["input_ids"].flags.writeable
+
+    def test_negative_and_out_of_range_index(self, tmp_path):
+        export_pretokenized([_sample("witness", "x"), _sample("witness", "y")], CharTokenizer(), tmp_path, "w")
+        ds = PretokenizedDataset(tmp_path, "w")
+        assert ds[-1]["input_ids"].tolist() == ds[1]["input_ids"].tolist()
+        with pytest.raises(IndexError):
+            ds[2]
+
+    def test_trainable_tokens(self, tmp_path):
+        meta = export_pretokenized([{"conversations": CONV}], CharTokenizer(), tmp_path, "c")
+        assert meta["trainable_tokens"] == 3  # "o", "k", <|im_end|>
+
+    def test_by_role(self, tmp_path):
+        samples = [_sample("witness", "a"), _sample("refinery", "b"), _sample("witness", "c")]
+        metas = export_pretokenized_by_role(samples, tmp_path, "val", "char", tokenizer=CharTokenizer())
+        assert sorted(metas) == ["refinery", "witness"]
+        assert metas["witness"]["samples"] == 2
+        assert PretokenizedDataset(tmp_path, "refinery_val").meta["samples"] == 1
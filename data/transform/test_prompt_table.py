@@ -0,0 +1,82 @@
+"""Unit tests for prompt_table.py covering the compact dataset format."""
+
+import json
+
+from data.transform.prompt_table import (
+    PromptTable,
+    compact_path_for,
+    compact_sample,
+    expand_sample,
+    expanded_path_for,
+    is_compact_sample,
+    iter_expanded,
+    prompt_id,
+    table_path_for,
+    write_compact_jsonl,
+)
+
+SYSTEM = "[GAS TOWN ROLE: witness] You monitor polecats."
+
+
+def _sample(human="check polecats", gpt="all healthy", role="witness"):
+    return {
+        "conversations": [
+            {"from": "system", "value": SYSTEM},
+            {"from": "human", "value": human},
+            {"from": "gpt", "value": gpt},
+        ],
+        "metadata": {"role": role},
+    }
+
+
+class TestPromptTable:
+    def test_id_is_stable(self):
+        assert prompt_id(SYSTEM) == prompt_id(SYSTEM)
+        assert prompt_id(SYSTEM) != prompt_id(SYSTEM + " ")
+        assert prompt_id(SYSTEM).startswith("sp-")
+
+    def test_compact_round_trip(self):
+        table = PromptTable()
+        sample = _sample()
+        compact = compact_sample(sample, table)
+        assert is_compact_sample(compact)
+        assert "value" not in compact["conversations"][0]
+        assert compact["conversations"][1:] == sample["conversations"][1:]
+        assert len(table) == 1
+        assert expand_sample(compact, table) == _sample()
+
+    def test_plain_sample_passes_through(self):
+        sample = _sample()
+        assert not is_compact_sample(sample)
+        assert expand_sample(sample, PromptTable()) == _sample()
+
+    def test_unknown_id_left_unresolved(self):
+        sample = {"conversations": [{"from": "system", "prompt_id": "sp-missing"}]}
+        expand_sample(sample, PromptTable())
+        assert sample["conversations"][0] == {"from": "system", "prompt_id": "sp-missing"}
+
+    def test_paths(self, tmp_path):
+        plain = tmp_path / "witness_train.jsonl"
+        compact = compact_path_for(plain)
+        assert compact.name == "witness_train.compact.jsonl"
+        assert table_path_for(compact).name == "witness_train.compact.prompts.json"
+        assert expanded_path_for(compact) == plain
+
+
+class TestCompactFiles:
+    def test_write_and_expand(self, tmp_path):
+        samples = [_sample(human=f"q{i}") for i in range(5)]
+        path = tmp_path / "witness_train.compact.jsonl"
+        assert write_compact_jsonl(samples, path) == 5
+
+        table = json.loads(table_path_for(path).read_text())
+        assert table == {prompt_id(SYSTEM): SYSTEM}
+        assert SYSTEM not in path.read_text()
+
+        assert list(iter_expanded(path)) == [_sample(human=f"q{i}") for i in range(5)]
+
+    def test_for_dataset_without_sidecar(self, tmp_path):
+        path = tmp_path / "plain.jsonl"
+        path.write_text(json.dumps(_sample()) + "\n")
+        assert len(PromptTable.for_dataset(path)) == 0
+        assert list(iter_expanded(path)) == [_sample()]
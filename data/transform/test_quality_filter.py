@@ -3,6 +3,7 @@
 import pytest
 from data.transform.quality_filter import (
     assess_turns,
+    TurnFeatures,
     _is_boilerplate,
     MIN_SUBSTANTIVE_TURNS,
     MIN_CONTENT_LENGTH
@@ -151,4 +152,39 @@ class TestQualityFilter:
         ]
         result = assess_turns(turns)
         assert result.keep is False
-        assert result.reason == "content too short"
\ No newline at end of file
+        assert result.reason == "content too short"
+
+class TestTurnFeatures:
+    def _session(self):
+        turns = []
+        for i in range(12):
+            turns.append(Turn(role="user", content="Mayor, checking in." if i % 4 == 0 else f"Please look at issue {i} " * (i + 1)))
+            turns.append(Turn(role="assistant", content=f"Working on item {i} " * (3 * i),
+                              tool_calls=[{"name": "Bash"}] * (i % 3)))
+            turns.append(Turn(role="user", content=f'<tool_result tool_use_id="t{i}">\nok\n</tool_result>',
+                              tool_results=[{"tool_use_id": f"t{i}", "content": "ok"}] if i % 2 else []))
+        return turns
+
+    @pytest.mark.parametrize("outcome_score", [None, 0.42])
+    def test_windows_match_assess_turns(self, outcome_score):
+        turns = self._session()
+        features = TurnFeatures(turns)
+        for start in range(len(turns)):
+            for end in range(start, len(turns) + 1):
+                window = turns[start:end]
+                assert features.assess(window, outcome_score) == assess_turns(list(window), outcome_score)
+
+    def test_prefix_sums(self):
+        turns = self._session()
+        features = TurnFeatures(turns)
+        assert features.tool_calls[-1] == sum(len(t.tool_calls or []) for t in turns)
+        assert features.content_len[-1] == sum(len(t.content.strip()) for t in turns)
+
+    def test_non_contiguous_turns_fall_back(self):
+        turns = self._session()
+        features = TurnFeatures(turns)
+        picked = turns[0:6:2]
+        assert features.window(picked) is None
+        assert features.assess(picked) == assess_turns(picked)
+        foreign = [Turn(role="user", content="x" * 300), Turn(role="assistant", content="y" * 300)]
+        assert features.assess(foreign) == assess_turns(foreign)
@@ -2,7 +2,17 @@
 
 import pytest
 from pathlib import Path
-from data.transform.role_tagger import tag_role, role_from_path, role_from_content
+from data.transform.role_tagger import (
+    CONTENT_AGREEMENT,
+    RoleCache,
+    _DIR_PATTERNS,
+    directory_role_counts,
+    load_role_map,
+    role_from_content,
+    role_from_dir_name,
+    role_from_path,
+    tag_role,
+)
 
 
 class TestRoleTagger:
@@ -70,4 +80,64 @@ class TestRoleTagger:
     def test_path_takes_precedence_over_content(self):
         path = Path("/home/ubuntu/gt/-home-ubuntu-gt-mayor/session.jsonl")
         content = "[GAS TOWN] polecat <- human"
-        assert tag_role(path, content) == "mayor"
\ No newline at end of file
+        assert tag_role(path, content) == "mayor"
+
+class TestRoleCache:
+    DIRS = [
+        "-home-ubuntu-gt-deacon-dogs-boot",
+        "-home-ubuntu-gt-deacon-dogs-alpha",
+        "-home-ubuntu-gt-deacon",
+        "-home-ubuntu-gt-mayor",
+        "-home-ubuntu-gt-rig-witness",
+        "-home-ubuntu-gt-rig-refinery-rig",
+        "-home-ubuntu-gt-rig-crew-dev-rig",
+        "-home-ubuntu-gt-rig-polecats-nux-rig",
+        "-home-ubuntu-gt-rig-crew-deacon",
+        "-home-ubuntu-gt-mayor-polecats-x-witness",
+        "-unknown",
+    ]
+
+    def test_combined_regex_matches_pattern_order(self):
+        for name in self.DIRS:
+            expected = next((role for pattern, role in _DIR_PATTERNS if pattern.search(name)), None)
+            assert role_from_dir_name(name) == expected
+
+    def test_dir_lookup(self):
+        cache = RoleCache()
+        paths = [Path(f"/p/{d}/s{i}.jsonl") for d in self.DIRS for i in range(3)]
+        cache.add_paths(paths)
+        assert len(cache.dir_roles) == len(self.DIRS)
+        for path in paths:
+            assert cache.tag(path) == tag_role(path)
+        assert cache.content_checks == 0
+
+    def test_content_fallback_cached_when_sessions_agree(self):
+        cache = RoleCache()
+        path = Path("/p/-unknown/s.jsonl")
+        for _ in range(CONTENT_AGREEMENT):
+            assert cache.tag(path, "[GAS TOWN] polecat <- witness") == "polecat"
+        assert cache.role_map()["-unknown"] == "polecat"
+        checks = cache.content_checks
+        assert cache.tag(path, "no marker here") == "polecat"
+        assert cache.content_checks == checks
+
+    def test_disagreeing_content_stays_per_session(self):
+        cache = RoleCache()
+        path = Path("/p/-unknown/s.jsonl")
+        assert cache.tag(path, "[GAS TOWN] polecat <- witness") == "polecat"
+        assert cache.tag(path, "[GAS TOWN] mayor <- human") == "mayor"
+        for _ in range(CONTENT_AGREEMENT):
+            assert cache.tag(path, "[GAS TOWN] polecat <- witness") == "polecat"
+        assert cache.tag(path, "no marker here") == "unknown"
+        assert cache.role_map()["-unknown"] == "mixed"
+
+    def test_save_and_load(self, tmp_path):
+        cache = RoleCache()
+        cache.add_paths([Path(f"/p/{d}/s.jsonl") for d in self.DIRS])
+        out = tmp_path / "role_map.json"
+        cache.save(out)
+        role_map = load_role_map(out)
+        assert role_map == cache.role_map()
+        counts = directory_role_counts(role_map)
+        assert counts["deacon"] == 3
+        assert counts["unknown"] == 1
@@ -0,0 +1,157 @@
+"""Unit tests for token_counter.py covering memoization and the persistent cache."""
+
+import json
+
+from data.extract.sessions import Turn
+from data.transform.chunker import chunk_turns
+from data.transform.token_counter import (
+    CHATML_MESSAGE_OVERHEAD,
+    TokenCounter,
+    approx_tokens,
+    default_cache_path,
+    make_counter,
+)
+from data.validate.stats import compute_stats
+
+
+class FakeTokenizer:
+    """Whitespace tokenizer that records how many texts it encoded."""
+
+    def __init__(self):
+        self.encoded = 0
+        self.calls = 0
+
+    def __call__(self, texts, add_special_tokens=False):
+        self.calls += 1
+        self.encoded += len(texts)
+        return {"input_ids": [t.split() for t in texts]}
+
+
+class TestTokenCounter:
+    def test_approximate_mode(self):
+        counter = make_counter(None)
+        assert not counter.exact
+        assert counter.count("A" * 40) == 10
+        assert counter.cache_path is None
+
+    def test_exact_counts(self, tmp_path):
+        counter = TokenCounter("fake", cache_path=tmp_path / "c.jsonl", tokenizer=FakeTokenizer())
+        assert counter.count_many(["a b c", "d e"]) == [3, 2]
+
+    def test_memoized_within_run(self, tmp_path):
+        tok = FakeTokenizer()
+        counter = TokenCounter("fake", cache_path=tmp_path / "c.jsonl", tokenizer=tok)
+        counter.count_many(["a b", "a b", "c"])
+        counter.count_many(["a b", "c"])
+        assert tok.encoded == 2
+        assert counter.stats()["misses"] == 2
+        assert counter.stats()["hits"] == 3
+
+    def test_batches_misses(self, tmp_path):
+        tok = FakeTokenizer()
+        counter = TokenCounter("fake", cache_path=tmp_path / "c.jsonl", tokenizer=tok, batch_size=2)
+        counter.count_many([f"t{i}" for i in range(5)])
+        assert tok.calls == 3
+
+    def test_persistent_cache_skips_tokenizer(self, tmp_path):
+        path = tmp_path / "c.jsonl"
+        first = TokenCounter("fake", cache_path=path, tokenizer=FakeTokenizer())
+        first.count_many(["one two three", "four"])
+        assert first.save() == 2
+        assert first.save() == 0  # Nothing new to append.
+
+        # No tokenizer available: every lookup must come from the cache.
+        second = TokenCounter("fake", cache_path=path, tokenizer=None)
+        assert second.count_many(["one two three", "four"]) == [3, 1]
+        assert second.stats()["hit_rate"] == 1.0
+
+    def test_corrupt_cache_lines_ignored(self, tmp_path):
+        path = tmp_path / "c.jsonl"
+        path.write_text('{"h": "abc", "n": 3}\nnot json\n{"h": "x"}\n')
+        counter = TokenCounter("fake", cache_path=path, tokenizer=FakeTokenizer())
+        assert counter.stats()["cached_texts"] == 1
+
+    def test_count_conversation_adds_chatml_overhead(self, tmp_path):
+        counter = TokenCounter("fake", cache_path=tmp_path / "c.jsonl", tokenizer=FakeTokenizer())
+        conversations = [
+            {"from": "system", "value": "sys prompt"},
+            {"from": "human", "value": "hi"},
+            {"from": "gpt", "value": "hello there friend"},
+        ]
+        assert counter.count_conversation(conversations) == 6 + 3 * CHATML_MESSAGE_OVERHEAD
+
+    def test_take_new_and_merge(self, tmp_path):
+        parent = TokenCounter("fake", cache_path=tmp_path / "c.jsonl", tokenizer=FakeTokenizer())
+        worker = TokenCounter("fake", cache_path=tmp_path / "c.jsonl", tokenizer=FakeTokenizer())
+        parent.count("a b")
+        worker.count_many(["a b", "c d e"])
+        parent.merge(worker.take_new())
+        assert worker.save() == 0
+        assert parent.save() == 2
+        assert TokenCounter("fake", cache_path=tmp_path / "c.jsonl", tokenizer=FakeTokenizer()).stats()["cached_texts"] == 2
+
+    def test_parallel_stats_save_counts_once(self, tmp_path):
+        path = tmp_path / "d.jsonl"
+        path.write_text("".join(
+            json.dumps({"conversations": [{"from": "human", "value": "go"}, {"from": "gpt", "value": f"w {i}"}],
+                        "metadata": {"role": "witness"}}) + "\n"
+            for i in range(40)
+        ))
+        cache = tmp_path / "c.jsonl"
+        serial = compute_stats(path, TokenCounter("fake", cache_path=tmp_path / "s.jsonl", tokenizer=FakeTokenizer()))
+        parallel = compute_stats(path, TokenCounter("fake", cache_path=cache, tokenizer=FakeTokenizer()), workers=2)
+        assert parallel == serial
+        assert len(cache.read_text().splitlines()) == 41  # "go" plus each reply
+
+    def test_default_cache_path_slug(self):
+        path = default_cache_path("Qwen/Qwen2.5-7B-Instruct")
+        assert path.name == "token_counts-Qwen--Qwen2.5-7B-Instruct.jsonl"
+
+    def test_approx_tokens(self):
+        assert approx_tokens("abcdefgh") == 2
+
+
+class TestChunkerTokenBudget:
+    def test_token_budget_trims_window(self, tmp_path):
+        counter = TokenCounter("fake", cache_path=tmp_path / "c.jsonl", tokenizer=FakeTokenizer())
+        turns = [
+            Turn(role="user" if i % 2 == 0 else "assistant", content=" ".join(["w"] * 10))
+            for i in range(20)
+        ]
+        chunks = chunk_turns(turns, window_size=8, stride=4, token_counter=counter, max_tokens=45)
+        for chunk in chunks:
+            assert sum(counter.count(t.content) for t in chunk.turns) <= 45
+            assert len(chunk.turns) == 4
+
+    def test_token_budget_ignores_char_budget(self, tmp_path):
+        counter = TokenCounter("fake", cache_path=tmp_path / "c.jsonl", tokenizer=FakeTokenizer())
+        # Few tokens but many characters: char budget would trim, token budget must not.
+        turns = [
+            Turn(role="user" if i % 2 == 0 else "assistant", content="x" * 5000)
+            for i in range(10)
+        ]
+        chunks = chunk_turns(turns, window_size=4, stride=2, max_chars=100, token_counter=counter, max_tokens=100)
+        assert [len(c.turns) for c in chunks] == [4, 4, 4, 4, 2]
+
+    def test_short_session_is_budgeted(self, tmp_path):
+        counter = TokenCounter("fake", cache_path=tmp_path / "c.jsonl", tokenizer=FakeTokenizer())
+        turns = [
+            Turn(role="user" if i % 2 == 0 else "assistant", content=" ".join(["w"] * 10))
+            for i in range(6)
+        ]
+        chunks = chunk_turns(turns, token_counter=counter, max_tokens=45)
+        assert len(chunks) == 1
+        assert len(chunks[0].turns) == 4
+
+    def test_reserved_tokens_and_framing(self, tmp_path):
+        counter = TokenCounter("fake", cache_path=tmp_path / "c.jsonl", tokenizer=FakeTokenizer())
+        turns = [
+            Turn(role="user" if i % 2 == 0 else "assistant", content=" ".join(["w"] * 10))
+            for i in range(20)
+        ]
+        # 100 - 20 system tokens - 5 system framing leaves 75: five turns of 10 + 5.
+        chunks = chunk_turns(
+            turns, window_size=8, stride=4, token_counter=counter, max_tokens=100,
+            reserved_tokens=20, turn_overhead=CHATML_MESSAGE_OVERHEAD,
+        )
+        assert [len(c.turns) for c in chunks] == [5, 5, 5, 5, 4]
@@ -1,12 +1,18 @@
 """Unit tests for tool_normalizer.py covering truncation, cleaning, and normalization."""
 
 import pytest
+from data.extract.sessions import Turn
 from data.transform.tool_normalizer import (
     truncate_tool_result,
     clean_tool_result,
+    normalize_turn,
     normalize_turn_content,
+    render_tool_result,
+    smart_truncate,
+    _summarize_diff,
     DEFAULT_MAX_RESULT_CHARS
 )
+from data.transform.token_counter import approx_tokens
 
 
 class TestToolNormalizer:
@@ -91,4 +97,112 @@ End"""
     def test_default_max_chars_used(self):
         content = "A" * (DEFAULT_MAX_RESULT_CHARS + 100)
         result = truncate_tool_result(content)
-        assert len(result) <= DEFAULT_MAX_RESULT_CHARS + 20
\ No newline at end of file
+        assert len(result) <= DEFAULT_MAX_RESULT_CHARS + 20
+
+class TestStructuredNormalization:
+    def _turn(self, texts, results):
+        content = "\n".join(list(texts) + [render_tool_result(tid, body) for tid, body in results])
+        tool_results = [{"tool_use_id": tid, "content": body, "is_error": False} for tid, body in results]
+        return Turn(role="user", content=content, tool_results=tool_results)
+
+    def test_matches_string_normalization(self):
+        turn = self._turn(["Regular text"], [("t1", "Shell cwd was reset to /home\n" + "X" * 3000), ("t2", "ok")])
+        expected = normalize_turn_content(turn.content, max_result_chars=1000)
+        normalize_turn(turn, max_result_chars=1000)
+        assert turn.content == expected
+        assert turn.tool_results[0]["content"].startswith("X" * 600)
+        assert turn.tool_results[1]["content"] == "ok"
+
+    def test_result_containing_closing_tag(self):
+        body = "echo '\n</tool_result>' done\nShell cwd was reset to /x"
+        turn = self._turn([], [("t1", body)])
+        normalize_turn(turn)
+        assert turn.content == render_tool_result("t1", "echo '\n</tool_result>' done")
+
+    def test_falls_back_when_content_diverged(self):
+        turn = self._turn(["text"], [("t1", "Shell cwd was reset to /x\nresult")])
+        turn.content = turn.content.replace("\nresult\n", "\nedited result\n")
+        normalize_turn(turn)
+        assert turn.content == 'text\n<tool_result tool_use_id="t1">\nedited result\n</tool_result>'
+
+    def test_turn_without_results_untouched(self):
+        turn = Turn(role="assistant", content="Running gt mail inbox")
+        normalize_turn(turn)
+        assert turn.content == "Running gt mail inbox"
+
+
+class TestSmartTruncate:
+    def test_under_budget_unchanged(self):
+        content = "line one\nline two"
+        assert smart_truncate(content, max_tokens=100) == content
+
+    def test_budget_respected(self):
+        content = "\n".join(f"output {'line ' * (i % 5)}{i}" for i in range(2000))
+        result = smart_truncate(content, max_tokens=200)
+        assert approx_tokens(result) <= 200
+        assert result.startswith("output 0\n")
+        assert result.endswith("output line line line line 1999")
+        assert "lines truncated]" in result
+
+    def test_repeated_lines_collapsed(self):
+        content = "\n".join(["start"] + [f"Downloading chunk {i}/500" for i in range(500)] + ["done"])
+        result = smart_truncate(content, max_tokens=100)
+        assert "Downloading chunk 0/500" in result
+        assert "Downloading chunk 499/500" in result
+        assert "[498 similar lines]" in result
+        assert result.endswith("done")
+
+    def test_traceback_kept(self):
+        noise = [f"step {i}: {'x' * (i % 7)} processing item" for i in range(400)]
+        traceback = [
+            "Traceback (most recent call last):",
+            '  File "app.py", line 12, in main',
+            "    run()",
+            "ValueError: bad config",
+        ]
+        content = "\n".join(noise[:200] + traceback + noise[200:])
+        result = smart_truncate(content, max_tokens=300)
+        for line in traceback:
+            assert line in result
+        assert approx_tokens(result) <= 300
+
+    def test_diff_summarized(self):
+        diff = ["diff --git a/x.py b/x.py", "--- a/x.py", "+++ b/x.py", "@@ -1,3 +1,300 @@"]
+        diff += [f"+added line number {i} of the new module" for i in range(300)]
+        result = smart_truncate("\n".join(diff), max_tokens=100)
+        assert "diff --git a/x.py b/x.py" in result
+        assert "@@ -1,3 +1,300 @@ (+300 -0)" in result
+        assert "added line number 150" not in result
+
+    def test_diff_fills_budget_per_file(self):
+        diff = []
+        for f in range(3):
+            diff += [f"diff --git a/f{f}.py b/f{f}.py", f"--- a/f{f}.py", f"+++ b/f{f}.py", "@@ -1,40 +1,40 @@"]
+            diff += [f"-old {f} line {i}" if i % 2 else f"+new {f} line {i}" for i in range(80)]
+        result = smart_truncate("\n".join(diff), max_tokens=250)
+        for f in range(3):
+            assert f"diff --git a/f{f}.py b/f{f}.py" in result
+            assert f"+new {f} line 0\n-old {f} line 1" in result
+        assert result.count("hunk lines omitted]") == 3
+        assert approx_tokens(result) <= 250
+
+    def test_output_after_diff_kept(self):
+        diff = ["diff --git a/x.py b/x.py", "--- a/x.py", "+++ b/x.py", "@@ -1,2 +1,2 @@",
+                "-a = 1", "+a = 2", " b = 3", "FAILED test_x.py::test_a - AssertionError", "1 failed in 0.1s"]
+        lines = _summarize_diff(diff, max_tokens=10)
+        assert lines[3] == "@@ -1,2 +1,2 @@ (+1 -1)"
+        assert lines[-2:] == ["FAILED test_x.py::test_a - AssertionError", "1 failed in 0.1s"]
+
+    def test_single_huge_line_cut_by_chars(self):
+        result = smart_truncate("A" * 10000, max_tokens=100)
+        assert "... [truncated] ..." in result
+        assert result.startswith("AAAA")
+        assert approx_tokens(result) <= 100
+
+    def test_normalize_turn_smart_mode(self):
+        body = "\n".join(f"line {i}" for i in range(3000))
+        turn = Turn(role="user", content=render_tool_result("t1", body),
+                    tool_results=[{"tool_use_id": "t1", "content": body, "is_error": False}])
+        normalize_turn(turn, truncation="smart", max_result_tokens=150)
+        assert turn.tool_results[0]["content"] == smart_truncate(body, max_tokens=150)
+        assert turn.content == render_tool_result("t1", turn.tool_results[0]["content"])
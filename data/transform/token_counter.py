@@ -0,0 +1,204 @@
+"""Count tokens with the base model's tokenizer, memoized by content hash.
+
+The rest of the pipeline historically estimated tokens as characters / 4.
+That badly undercounts code-heavy tool output, so Axolotl ends up
+truncating samples at sequence_len. TokenCounter uses the real tokenizer
+when one is configured and falls back to the chars/4 estimate otherwise.
+
+Counts are memoized per unique text (sha256 prefix → token count) both in
+memory and in an append-only JSONL cache on disk, so a rebuild over
+mostly unchanged sessions never loads the tokenizer at all. The tokenizer
+itself is only imported on the first cache miss and misses are
+batch-encoded.
+
+Usage:
+    counter = TokenCounter("Qwen/Qwen2.5-7B-Instruct")
+    counts = counter.count_many([turn.content for turn in turns])
+    counter.save()
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Base model from configs/base.yml.
+DEFAULT_TOKENIZER = "Qwen/Qwen2.5-7B-Instruct"
+
+# Fallback estimate when no tokenizer is configured.
+CHARS_PER_TOKEN = 4
+
+# Per-message chatml framing: <|im_start|> role \n ... <|im_end|> \n
+CHATML_MESSAGE_OVERHEAD = 5
+
+# Number of cache misses encoded per tokenizer call.
+DEFAULT_BATCH_SIZE = 64
+
+DEFAULT_CACHE_DIR = Path("output") / "cache"
+
+
+def load_tokenizer(name: str) -> Any:
+    """Load a HuggingFace tokenizer (requires the transformers package)."""
+    from transformers import AutoTokenizer
+
+    logger.info("Loading tokenizer %s", name)
+    return AutoTokenizer.from_pretrained(name, trust_remote_code=True)
+
+
+def approx_tokens(text: str) -> int:
+    """Estimate token count as characters / 4."""
+    return len(text) // CHARS_PER_TOKEN
+
+
+def text_hash(text: str) -> str:
+    """Hash a text for cache lookup (16-hex sha256 prefix)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def default_cache_path(tokenizer_name: str, cache_dir: Path = DEFAULT_CACHE_DIR) -> Path:
+    """Cache file for a tokenizer, e.g. output/cache/token_counts-Qwen--Qwen2.5-7B-Instruct.jsonl."""
+    slug = re.sub(r"[^A-Za-z0-9._-]+", "--", tokenizer_name)
+    return cache_dir / f"token_counts-{slug}.jsonl"
+
+
+class TokenCounter:
+    """Memoized token counter backed by a HuggingFace tokenizer.
+
+    With tokenizer_name=None the counter runs in approximate mode
+    (chars / 4) and never touches disk.
+    """
+
+    def __init__(
+        self,
+        tokenizer_name: str | None = DEFAULT_TOKENIZER,
+        cache_path: Path | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        tokenizer: Any = None,
+    ):
+        self.tokenizer_name = tokenizer_name
+        self.batch_size = batch_size
+        self._tokenizer = tokenizer
+        self._counts: dict[str, int] = {}
+        self._pending: dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+        if tokenizer_name is None:
+            self.cache_path = None
+        else:
+            self.cache_path = cache_path or default_cache_path(tokenizer_name)
+            self._load_cache()
+
+    @property
+    def exact(self) -> bool:
+        """True when counts come from a real tokenizer."""
+        return self.tokenizer_name is not None
+
+    def count(self, text: str) -> int:
+        """Count tokens in a single text."""
+        return self.count_many([text])[0]
+
+    def count_many(self, texts: list[str]) -> list[int]:
+        """Count tokens for a batch of texts, encoding only cache misses."""
+        if not self.exact:
+            return [approx_tokens(t) for t in texts]
+
+        keys = [text_hash(t) for t in texts]
+        missing: dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key in self._counts or key in missing:
+                self.hits += 1
+            else:
+                missing[key] = text
+
+        if missing:
+            self.misses += len(missing)
+            self._encode(missing)
+
+        return [self._counts[k] for k in keys]
+
+    def count_conversation(self, conversations: list[dict]) -> int:
+        """Count tokens for a sharegpt conversation rendered with chatml."""
+        values = [msg.get("value", "") for msg in conversations]
+        return sum(self.count_many(values)) + CHATML_MESSAGE_OVERHEAD * len(values)
+
+    def take_new(self) -> dict[str, int]:
+        """Remove and return the counts computed since the last save."""
+        new, self._pending = self._pending, {}
+        return new
+
+    def merge(self, counts: dict[str, int]) -> None:
+        """Take over counts computed by another copy of this counter (see take_new)."""
+        for key, n in counts.items():
+            if key not in self._counts:
+                self._counts[key] = n
+                self._pending[key] = n
+
+    def save(self) -> int:
+        """Append newly computed counts to the on-disk cache. Returns count written."""
+        if not self._pending or self.cache_path is None:
+            return 0
+
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.cache_path, "a", encoding="utf-8") as f:
+            for key, n in self._pending.items():
+                f.write(json.dumps({"h": key, "n": n}) + "\n")
+
+        written = len(self._pending)
+        self._pending.clear()
+        logger.info("Saved %d token counts to %s", written, self.cache_path)
+        return written
+
+    def stats(self) -> dict:
+        """Cache hit/miss statistics for logging."""
+        lookups = self.hits + self.misses
+        return {
+            "tokenizer": self.tokenizer_name or f"approx (chars/{CHARS_PER_TOKEN})",
+            "cached_texts": len(self._counts),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+    def _encode(self, missing: dict[str, str]) -> None:
+        """Batch-encode texts that are not in the cache."""
+        tokenizer = self._get_tokenizer()
+        items = list(missing.items())
+        for i in range(0, len(items), self.batch_size):
+            batch = items[i:i + self.batch_size]
+            encoded = tokenizer([text for _, text in batch], add_special_tokens=False)["input_ids"]
+            for (key, _), ids in zip(batch, encoded):
+                self._counts[key] = len(ids)
+                self._pending[key] = len(ids)
+
+    def _get_tokenizer(self) -> Any:
+        """Load the tokenizer on first use (only needed on cache misses)."""
+        if self._tokenizer is None:
+            self._tokenizer = load_tokenizer(self.tokenizer_name)
+        return self._tokenizer
+
+    def _load_cache(self) -> None:
+        """Load previously computed counts, skipping malformed lines."""
+        if self.cache_path is None or not self.cache_path.exists():
+            return
+
+        with open(self.cache_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    self._counts[record["h"]] = int(record["n"])
+                except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+                    continue
+        logger.debug("Loaded %d cached token counts from %s", len(self._counts), self.cache_path)
+
+
+def make_counter(tokenizer_name: str | None, cache_path: Path | None = None) -> TokenCounter:
+    """Build a counter from a CLI --tokenizer value ("" or None → approximate)."""
+    return TokenCounter(tokenizer_name or None, cache_path=cache_path)
+
@@ -2,17 +2,44 @@
 
 The session extractor already formats tool calls as XML tags. This module
 provides additional normalization:
-  - Truncate very long tool results (> max_result_tokens chars)
+  - Truncate very long tool results (> max_result_chars chars, or with
+    truncation="smart" a token budget that keeps errors, tracebacks and
+    diff hunk headers and collapses repeated lines)
   - Remove redundant/noisy tool results (bash progress, empty output)
   - Standardize tool names
+
+normalize_turn works on the structured Turn.tool_results built by the
+extractor and re-renders the content once; normalize_turn_content is the
+string-level fallback for content that no longer matches its results.
 """
 
 from __future__ import annotations
 
 import re
 
+from data.extract.sessions import Turn
+from data.transform.token_counter import TokenCounter, approx_tokens
+
 # Default max characters for a single tool result.
 DEFAULT_MAX_RESULT_CHARS = 2000
+# Default token budget for smart truncation (same size as the char budget).
+DEFAULT_MAX_RESULT_TOKENS = DEFAULT_MAX_RESULT_CHARS // 4
+TRUNCATION_MODES = ("chars", "smart")
+
+# Share of the smart-truncation budget for the first and last lines.
+_HEAD_SHARE = 0.3
+_TAIL_SHARE = 0.3
+# Context lines kept around an error line.
+_ERROR_CONTEXT = 2
+# Runs of same-shape lines longer than this are collapsed.
+_MAX_REPEAT = 2
+
+_ERROR_LINE_RE = re.compile(
+    r"Traceback \(most recent call last\)|\b(?:[A-Z]\w*(?:Error|Exception)|ERROR|FAILED|FAIL|panic|fatal|error)\b[:!]?"
+)
+_DIGITS_RE = re.compile(r"\d+")
+_HUNK_RE = re.compile(r"^@@ -\d+(?:,\d+)? \+\d+(?:,\d+)? @@")
+_HUNK_COUNTS_RE = re.compile(r"^@@ -\d+(?:,(\d+))? \+\d+(?:,(\d+))? @@")
 
 # Tool results that are pure noise and should be removed entirely.
 _NOISE_PATTERNS = [
@@ -20,6 +47,12 @@ _NOISE_PATTERNS = [
     re.compile(r"^WARNING: This binary was built with"),
 ]
 
+# All noise patterns as one multiline regex removing whole lines (with their newline).
+_NOISE_LINES_RE = re.compile(
+    r"^(?:" + "|".join(p.pattern.lstrip("^") for p in _NOISE_PATTERNS) + r").*(?:\n|$)",
+    re.MULTILINE,
+)
+
 
 def truncate_tool_result(content: str, max_chars: int = DEFAULT_MAX_RESULT_CHARS) -> str:
     """Truncate a tool result to max_chars, preserving the beginning and end."""
@@ -35,27 +68,229 @@ def truncate_tool_result(content: str, max_chars: int = DEFAULT_MAX_RESULT_CHARS
     return f"{head}\n... [truncated] ...\n{tail}"
 
 
-def clean_tool_result(content: str) -> str:
-    """Remove noise lines from tool result content."""
-    lines = content.split("\n")
-    cleaned = []
+def _collapse_repeats(lines: list[str]) -> list[str]:
+    """Collapse runs of lines that differ only in digits (progress, polling, retries)."""
+    out: list[str] = []
+    i = 0
+    while i < len(lines):
+        shape = _DIGITS_RE.sub("#", lines[i])
+        j = i + 1
+        while j < len(lines) and _DIGITS_RE.sub("#", lines[j]) == shape:
+            j += 1
+        run = j - i
+        if run > _MAX_REPEAT:
+            out.append(lines[i])
+            out.append(f"... [{run - 2} similar lines] ...")
+            out.append(lines[j - 1])
+        else:
+            out.extend(lines[i:j])
+        i = j
+    return out
+
+
+def _summarize_diff(lines: list[str], max_tokens: int) -> list[str] | None:
+    """File and hunk headers with +/- counts, hunk lines as the budget allows.
+
+    Headers and lines outside the diff are always kept. The rest of the
+    budget is shared evenly across hunks, each keeping its first lines and
+    a marker for the rest. A hunk ends when its header's line counts are
+    used up or at the first line that is not a hunk line. Returns None if
+    there is no hunk.
+    """
+    if not any(_HUNK_RE.match(line) for line in lines):
+        return None
+    # (line, hunk body lines or None)
+    items: list[list] = []
+    old_left = new_left = 0
+    body = None
     for line in lines:
-        if any(p.search(line) for p in _NOISE_PATTERNS):
+        match = _HUNK_RE.match(line)
+        in_hunk = body is not None and (
+            line.startswith("\\") or (old_left > 0 or new_left > 0) and (line == "" or line[0] in "+- "))
+        if in_hunk and not match:
+            body.append(line)
+            if line.startswith("+"):
+                new_left -= 1
+            elif line.startswith("-"):
+                old_left -= 1
+            elif not line.startswith("\\"):
+                old_left -= 1
+                new_left -= 1
             continue
-        cleaned.append(line)
-    return "\n".join(cleaned).strip()
+        if match:
+            old_left, new_left = (int(count) for count in _HUNK_COUNTS_RE.match(line).groups(default="1"))
+            body = []
+            items.append([line, body])
+        else:
+            body = None
+            items.append([line, None])
+
+    hunks = [hunk for _, hunk in items if hunk]
+    marker_cost = approx_tokens("... [0000 hunk lines omitted] ...") + 1
+    remaining = int(max_tokens * 0.9) - _lines_cost([line for line, _ in items]) - marker_cost * len(hunks)
+    # Even share per hunk, smallest first, so what small hunks leave goes to the larger ones.
+    kept: dict[int, int] = {}
+    for n, hunk in enumerate(sorted(hunks, key=_lines_cost)):
+        kept[id(hunk)], spent = _fit_lines(hunk, max(remaining, 0) // (len(hunks) - n))
+        remaining -= spent
+
+    out: list[str] = []
+    for line, hunk in items:
+        if hunk is None:
+            out.append(line)
+            continue
+        added = sum(1 for x in hunk if x.startswith("+"))
+        removed = sum(1 for x in hunk if x.startswith("-"))
+        out.append(f"{line} (+{added} -{removed})")
+        n = kept.get(id(hunk), 0)
+        out.extend(hunk[:n])
+        if n < len(hunk):
+            out.append(f"... [{len(hunk) - n} hunk lines omitted] ...")
+    return out
+
+
+def _lines_cost(lines: list[str]) -> int:
+    return sum(approx_tokens(line) + 1 for line in lines)
+
+
+def _fit_lines(lines: list[str], limit: int) -> tuple[int, int]:
+    """(number of leading lines within limit tokens, their cost)."""
+    spent = 0
+    for n, line in enumerate(lines):
+        cost = approx_tokens(line) + 1
+        if spent + cost > limit:
+            return n, spent
+        spent += cost
+    return len(lines), spent
+
+
+def _important_lines(lines: list[str]) -> list[bool]:
+    """Mark error lines (with context) and whole Python tracebacks."""
+    keep = [False] * len(lines)
+    in_traceback = False
+    for i, line in enumerate(lines):
+        if line.startswith("Traceback (most recent call last)"):
+            in_traceback = True
+        if in_traceback:
+            keep[i] = True
+            # The traceback ends at its first unindented line after the header.
+            if not line.startswith((" ", "\t", "Traceback")):
+                in_traceback = False
+        elif _ERROR_LINE_RE.search(line):
+            for k in range(max(0, i - _ERROR_CONTEXT), min(len(lines), i + _ERROR_CONTEXT + 1)):
+                keep[k] = True
+    return keep
+
+
+def smart_truncate(content: str, max_tokens: int = DEFAULT_MAX_RESULT_TOKENS,
+                   token_counter: TokenCounter | None = None) -> str:
+    """Truncate a tool result to a token budget, keeping the informative lines.
+
+    Linear in the number of lines: repeated lines are collapsed with a
+    count, diffs are reduced to file and hunk headers with +/- counts plus
+    the leading lines of each hunk that fit the budget, and what is still over budget keeps the head, the tail, and error lines
+    and tracebacks in between, with gaps marked. Budgets use chars/4 per
+    line; with a token_counter the result is checked against real tokens
+    and the budget tightened once if needed.
+    """
+    count = token_counter.count if token_counter else approx_tokens
+    if count(content) <= max_tokens:
+        return content
+
+    result = _smart_truncate_lines(content.split("\n"), max_tokens)
+    if token_counter is not None and token_counter.count(result) > max_tokens:
+        result = _smart_truncate_lines(result.split("\n"), max_tokens * max_tokens // token_counter.count(result))
+    return result
+
+
+def _smart_truncate_lines(lines: list[str], max_tokens: int) -> str:
+    lines = _summarize_diff(lines, max_tokens) or lines
+    lines = _collapse_repeats(lines)
+    # Cut single huge lines (minified JSON, base64) so they cannot starve the rest.
+    line_chars = max(int(max_tokens * _HEAD_SHARE), 1) * 4
+    lines = [truncate_tool_result(line, line_chars) if len(line) > line_chars else line for line in lines]
+    costs = [approx_tokens(line) + 1 for line in lines]
+    if sum(costs) <= max_tokens:
+        return "\n".join(lines)
+
+    selected = [False] * len(lines)
 
+    def take(indices, limit: int, contiguous: bool) -> int:
+        spent = 0
+        for i in indices:
+            if selected[i]:
+                continue
+            if spent + costs[i] > limit:
+                if contiguous:
+                    break
+                continue
+            selected[i] = True
+            spent += costs[i]
+        return spent
 
-def normalize_turn_content(content: str, max_result_chars: int = DEFAULT_MAX_RESULT_CHARS) -> str:
+    # Plan with some slack for the gap markers.
+    remaining = int(max_tokens * 0.9)
+    n = len(lines)
+    remaining -= take(range(n), int(max_tokens * _HEAD_SHARE), contiguous=True)
+    remaining -= take(range(n - 1, -1, -1), int(max_tokens * _TAIL_SHARE), contiguous=True)
+    important = _important_lines(lines)
+    remaining -= take((i for i in range(n) if important[i]), remaining, contiguous=False)
+    take(range(n), remaining, contiguous=True)
+
+    out: list[str] = []
+    skipped = 0
+    for line, keep in zip(lines, selected):
+        if keep:
+            if skipped:
+                out.append(f"... [{skipped} lines truncated] ...")
+                skipped = 0
+            out.append(line)
+        else:
+            skipped += 1
+    if skipped:
+        out.append(f"... [{skipped} lines truncated] ...")
+
+    result = "\n".join(out)
+    # Gap markers can still tip the result over; cut it by characters.
+    if approx_tokens(result) > max_tokens:
+        result = truncate_tool_result(result, max_tokens * 4)
+    return result
+
+
+def clean_tool_result(content: str) -> str:
+    """Remove noise lines from tool result content."""
+    return _NOISE_LINES_RE.sub("", content).strip()
+
+
+def render_tool_result(tool_use_id: str, content: str) -> str:
+    """Render a tool result block the way the session extractor does."""
+    return f'<tool_result tool_use_id="{tool_use_id}">\n{content}\n</tool_result>'
+
+
+def truncate_result(
+    content: str,
+    max_result_chars: int = DEFAULT_MAX_RESULT_CHARS,
+    truncation: str = "chars",
+    max_result_tokens: int = DEFAULT_MAX_RESULT_TOKENS,
+    token_counter: TokenCounter | None = None,
+) -> str:
+    """Truncate a cleaned tool result with the selected truncation mode."""
+    if truncation == "smart":
+        return smart_truncate(content, max_result_tokens, token_counter)
+    return truncate_tool_result(content, max_result_chars)
+
+
+def normalize_turn_content(content: str, max_result_chars: int = DEFAULT_MAX_RESULT_CHARS, **truncate_opts) -> str:
     """Normalize all tool results within a turn's content string.
 
     Finds <tool_result> blocks and applies truncation and cleaning.
+    truncate_opts are passed to truncate_result.
     """
     def replace_result(match: re.Match) -> str:
         tag = match.group(1)  # opening tag with attributes
         body = match.group(2)
         body = clean_tool_result(body)
-        body = truncate_tool_result(body, max_result_chars)
+        body = truncate_result(body, max_result_chars, **truncate_opts)
         return f"{tag}\n{body}\n</tool_result>"
 
     return re.sub(
@@ -64,3 +299,29 @@ def normalize_turn_content(content: str, max_result_chars: int = DEFAULT_MAX_RES
         content,
         flags=re.DOTALL,
     )
+
+
+def normalize_turn(turn: Turn, max_result_chars: int = DEFAULT_MAX_RESULT_CHARS, **truncate_opts) -> None:
+    """Normalize a turn's tool results in place.
+
+    Cleans and truncates each structured tool result, then renders the
+    content string once. The rendered results are the suffix of the
+    extractor's content (text parts come first), so the text prefix is
+    kept as is. Turns whose content no longer ends with their rendered
+    results fall back to normalize_turn_content. truncate_opts
+    (truncation="smart", max_result_tokens, token_counter) are passed to
+    truncate_result.
+    """
+    if turn.tool_results:
+        rendered = "\n".join(render_tool_result(tr["tool_use_id"], tr["content"]) for tr in turn.tool_results)
+        if turn.content.endswith(rendered):
+            prefix = turn.content[:len(turn.content) - len(rendered)]
+            for tr in turn.tool_results:
+                tr["content"] = truncate_result(clean_tool_result(tr["content"]), max_result_chars, **truncate_opts)
+            turn.content = prefix + "\n".join(
+                render_tool_result(tr["tool_use_id"], tr["content"]) for tr in turn.tool_results
+            )
+            return
+
+    if "<tool_result" in turn.content:
+        turn.content = normalize_turn_content(turn.content, max_result_chars, **truncate_opts)
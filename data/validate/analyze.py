@@ -0,0 +1,85 @@
+"""Run schema, CLI validation, report and stats in one pass over a dataset.
+
+Equivalent to running data.validate.schema, cli_validator, reporter and
+stats one after another, but the file is read and parsed once (see
+data.validate.engine).
+
+Outputs (in --output-dir, default: next to the input file):
+    cli_validation.json   cli_validator --report
+    report.md, report.json  reporter --output / --json
+    stats.json            stats printed by data.validate.stats
+
+Exits 1 if the schema check or the CLI validation finds invalid samples,
+like the individual tools.
+
+Usage:
+    python -m data.validate.analyze output/datasets/gastown_train.jsonl
+    python -m data.validate.analyze output/datasets/gastown_train.jsonl --workers 32 --cache
+    python -m data.validate.analyze output/datasets/gastown_train.jsonl --tokenizer Qwen/Qwen2.5-7B-Instruct --role-map output/datasets/role_map.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from functools import partial
+from pathlib import Path
+
+from data.transform.role_tagger import load_role_map
+from data.transform.token_counter import make_counter
+from data.validate import cli_validator, reporter, schema, stats
+from data.validate.engine import analyze_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate, report and summarize a training JSONL file in one pass")
+    parser.add_argument("input_file", type=Path, help="Input JSONL file")
+    parser.add_argument("--output-dir", type=Path, default=None, help="Directory for reports (default: input file's directory)")
+    parser.add_argument("--tokenizer", default=None, help="HuggingFace tokenizer for exact token counts in stats")
+    parser.add_argument("--role-map", type=Path, default=None, help="Role map JSON written by data.pipeline")
+    parser.add_argument("--workers", type=int, default=1, help="Analyze in N processes over byte-range shards (default: 1, serial)")
+    parser.add_argument("--cache", action="store_true",
+                        help="Reuse schema/CLI validation results for samples validated before (output/cache)")
+    args = parser.parse_args()
+
+    path = args.input_file
+    if not path.exists():
+        print(f"File not found: {path}")
+        sys.exit(1)
+    output_dir = args.output_dir or path.parent
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    role_map = load_role_map(args.role_map) if args.role_map else None
+    counter = make_counter(args.tokenizer) if args.tokenizer else None
+
+    (total, valid, schema_errors), (cli_results, cli_stats), report, dataset_stats = analyze_file(path, [
+        partial(schema.SchemaVisitor, schema.make_cache() if args.cache else None),
+        partial(cli_validator.CliVisitor, cli_validator.make_cache() if args.cache else None),
+        partial(reporter.ReportVisitor, path, role_map),
+        partial(stats.StatsVisitor, counter, role_map),
+    ], args.workers)
+
+    schema.print_summary(path, total, valid, schema_errors)
+
+    cli_validator.print_report(cli_results, cli_stats, path)
+    cli_validator.save_json_report(cli_stats, output_dir / "cli_validation.json")
+
+    reporter.print_report(report)
+    reporter.save_markdown_report(report, output_dir / "report.md")
+    with open(output_dir / "report.json", "w") as f:
+        json.dump(report.__dict__, f, indent=2)
+
+    stats.print_stats(path, dataset_stats)
+    with open(output_dir / "stats.json", "w") as f:
+        json.dump(dataset_stats, f, indent=2)
+
+    if schema_errors or cli_stats["invalid_samples"]:
+        print(f"\n❌ {total - valid} samples fail the schema check, "
+              f"{cli_stats['invalid_samples']} fail CLI validation")
+        sys.exit(1)
+    print("\n✓ All samples passed schema and CLI validation")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ proper workflows, and expected command patterns for each role.
 Usage:
     python -m data.validate.cli_validator output/datasets/gastown_train.jsonl
     python -m data.validate.cli_validator output/datasets/gastown_train.jsonl --report output/cli_validation_report.json
+    python -m data.validate.cli_validator output/datasets/gastown_train.jsonl --cache
 """
 
 from __future__ import annotations
@@ -15,9 +16,13 @@ import json
 import re
 import sys
 from collections import Counter, defaultdict
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field
+from functools import partial
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
+
+from data.validate.engine import SampleView, Visitor, analyze_file
+from data.validate.validation_cache import ValidationCache
 
 
 @dataclass
@@ -33,6 +38,9 @@ class ValidationResult:
     is_valid: bool = True
 
 
+# Bump when the rules below change; invalidates cached results.
+VALIDATOR_VERSION = "1"
+
 # Valid Gas Town commands by category
 GT_COMMANDS = {
     # Session & context
@@ -87,79 +95,122 @@ ROLE_COMMANDS = {
     },
 }
 
-# Workflow patterns (regex)
+# Workflow patterns: each workflow is a list of alternatives, each an
+# ordered list of regexes that must appear in that order (anywhere in the
+# text, case-insensitive) — i.e. the regex "a.*b.*c" with DOTALL, matched
+# without backtracking.
 WORKFLOW_PATTERNS = {
-    "polecat_startup": r"gt\s+(prime|hook).*bd\s+mol\s+current",
-    "polecat_completion": r"git\s+(status|add|commit|push).*gt\s+done",
-    "mail_workflow": r"gt\s+mail\s+(inbox|read|send)",
-    "bead_lifecycle": r"bd\s+(show|update|close)",
-    "git_commit_cycle": r"git\s+status.*git\s+add.*git\s+commit.*git\s+push",
-    "escalation": r"gt\s+(escalate|mail\s+send.*(?:witness|mayor))",
-    "molecule_workflow": r"bd\s+mol\s+current.*bd\s+close",
+    "polecat_startup": [[r"gt\s+(prime|hook)", r"bd\s+mol\s+current"]],
+    "polecat_completion": [[r"git\s+(status|add|commit|push)", r"gt\s+done"]],
+    "mail_workflow": [[r"gt\s+mail\s+(inbox|read|send)"]],
+    "bead_lifecycle": [[r"bd\s+(show|update|close)"]],
+    "git_commit_cycle": [[r"git\s+status", r"git\s+add", r"git\s+commit", r"git\s+push"]],
+    "escalation": [[r"gt\s+escalate"], [r"gt\s+mail\s+send", r"witness|mayor"]],
+    "molecule_workflow": [[r"bd\s+mol\s+current", r"bd\s+close"]],
 }
 
-# Common anti-patterns (things that indicate bad training data)
+# Common anti-patterns (things that indicate bad training data), same form
 ANTI_PATTERNS = {
-    "wrong_git_workflow": r"git\s+push\s+origin\s+main",  # Polecats shouldn't push to main directly
-    "bd_close_root": r"bd\s+close.*root",  # Shouldn't close root issue manually
-    "waiting_for_approval": r"(wait.*approval|waiting.*human|ask.*confirmation)",
-    "wrong_done_command": r"gt\s+(unsling|exit|quit)",  # Not real commands
+    "wrong_git_workflow": [[r"git\s+push\s+origin\s+main"]],  # Polecats shouldn't push to main directly
+    "bd_close_root": [[r"bd\s+close", r"root"]],  # Shouldn't close root issue manually
+    "waiting_for_approval": [[r"wait", r"approval"], [r"waiting", r"human"], [r"ask", r"confirmation"]],
+    "wrong_done_command": [[r"gt\s+(unsling|exit|quit)"]],  # Not real commands
+}
+
+
+def compile_sequences(patterns: dict[str, list[list[str]]]) -> dict[str, list[list[re.Pattern]]]:
+    return {
+        name: [[re.compile(step, re.IGNORECASE) for step in alternative] for alternative in alternatives]
+        for name, alternatives in patterns.items()
+    }
+
+
+_WORKFLOW_SEQUENCES = compile_sequences(WORKFLOW_PATTERNS)
+_ANTI_PATTERN_SEQUENCES = compile_sequences(ANTI_PATTERNS)
+
+
+def matches_in_order(steps: list[re.Pattern], text: str) -> bool:
+    """True if each step matches after the previous one's end.
+
+    Taking the earliest match of every step is enough to decide whether
+    any ordered match exists, so each step scans the text at most once.
+    """
+    pos = 0
+    for step in steps:
+        match = step.search(text, pos)
+        if match is None:
+            return False
+        pos = match.end()
+    return True
+
+
+def _detect(sequences: dict[str, list[list[re.Pattern]]], text: str) -> list[str]:
+    return [
+        name for name, alternatives in sequences.items()
+        if any(matches_in_order(steps, text) for steps in alternatives)
+    ]
+
+
+# Command tokenizer: every occurrence of a tool name starts a candidate
+# command run of whitespace-separated words. Runs of one tool never
+# overlap (a later "gt" inside a gt run is part of that run), but runs of
+# different tools may, e.g. "gt show bd ready" yields "gt show" and "bd ready".
+_TOOL_RE = re.compile(r"gt|bd|git")
+_COMMAND_RUN_RES = {
+    "gt": re.compile(r"gt\s+\w+(?:\s+\w+)*"),
+    "bd": re.compile(r"bd\s+\w+(?:\s+\w+)*"),
+    "git": re.compile(r"git\s+\w+(?:\s+[\w\-]+)*"),
 }
+# gt commands whose full run is kept (subcommands carry the meaning).
+_MULTIWORD_GT = ("gt mail", "gt mol", "gt handoff")
+# Tools named by GT_COMMANDS; a found command is known if its tool is.
+_KNOWN_TOOLS = {known.split()[0] for known in GT_COMMANDS}
+_SUSPICIOUS_COMMANDS = ("gt tool", "gt run", "bd exec", "bd shell")
+
+
+def iter_command_runs(text: str) -> Iterator[tuple[str, str]]:
+    """(tool, run) pairs in one left-to-right pass over text."""
+    run_end = {tool: 0 for tool in _COMMAND_RUN_RES}
+    for hit in _TOOL_RE.finditer(text):
+        tool = hit.group(0)
+        pos = hit.start()
+        if pos < run_end[tool]:
+            continue
+        match = _COMMAND_RUN_RES[tool].match(text, pos)
+        if match:
+            run_end[tool] = match.end()
+            yield tool, match.group(0)
 
 
 def extract_commands(text: str) -> list[str]:
-    """Extract Gas Town commands from text."""
-    found = []
-    
-    # Match gt commands
-    for match in re.finditer(r'gt\s+\w+(?:\s+\w+)*', text):
-        cmd = match.group(0).strip()
-        # Normalize multi-word commands
-        if any(cmd.startswith(base) for base in ["gt mail", "gt mol", "gt handoff"]):
-            found.append(cmd)
+    """Extract Gas Town commands from text (gt, then bd, then git commands)."""
+    found: dict[str, list[str]] = {tool: [] for tool in _COMMAND_RUN_RES}
+    for tool, cmd in iter_command_runs(text):
+        if tool == "gt" and cmd.startswith(_MULTIWORD_GT):
+            # Normalize multi-word commands
+            found[tool].append(cmd)
         else:
-            # Take first two words for simple commands
-            parts = cmd.split()
-            if len(parts) >= 2:
-                found.append(f"{parts[0]} {parts[1]}")
-    
-    # Match bd commands
-    for match in re.finditer(r'bd\s+\w+(?:\s+\w+)*', text):
-        cmd = match.group(0).strip()
-        parts = cmd.split()
-        if len(parts) >= 2:
-            found.append(f"{parts[0]} {parts[1]}")
-    
-    # Match git commands
-    for match in re.finditer(r'git\s+\w+(?:\s+[\w\-]+)*', text):
-        cmd = match.group(0).strip()
-        parts = cmd.split()
-        if len(parts) >= 2:
-            found.append(f"{parts[0]} {parts[1]}")
-    
-    return found
+            # Take first two words
+            parts = cmd.split(None, 2)
+            found[tool].append(f"{parts[0]} {parts[1]}")
+    return found["gt"] + found["bd"] + found["git"]
 
 
 def detect_workflows(text: str) -> list[str]:
     """Detect workflow patterns in text."""
-    detected = []
-    for name, pattern in WORKFLOW_PATTERNS.items():
-        if re.search(pattern, text, re.IGNORECASE | re.DOTALL):
-            detected.append(name)
-    return detected
+    return _detect(_WORKFLOW_SEQUENCES, text)
 
 
 def detect_anti_patterns(text: str) -> list[str]:
     """Detect anti-patterns in text."""
-    found = []
-    for name, pattern in ANTI_PATTERNS.items():
-        if re.search(pattern, text, re.IGNORECASE | re.DOTALL):
-            found.append(name)
-    return found
+    return _detect(_ANTI_PATTERN_SEQUENCES, text)
 
 
-def validate_sample(sample: dict, line_num: int) -> ValidationResult:
-    """Validate a single training sample against CLI docs."""
+def validate_sample(sample: dict, line_num: int, full_text: str | None = None) -> ValidationResult:
+    """Validate a single training sample against CLI docs.
+
+    full_text is the newline-joined message text, if already computed.
+    """
     result = ValidationResult(
         line_num=line_num,
         role=sample.get("metadata", {}).get("role", "unknown"),
@@ -167,11 +218,10 @@ def validate_sample(sample: dict, line_num: int) -> ValidationResult:
     )
     
     # Extract all conversation text
-    text_parts = []
-    for msg in sample.get("conversations", []):
-        if isinstance(msg.get("value"), str):
-            text_parts.append(msg["value"])
-    full_text = "\n".join(text_parts)
+    if full_text is None:
+        full_text = "\n".join(
+            msg["value"] for msg in sample.get("conversations", []) if isinstance(msg.get("value"), str)
+        )
     
     # Extract commands
     commands = extract_commands(full_text)
@@ -192,10 +242,8 @@ def validate_sample(sample: dict, line_num: int) -> ValidationResult:
         role_config = ROLE_COMMANDS[role]
         
         # Check for required commands
-        has_required = any(
-            any(req in cmd for cmd in commands)
-            for req in role_config["required"]
-        )
+        joined = "\0".join(commands)
+        has_required = any(req in joined for req in role_config["required"])
         if not has_required and commands:
             result.warnings.append(
                 f"Role '{role}' missing required commands. "
@@ -204,20 +252,10 @@ def validate_sample(sample: dict, line_num: int) -> ValidationResult:
     
     # Check for unknown commands (potential hallucinations)
     for cmd in commands:
-        # Check if it's a known command pattern
-        is_known = False
-        for known in GT_COMMANDS:
-            if cmd.startswith(known.split()[0]):
-                is_known = True
-                break
-        
-        if not is_known:
+        if cmd.split(None, 1)[0] not in _KNOWN_TOOLS:
             # Could be a valid subcommand we don't know about, or a hallucination
-            if cmd.startswith("gt ") or cmd.startswith("bd "):
-                # Flag suspicious commands
-                suspicious_patterns = ["gt tool", "gt run", "bd exec", "bd shell"]
-                if any(cmd.startswith(p) for p in suspicious_patterns):
-                    result.warnings.append(f"Possibly hallucinated command: {cmd}")
+            if cmd.startswith(_SUSPICIOUS_COMMANDS):
+                result.warnings.append(f"Possibly hallucinated command: {cmd}")
     
     # Check conversation structure for command-response pairs
     conversations = sample.get("conversations", [])
@@ -235,70 +273,111 @@ def validate_sample(sample: dict, line_num: int) -> ValidationResult:
     return result
 
 
-def validate_file(path: Path) -> tuple[list[ValidationResult], dict]:
-    """Validate a JSONL file. Returns (results, summary_stats)."""
-    results = []
-    stats = {
-        "total_samples": 0,
-        "valid_samples": 0,
-        "invalid_samples": 0,
-        "total_errors": 0,
-        "total_warnings": 0,
-        "role_distribution": Counter(),
-        "command_frequency": Counter(),
-        "workflow_frequency": Counter(),
-        "anti_pattern_frequency": Counter(),
-    }
-    
-    with open(path, "r") as f:
-        for line_num, line in enumerate(f, 1):
-            line = line.strip()
-            if not line:
-                continue
-            
-            stats["total_samples"] += 1
-            
-            try:
-                sample = json.loads(line)
-            except json.JSONDecodeError as e:
-                results.append(ValidationResult(
-                    line_num=line_num,
-                    role="unknown",
-                    session_id="unknown",
-                    errors=[f"Invalid JSON: {e}"],
-                    is_valid=False,
-                ))
-                stats["invalid_samples"] += 1
-                stats["total_errors"] += 1
-                continue
-            
-            result = validate_sample(sample, line_num)
-            results.append(result)
-            
-            # Update stats
-            stats["role_distribution"][result.role] += 1
-            
-            for cmd in result.commands_found:
-                stats["command_frequency"][cmd] += 1
-            
-            for wf in result.workflows_detected:
-                stats["workflow_frequency"][wf] += 1
-            
-            if result.is_valid:
-                stats["valid_samples"] += 1
+def make_cache(path: Path | None = None) -> ValidationCache:
+    """Validation cache for this validator version."""
+    return ValidationCache("cli", VALIDATOR_VERSION, path)
+
+
+class CliVisitor(Visitor):
+    """Engine visitor: finish() returns (results, summary_stats).
+
+    With a cache, samples whose content hash was validated before reuse
+    the cached ValidationResult (with this run's line number).
+    """
+
+    def __init__(self, cache: ValidationCache | None = None):
+        self.cache = cache
+        self.results: list[ValidationResult] = []
+        self.stats = {
+            "total_samples": 0,
+            "valid_samples": 0,
+            "invalid_samples": 0,
+            "total_errors": 0,
+            "total_warnings": 0,
+            "role_distribution": Counter(),
+            "command_frequency": Counter(),
+            "workflow_frequency": Counter(),
+            "anti_pattern_frequency": Counter(),
+        }
+
+    def visit(self, view: SampleView) -> None:
+        stats = self.stats
+        stats["total_samples"] += 1
+        if self.cache is None:
+            result = validate_sample(view.sample, view.line_num, view.full_text)
+        else:
+            cached = self.cache.get(view.digest)
+            if cached is None:
+                result = validate_sample(view.sample, view.line_num, view.full_text)
+                cached = asdict(result)
+                del cached["line_num"]
+                self.cache.put(view.digest, cached)
             else:
-                stats["invalid_samples"] += 1
-            
-            stats["total_errors"] += len(result.errors)
-            stats["total_warnings"] += len(result.warnings)
-    
-    # Convert Counters to dicts for JSON serialization
-    stats["role_distribution"] = dict(stats["role_distribution"])
-    stats["command_frequency"] = dict(stats["command_frequency"].most_common(30))
-    stats["workflow_frequency"] = dict(stats["workflow_frequency"])
-    stats["anti_pattern_frequency"] = dict(stats["anti_pattern_frequency"])
-    
-    return results, stats
+                result = ValidationResult(line_num=view.line_num, **cached)
+        self.results.append(result)
+
+        # Update stats
+        stats["role_distribution"][result.role] += 1
+
+        for cmd in result.commands_found:
+            stats["command_frequency"][cmd] += 1
+
+        for wf in result.workflows_detected:
+            stats["workflow_frequency"][wf] += 1
+
+        if result.is_valid:
+            stats["valid_samples"] += 1
+        else:
+            stats["invalid_samples"] += 1
+
+        stats["total_errors"] += len(result.errors)
+        stats["total_warnings"] += len(result.warnings)
+
+    def visit_invalid(self, line_num: int, error: json.JSONDecodeError) -> None:
+        self.stats["total_samples"] += 1
+        self.results.append(ValidationResult(
+            line_num=line_num,
+            role="unknown",
+            session_id="unknown",
+            errors=[f"Invalid JSON: {error}"],
+            is_valid=False,
+        ))
+        self.stats["invalid_samples"] += 1
+        self.stats["total_errors"] += 1
+
+    def merge(self, other: "CliVisitor") -> None:
+        self.results.extend(other.results)
+        for key, value in other.stats.items():
+            if isinstance(value, Counter):
+                self.stats[key].update(value)
+            else:
+                self.stats[key] += value
+        if self.cache is not None:
+            self.cache.merge(other.cache)
+
+    def __getstate__(self) -> dict:
+        # Shard visitors share their worker's cache; send back only this shard's results.
+        return {**self.__dict__, "cache": self.cache.take_new() if self.cache is not None else None}
+
+    def finish(self) -> tuple[list[ValidationResult], dict]:
+        stats = self.stats
+        # Convert Counters to dicts for JSON serialization
+        stats["role_distribution"] = dict(stats["role_distribution"])
+        stats["command_frequency"] = dict(stats["command_frequency"].most_common(30))
+        stats["workflow_frequency"] = dict(stats["workflow_frequency"])
+        stats["anti_pattern_frequency"] = dict(stats["anti_pattern_frequency"])
+        if self.cache is not None:
+            self.cache.save()
+        return self.results, stats
+
+
+def validate_file(
+    path: Path,
+    workers: int = 1,
+    cache: ValidationCache | None = None,
+) -> tuple[list[ValidationResult], dict]:
+    """Validate a JSONL file. Returns (results, summary_stats)."""
+    return analyze_file(path, [partial(CliVisitor, cache)], workers)[0]
 
 
 def print_report(results: list[ValidationResult], stats: dict, path: Path) -> None:
@@ -402,13 +481,24 @@ def main():
         action="store_true",
         help="Exit with error code if any validation errors found"
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Validate in N processes over byte-range shards (default: 1, serial)"
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Reuse results for samples validated before (output/cache)"
+    )
     args = parser.parse_args()
     
     if not args.input_file.exists():
         print(f"File not found: {args.input_file}")
         sys.exit(1)
     
-    results, stats = validate_file(args.input_file)
+    results, stats = validate_file(args.input_file, args.workers, make_cache() if args.cache else None)
     print_report(results, stats, args.input_file)
     
     if args.report:
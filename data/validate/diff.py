@@ -0,0 +1,299 @@
+"""Diff two builds of a training dataset: added, removed and changed samples.
+
+Each dataset is reduced to a sorted index with one line per sample:
+
+    <key> <digest> <role> <quality> <chars> <sample id>     (tab-separated)
+
+The sample id is "<session_id>#<chunk_index>" (or the assistant-content
+hash for samples without a session), key is its 16-hex hash and digest
+hashes the whole expanded sample, so plain and compact files compare
+equal. Indexes are built external-memory style: sorted runs of at most
+--run-size lines are spilled to a temp directory and k-way merged, and the
+two merged streams are then joined on key in one sequential pass. Memory
+stays bounded by the run size, whatever the dataset size.
+
+Per role the diff reports added / removed / changed / unchanged counts,
+quality-score and length (chars) shift, and the first sample ids of each
+kind; --ids writes every id.
+
+Usage:
+    python -m data.validate.diff refinery/output/datasets/gastown_train.jsonl output/datasets/gastown_train.jsonl
+    python -m data.validate.diff old.jsonl new.jsonl --report output/datasets/diff.json --ids output/datasets/diff_ids.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import itertools
+import json
+import sys
+import tempfile
+from collections import defaultdict
+from pathlib import Path
+from typing import IO, Iterator, NamedTuple
+
+from data.transform.deduplicator import content_hash
+from data.transform.token_counter import text_hash
+from data.validate.engine import SampleView, iter_views
+from data.validate.streaming import Summary
+
+DEFAULT_RUN_SIZE = 500_000
+# Sample ids per status kept for the printed / JSON report.
+EXAMPLE_IDS = 10
+
+STATUSES = ("added", "removed", "changed", "unchanged")
+
+
+class IndexEntry(NamedTuple):
+    key: str
+    digest: str
+    role: str
+    quality: float | None
+    chars: int
+    sample_id: str
+
+
+def sample_id(view: SampleView) -> str:
+    """Stable identity of a sample across builds."""
+    meta = view.metadata
+    session_id = meta.get("session_id")
+    if session_id:
+        return f"{session_id}#{meta.get('chunk_index', 0)}"
+    return content_hash(view.conversations)
+
+
+def index_line(view: SampleView) -> str:
+    sid = sample_id(view)
+    meta = view.metadata
+    quality = meta.get("quality_score") or ""
+    digest = text_hash(json.dumps(view.sample, sort_keys=True, ensure_ascii=False))
+    role = _field(str(meta.get("role", "unknown")))
+    return f"{text_hash(sid)}\t{digest}\t{role}\t{quality}\t{view.turn_stats['chars']}\t{_field(sid)}\n"
+
+
+def _field(value: str) -> str:
+    return value.replace("\t", " ").replace("\n", " ")
+
+
+def parse_line(line: str) -> IndexEntry:
+    key, digest, role, quality, chars, sid = line.rstrip("\n").split("\t", 5)
+    return IndexEntry(key, digest, role, float(quality) if quality else None, int(chars), sid)
+
+
+def _spill(lines: list[str], tmp_dir: Path, runs: list[Path]) -> None:
+    lines.sort()
+    run = tmp_dir / f"run-{len(runs):05d}.tsv"
+    with open(run, "w", encoding="utf-8") as f:
+        f.writelines(lines)
+    runs.append(run)
+    lines.clear()
+
+
+def build_runs(path: Path, tmp_dir: Path, run_size: int = DEFAULT_RUN_SIZE) -> tuple[list[Path], int]:
+    """Write sorted runs of index lines for a dataset. Returns (runs, invalid lines)."""
+    runs: list[Path] = []
+    lines: list[str] = []
+    invalid = 0
+    for item in iter_views(path):
+        if not isinstance(item, SampleView):
+            invalid += 1
+            continue
+        lines.append(index_line(item))
+        if len(lines) >= run_size:
+            _spill(lines, tmp_dir, runs)
+    if lines or not runs:
+        _spill(lines, tmp_dir, runs)
+    return runs, invalid
+
+
+def merge_runs(runs: list[Path]) -> Iterator[IndexEntry]:
+    """k-way merge of sorted runs, in key order."""
+    files: list[IO[str]] = [open(run, "r", encoding="utf-8") for run in runs]
+    try:
+        for line in heapq.merge(*files):
+            yield parse_line(line)
+    finally:
+        for f in files:
+            f.close()
+
+
+def join(old: Iterator[IndexEntry], new: Iterator[IndexEntry]) -> Iterator[tuple[str, IndexEntry | None, IndexEntry | None]]:
+    """Merge-join two key-sorted streams into (status, old, new) pairs.
+
+    Samples sharing a key (duplicate ids) are paired identical digests
+    first, then in order; leftovers are added or removed.
+    """
+    old_groups = itertools.groupby(old, key=lambda e: e.key)
+    new_groups = itertools.groupby(new, key=lambda e: e.key)
+    old_group = next(old_groups, None)
+    new_group = next(new_groups, None)
+    while old_group or new_group:
+        if new_group is None or (old_group is not None and old_group[0] < new_group[0]):
+            for entry in old_group[1]:
+                yield "removed", entry, None
+            old_group = next(old_groups, None)
+        elif old_group is None or new_group[0] < old_group[0]:
+            for entry in new_group[1]:
+                yield "added", None, entry
+            new_group = next(new_groups, None)
+        else:
+            yield from _pair(list(old_group[1]), list(new_group[1]))
+            old_group = next(old_groups, None)
+            new_group = next(new_groups, None)
+
+
+def _pair(olds: list[IndexEntry], news: list[IndexEntry]) -> Iterator[tuple[str, IndexEntry | None, IndexEntry | None]]:
+    unmatched: list[IndexEntry] = []
+    for entry in news:
+        match = next((i for i, o in enumerate(olds) if o.digest == entry.digest), None)
+        if match is None:
+            unmatched.append(entry)
+        else:
+            yield "unchanged", olds.pop(match), entry
+    for old_entry, new_entry in itertools.zip_longest(olds, unmatched):
+        if new_entry is None:
+            yield "removed", old_entry, None
+        elif old_entry is None:
+            yield "added", None, new_entry
+        else:
+            yield "changed", old_entry, new_entry
+
+
+class RoleDiff:
+    """Counts and shifts for one role (a changed sample counts under its new role)."""
+
+    def __init__(self):
+        self.counts = dict.fromkeys(STATUSES, 0)
+        self.old_quality = Summary()
+        self.new_quality = Summary()
+        self.old_chars = Summary()
+        self.new_chars = Summary()
+        self.quality_delta = Summary()
+        self.chars_delta = Summary()
+
+    def add(self, status: str, old: IndexEntry | None, new: IndexEntry | None) -> None:
+        self.counts[status] += 1
+        if old is not None:
+            self.old_chars.add(old.chars)
+            if old.quality is not None:
+                self.old_quality.add(old.quality)
+        if new is not None:
+            self.new_chars.add(new.chars)
+            if new.quality is not None:
+                self.new_quality.add(new.quality)
+        if status == "changed":
+            self.chars_delta.add(new.chars - old.chars)
+            if old.quality is not None and new.quality is not None:
+                self.quality_delta.add(new.quality - old.quality)
+
+    def as_dict(self) -> dict:
+        return {
+            **self.counts,
+            "quality_mean": {"old": round(self.old_quality.mean(), 3), "new": round(self.new_quality.mean(), 3)},
+            "chars_mean": {"old": round(self.old_chars.mean(), 0), "new": round(self.new_chars.mean(), 0)},
+            "changed_quality_delta_mean": round(self.quality_delta.mean(), 3),
+            "changed_chars_delta_mean": round(self.chars_delta.mean(), 0),
+        }
+
+
+def diff_datasets(
+    old_path: Path,
+    new_path: Path,
+    ids_file: IO[str] | None = None,
+    run_size: int = DEFAULT_RUN_SIZE,
+    tmp_dir: Path | None = None,
+) -> dict:
+    """Diff two (plain or compact) JSONL datasets in bounded memory.
+
+    Returns the summary dict; with ids_file, every non-unchanged sample is
+    written to it as {"status", "id", "role"} JSON lines.
+    """
+    by_role: dict[str, RoleDiff] = defaultdict(RoleDiff)
+    examples: dict[str, list[str]] = {status: [] for status in STATUSES if status != "unchanged"}
+    with tempfile.TemporaryDirectory(prefix="dataset-diff-", dir=tmp_dir) as tmp:
+        tmp = Path(tmp)
+        (tmp / "old").mkdir()
+        (tmp / "new").mkdir()
+        old_runs, old_invalid = build_runs(old_path, tmp / "old", run_size)
+        new_runs, new_invalid = build_runs(new_path, tmp / "new", run_size)
+
+        for status, old, new in join(merge_runs(old_runs), merge_runs(new_runs)):
+            entry = new or old
+            by_role[entry.role].add(status, old, new)
+            if status == "unchanged":
+                continue
+            if len(examples[status]) < EXAMPLE_IDS:
+                examples[status].append(entry.sample_id)
+            if ids_file is not None:
+                ids_file.write(json.dumps({"status": status, "id": entry.sample_id, "role": entry.role}) + "\n")
+
+    totals = dict.fromkeys(STATUSES, 0)
+    for role_diff in by_role.values():
+        for status, count in role_diff.counts.items():
+            totals[status] += count
+    return {
+        "old": str(old_path),
+        "new": str(new_path),
+        "invalid_lines": {"old": old_invalid, "new": new_invalid},
+        "totals": totals,
+        "by_role": {role: by_role[role].as_dict() for role in sorted(by_role)},
+        "example_ids": examples,
+    }
+
+
+def print_diff(diff: dict) -> None:
+    """Print a diff summary to console."""
+    totals = diff["totals"]
+    print(f"\n--- Dataset diff: {diff['old']} → {diff['new']} ---\n")
+    print(f"  added: {totals['added']}  removed: {totals['removed']}  "
+          f"changed: {totals['changed']}  unchanged: {totals['unchanged']}")
+    invalid = diff["invalid_lines"]
+    if invalid["old"] or invalid["new"]:
+        print(f"  invalid JSON lines skipped: old {invalid['old']}, new {invalid['new']}")
+
+    print(f"\n  {'role':<12} {'added':>7} {'removed':>8} {'changed':>8} {'same':>7}  {'quality old→new':>16}  {'chars old→new':>16}")
+    for role, d in diff["by_role"].items():
+        quality = f"{d['quality_mean']['old']:.3f}→{d['quality_mean']['new']:.3f}"
+        chars = f"{d['chars_mean']['old']:.0f}→{d['chars_mean']['new']:.0f}"
+        print(f"  {role:<12} {d['added']:>7} {d['removed']:>8} {d['changed']:>8} {d['unchanged']:>7}  {quality:>16}  {chars:>16}")
+
+    for status, ids in diff["example_ids"].items():
+        if ids:
+            more = totals[status] - len(ids)
+            print(f"\n  {status}: {', '.join(ids)}" + (f" (+{more} more)" if more > 0 else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diff two builds of a training JSONL dataset")
+    parser.add_argument("old_file", type=Path, help="Previous dataset JSONL")
+    parser.add_argument("new_file", type=Path, help="New dataset JSONL")
+    parser.add_argument("--report", type=Path, default=None, help="Write the diff summary as JSON")
+    parser.add_argument("--ids", type=Path, default=None, help="Write every added/removed/changed sample id as JSONL")
+    parser.add_argument("--run-size", type=int, default=DEFAULT_RUN_SIZE,
+                        help=f"Index lines sorted in memory per spill run (default: {DEFAULT_RUN_SIZE})")
+    parser.add_argument("--tmp-dir", type=Path, default=None, help="Directory for sorted runs (default: system temp)")
+    args = parser.parse_args()
+
+    for path in (args.old_file, args.new_file):
+        if not path.exists():
+            print(f"File not found: {path}")
+            sys.exit(1)
+
+    if args.ids:
+        args.ids.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.ids, "w", encoding="utf-8") as ids_file:
+            diff = diff_datasets(args.old_file, args.new_file, ids_file, args.run_size, args.tmp_dir)
+    else:
+        diff = diff_datasets(args.old_file, args.new_file, None, args.run_size, args.tmp_dir)
+    print_diff(diff)
+
+    if args.report:
+        args.report.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.report, "w") as f:
+            json.dump(diff, f, indent=2)
+        print(f"\n  Report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""Single-pass analysis engine shared by the data.validate tools.
+
+schema, cli_validator, reporter and stats each used to re-read and
+re-parse the whole dataset. The engine streams a (plain or compact) JSONL
+file once, parses and expands every line once, and dispatches each sample
+to a list of visitors. Per-sample derived values that several tools need
+(the joined conversation text, turn/char/tool-call counts) are computed
+lazily on the SampleView and shared between visitors.
+
+Each tool exposes its own visitor (SchemaVisitor, CliVisitor,
+ReportVisitor, StatsVisitor); data.validate.analyze runs all four in one
+pass.
+
+With workers > 1, analyze_file splits the file into newline-aligned byte
+ranges, runs fresh visitors over each range in a process pool (reading
+through mmap), and merges the per-shard visitors in file order, so
+results are identical to a serial run. Line numbers stay global: a first
+pool pass counts the newlines of every shard. The visitor factories reach
+each worker process once, through the pool initializer, so objects they
+hold (token counters, validation caches) are loaded once per process and
+shared by its shards; visitors hand back only their shard's additions.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
+
+from data.transform.prompt_table import PromptTable, expand_sample
+from data.transform.token_counter import text_hash
+
+
+class SampleView:
+    """A parsed, expanded sample plus derived values shared across visitors."""
+
+    def __init__(self, line_num: int, sample: dict, raw: str | None = None):
+        self.line_num = line_num
+        self.sample = sample
+        self.raw = raw
+
+    @cached_property
+    def digest(self) -> str:
+        """Content hash of the sample's JSONL line (see validation_cache)."""
+        return text_hash(self.raw if self.raw is not None else json.dumps(self.sample, sort_keys=True))
+
+    @cached_property
+    def conversations(self) -> list[dict]:
+        return self.sample.get("conversations", [])
+
+    @cached_property
+    def metadata(self) -> dict:
+        return self.sample.get("metadata", {})
+
+    @cached_property
+    def full_text(self) -> str:
+        """All string message values joined by newlines."""
+        return "\n".join(m["value"] for m in self.conversations if isinstance(m.get("value"), str))
+
+    @cached_property
+    def turn_stats(self) -> dict:
+        """Non-system turns, total chars, and gpt messages with tool calls.
+
+        Non-string values (schema errors) count as turns but add no chars.
+        """
+        turns = chars = tool_calls = 0
+        for msg in self.conversations:
+            from_role = msg.get("from")
+            value = msg.get("value")
+            if from_role != "system":
+                turns += 1
+            if not isinstance(value, str):
+                continue
+            chars += len(value)
+            if from_role == "gpt" and "<tool_call" in value:
+                tool_calls += 1
+        return {"turns": turns, "chars": chars, "tool_calls": tool_calls}
+
+
+class Visitor(ABC):
+    """Receives every sample of one pass; finish() returns the tool's result."""
+
+    @abstractmethod
+    def visit(self, view: SampleView) -> None:
+        """Called for every parsed sample, in file order."""
+
+    def visit_invalid(self, line_num: int, error: json.JSONDecodeError) -> None:
+        """Called for lines that are not valid JSON. Ignored by default."""
+
+    @abstractmethod
+    def merge(self, other: "Visitor") -> None:
+        """Fold in a visitor that saw the shard after this one (parallel mode)."""
+
+    @abstractmethod
+    def finish(self) -> Any:
+        """The tool's result for everything visited and merged."""
+
+
+VisitorFactory = Callable[[], Visitor]
+
+
+def _parse_lines(
+    numbered_lines: Iterable[tuple[int, str]], prompts: PromptTable,
+) -> Iterator[SampleView | tuple[int, json.JSONDecodeError]]:
+    for line_num, line in numbered_lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            sample = expand_sample(json.loads(line), prompts)
+        except json.JSONDecodeError as e:
+            yield line_num, e
+            continue
+        yield SampleView(line_num, sample, line)
+
+
+def iter_views(path: Path) -> Iterator[SampleView | tuple[int, json.JSONDecodeError]]:
+    """Stream SampleViews, or (line_num, error) for lines that fail to parse."""
+    prompts = PromptTable.for_dataset(path)
+    with open(path, "r") as f:
+        yield from _parse_lines(enumerate(f, 1), prompts)
+
+
+def _dispatch(items: Iterable[SampleView | tuple[int, json.JSONDecodeError]], visitors: list[Visitor]) -> None:
+    for item in items:
+        if isinstance(item, SampleView):
+            for visitor in visitors:
+                visitor.visit(item)
+        else:
+            for visitor in visitors:
+                visitor.visit_invalid(*item)
+
+
+def run_visitors(path: Path, visitors: Iterable[Visitor]) -> list[Any]:
+    """Stream path once through all visitors. Returns their finish() results in order."""
+    visitors = list(visitors)
+    _dispatch(iter_views(path), visitors)
+    return [visitor.finish() for visitor in visitors]
+
+
+def shard_ranges(path: Path, shards: int) -> list[tuple[int, int]]:
+    """Split a file into at most shards (start, end) byte ranges ending after a newline."""
+    size = path.stat().st_size
+    if size == 0:
+        return []
+    bounds = [0]
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for i in range(1, shards):
+            newline = mm.find(b"\n", max(size * i // shards, bounds[-1]))
+            if newline == -1 or newline + 1 >= size:
+                break
+            if newline + 1 > bounds[-1]:
+                bounds.append(newline + 1)
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def _count_newlines(args: tuple[Path, int, int]) -> int:
+    path, start, end = args
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return mm[start:end].count(b"\n")
+
+
+def _mmap_lines(mm: mmap.mmap, start: int, end: int, first_line: int) -> Iterator[tuple[int, str]]:
+    line_num = first_line
+    pos = start
+    while pos < end:
+        newline = mm.find(b"\n", pos, end)
+        stop = end if newline == -1 else newline
+        yield line_num, mm[pos:stop].decode("utf-8")
+        line_num += 1
+        pos = stop + 1
+
+
+# Visitor factories of this pool worker process, set by _init_worker.
+_worker_factories: list[VisitorFactory] = []
+
+
+def _init_worker(factories: list[VisitorFactory]) -> None:
+    global _worker_factories
+    _worker_factories = factories
+
+
+def _run_shard(args: tuple[Path, int, int, int]) -> list[Visitor]:
+    path, start, end, first_line = args
+    visitors = [factory() for factory in _worker_factories]
+    prompts = PromptTable.for_dataset(path)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        _dispatch(_parse_lines(_mmap_lines(mm, start, end, first_line), prompts), visitors)
+    return visitors
+
+
+def run_visitors_parallel(
+    path: Path,
+    factories: list[VisitorFactory],
+    workers: int,
+    shards: int | None = None,
+) -> list[Any]:
+    """run_visitors over byte-range shards in a process pool.
+
+    factories must be picklable (classes or functools.partial); they are
+    sent to each worker once, and each shard gets fresh visitors from them,
+    merged into visitors built in this process.
+    Assumes LF line endings, as written by every producer in this repo.
+    """
+    ranges = shard_ranges(path, shards or workers * 4)
+    merged = [factory() for factory in factories]
+    if ranges:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(factories,)) as pool:
+            counts = list(pool.map(_count_newlines, [(path, start, end) for start, end in ranges]))
+            first_lines = [1]
+            for count in counts[:-1]:
+                first_lines.append(first_lines[-1] + count)
+            jobs = [(path, start, end, first) for (start, end), first in zip(ranges, first_lines)]
+            for shard_visitors in pool.map(_run_shard, jobs):
+                for visitor, shard_visitor in zip(merged, shard_visitors):
+                    visitor.merge(shard_visitor)
+    return [visitor.finish() for visitor in merged]
+
+
+def analyze_file(path: Path, factories: list[VisitorFactory], workers: int = 1) -> list[Any]:
+    """Run visitors from factories over path, serially or with a process pool."""
+    if workers > 1:
+        return run_visitors_parallel(path, factories, workers)
+    return run_visitors(path, [factory() for factory in factories])
@@ -11,19 +11,26 @@ Produces detailed reports about:
 Usage:
     python -m data.validate.reporter output/datasets/gastown_train.jsonl
     python -m data.validate.reporter output/datasets/gastown_train.jsonl --output output/report.md
+    python -m data.validate.reporter output/datasets/gastown_train.jsonl --role-map output/datasets/role_map.json
 """
 
 from __future__ import annotations
 
 import argparse
 import json
+import math
 import sys
 from collections import Counter, defaultdict
 from dataclasses import dataclass, field
 from datetime import datetime
+from functools import partial
 from pathlib import Path
 from typing import Any
 
+from data.transform.role_tagger import directory_role_counts, load_role_map
+from data.validate.engine import SampleView, Visitor, analyze_file
+from data.validate.streaming import Summary, ValueHistogram
+
 
 @dataclass
 class DatasetReport:
@@ -37,6 +44,7 @@ class DatasetReport:
     # Distributions
     role_distribution: dict[str, int] = field(default_factory=dict)
     source_distribution: dict[str, int] = field(default_factory=dict)
+    directory_roles: dict[str, int] = field(default_factory=dict)
     quality_score_stats: dict[str, float] = field(default_factory=dict)
     
     # Conversation stats
@@ -107,146 +115,170 @@ def analyze_commands(text: str) -> dict:
     return commands
 
 
-def generate_report(path: Path) -> DatasetReport:
-    """Generate comprehensive report for a dataset."""
-    report = DatasetReport(
-        path=str(path),
-        generated_at=datetime.now().isoformat(),
-        total_samples=0,
-        total_chars=0,
-        approx_tokens=0,
-    )
-    
-    role_counts: Counter = Counter()
-    source_counts: Counter = Counter()
-    quality_scores: list[float] = []
-    turn_counts: list[int] = []
-    char_counts: list[int] = []
-    tool_call_samples = 0
-    total_tool_calls = 0
-    
-    command_frequency: Counter = Counter()
-    workflow_patterns: Counter = Counter()
-    
-    # Workflow pattern definitions
-    workflows = {
-        "polecat_complete": ["gt hook", "bd mol current", "gt done"],
-        "mail_workflow": ["gt mail inbox", "gt mail read", "gt mail send"],
-        "bead_lifecycle": ["bd show", "bd update", "bd close"],
-        "git_cycle": ["git status", "git add", "git commit", "git push"],
-        "escalation": ["gt escalate", "gt mail send"],
-    }
-    
-    issues: list[str] = []
-    
-    with open(path, "r") as f:
-        for line_num, line in enumerate(f, 1):
-            line = line.strip()
-            if not line:
-                continue
-            
-            report.total_samples += 1
-            
-            try:
-                sample = json.loads(line)
-            except json.JSONDecodeError:
-                issues.append(f"Line {line_num}: Invalid JSON")
-                continue
-            
-            conversations = sample.get("conversations", [])
-            metadata = sample.get("metadata", {})
-            
-            # Extract text
-            full_text = "\n".join(m.get("value", "") for m in conversations)
-            
-            # Basic stats
-            turn_stats = compute_turn_stats(conversations)
-            turn_counts.append(turn_stats["turns"])
-            char_counts.append(turn_stats["chars"])
-            report.total_chars += turn_stats["chars"]
-            
-            if turn_stats["tool_calls"] > 0:
-                tool_call_samples += 1
-                total_tool_calls += turn_stats["tool_calls"]
-            
-            # Role and source
-            role = metadata.get("role", "unknown")
-            source = metadata.get("source", "unknown")
-            role_counts[role] += 1
-            source_counts[source] += 1
-            
-            # Quality score
-            score = metadata.get("quality_score", 0.0)
-            if score:
-                quality_scores.append(score)
-            
-            # Command analysis
-            commands = analyze_commands(full_text)
-            for cmd_list in commands.values():
-                for cmd in cmd_list:
-                    command_frequency[cmd] += 1
-            
-            # Workflow detection
-            for wf_name, wf_commands in workflows.items():
-                if any(cmd in full_text for cmd in wf_commands):
-                    workflow_patterns[wf_name] += 1
-    
-    # Compute statistics
-    report.role_distribution = dict(role_counts.most_common())
-    report.source_distribution = dict(source_counts.most_common())
-    
-    if quality_scores:
-        report.quality_score_stats = {
-            "min": round(min(quality_scores), 3),
-            "max": round(max(quality_scores), 3),
-            "mean": round(sum(quality_scores) / len(quality_scores), 3),
-            "median": round(sorted(quality_scores)[len(quality_scores) // 2], 3),
-        }
-    
-    if turn_counts:
-        sorted_turns = sorted(turn_counts)
-        report.turns_per_sample = {
-            "min": min(turn_counts),
-            "max": max(turn_counts),
-            "mean": round(sum(turn_counts) / len(turn_counts), 1),
-            "median": sorted_turns[len(turn_counts) // 2],
-        }
-    
-    if char_counts:
-        report.chars_per_sample = {
-            "min": min(char_counts),
-            "max": max(char_counts),
-            "mean": round(sum(char_counts) / len(char_counts), 0),
-            "total_mb": round(sum(char_counts) / 1_000_000, 2),
+# Workflow pattern definitions
+REPORT_WORKFLOWS = {
+    "polecat_complete": ["gt hook", "bd mol current", "gt done"],
+    "mail_workflow": ["gt mail inbox", "gt mail read", "gt mail send"],
+    "bead_lifecycle": ["bd show", "bd update", "bd close"],
+    "git_cycle": ["git status", "git add", "git commit", "git push"],
+    "escalation": ["gt escalate", "gt mail send"],
+}
+
+
+class ReportVisitor(Visitor):
+    """Engine visitor: finish() returns the DatasetReport."""
+
+    def __init__(self, path: Path, role_map: dict[str, str] | None = None):
+        self.report = DatasetReport(
+            path=str(path),
+            generated_at=datetime.now().isoformat(),
+            total_samples=0,
+            total_chars=0,
+            approx_tokens=0,
+        )
+        self.role_map = role_map
+        self.role_counts: Counter = Counter()
+        self.source_counts: Counter = Counter()
+        self.quality = ValueHistogram()
+        self.turns = ValueHistogram()
+        self.chars = Summary()
+        self.tool_call_samples = 0
+        self.total_tool_calls = 0
+        self.command_frequency: Counter = Counter()
+        self.workflow_patterns: Counter = Counter()
+        self.issues: list[str] = []
+
+    def visit(self, view: SampleView) -> None:
+        report = self.report
+        report.total_samples += 1
+        metadata = view.metadata
+        full_text = view.full_text
+
+        # Basic stats
+        turn_stats = view.turn_stats
+        self.turns.add(turn_stats["turns"])
+        self.chars.add(turn_stats["chars"])
+        report.total_chars += turn_stats["chars"]
+
+        if turn_stats["tool_calls"] > 0:
+            self.tool_call_samples += 1
+            self.total_tool_calls += turn_stats["tool_calls"]
+
+        # Role and source
+        self.role_counts[metadata.get("role", "unknown")] += 1
+        self.source_counts[metadata.get("source", "unknown")] += 1
+
+        # Quality score
+        score = metadata.get("quality_score", 0.0)
+        if score:
+            self.quality.add(score)
+
+        # Command analysis
+        for cmd_list in analyze_commands(full_text).values():
+            for cmd in cmd_list:
+                self.command_frequency[cmd] += 1
+
+        # Workflow detection
+        for wf_name, wf_commands in REPORT_WORKFLOWS.items():
+            if any(cmd in full_text for cmd in wf_commands):
+                self.workflow_patterns[wf_name] += 1
+
+    def visit_invalid(self, line_num: int, error: json.JSONDecodeError) -> None:
+        self.report.total_samples += 1
+        self.issues.append(f"Line {line_num}: Invalid JSON")
+
+    def merge(self, other: "ReportVisitor") -> None:
+        self.report.total_samples += other.report.total_samples
+        self.report.total_chars += other.report.total_chars
+        self.role_counts.update(other.role_counts)
+        self.source_counts.update(other.source_counts)
+        self.quality.merge(other.quality)
+        self.turns.merge(other.turns)
+        self.chars.merge(other.chars)
+        self.tool_call_samples += other.tool_call_samples
+        self.total_tool_calls += other.total_tool_calls
+        self.command_frequency.update(other.command_frequency)
+        self.workflow_patterns.update(other.workflow_patterns)
+        self.issues.extend(other.issues)
+
+    def finish(self) -> DatasetReport:
+        report = self.report
+        quality = self.quality
+        turns = self.turns
+        chars = self.chars
+        command_frequency = self.command_frequency
+        issues = self.issues
+
+        # Compute statistics
+        report.role_distribution = dict(self.role_counts.most_common())
+        report.source_distribution = dict(self.source_counts.most_common())
+
+        if quality.count:
+            report.quality_score_stats = {
+                "min": round(min(quality.counts), 3),
+                "max": round(max(quality.counts), 3),
+                "mean": round(math.fsum(q * n for q, n in quality.counts.items()) / quality.count, 3),
+                "median": round(quality.quantile(0.5), 3),
+            }
+
+        if turns.count:
+            report.turns_per_sample = {
+                "min": min(turns.counts),
+                "max": max(turns.counts),
+                "mean": round(sum(t * n for t, n in turns.counts.items()) / turns.count, 1),
+                "median": turns.quantile(0.5),
+            }
+
+        if chars.count:
+            report.chars_per_sample = {
+                "min": chars.min,
+                "max": chars.max,
+                "mean": round(chars.mean(), 0),
+                "total_mb": round(chars.total / 1_000_000, 2),
+            }
+
+        report.approx_tokens = report.total_chars // 4
+
+        if self.role_map is not None:
+            report.directory_roles = directory_role_counts(self.role_map)
+            untagged = sum(1 for r in self.role_map.values() if r in ("unknown", "mixed"))
+            if untagged:
+                issues.append(f"{untagged} project directories have no role (unknown or mixed)")
+
+        # Command coverage
+        top_commands = command_frequency.most_common(50)
+        report.command_coverage = {
+            "unique_commands": len(command_frequency),
+            "top_commands": dict(top_commands),
+            "by_type": {
+                "gt": len([c for c in command_frequency if c.startswith("gt ")]),
+                "bd": len([c for c in command_frequency if c.startswith("bd ")]),
+                "git": len([c for c in command_frequency if c.startswith("git ")]),
+            }
         }
-    
-    report.approx_tokens = report.total_chars // 4
-    
-    # Command coverage
-    top_commands = command_frequency.most_common(50)
-    report.command_coverage = {
-        "unique_commands": len(command_frequency),
-        "top_commands": dict(top_commands),
-        "by_type": {
-            "gt": len([c for c in command_frequency if c.startswith("gt ")]),
-            "bd": len([c for c in command_frequency if c.startswith("bd ")]),
-            "git": len([c for c in command_frequency if c.startswith("git ")]),
+
+        report.workflow_coverage = dict(self.workflow_patterns)
+
+        report.tool_call_stats = {
+            "samples_with_tool_calls": self.tool_call_samples,
+            "total_tool_calls": self.total_tool_calls,
+            "ratio": round(self.tool_call_samples / max(report.total_samples, 1), 3),
         }
-    }
-    
-    report.workflow_coverage = dict(workflow_patterns)
-    
-    report.tool_call_stats = {
-        "samples_with_tool_calls": tool_call_samples,
-        "total_tool_calls": total_tool_calls,
-        "ratio": round(tool_call_samples / max(report.total_samples, 1), 3),
-    }
-    
-    # Generate recommendations
-    report.recommendations = generate_recommendations(report, issues)
-    report.potential_issues = issues[:20]  # Limit issues shown
-    
-    return report
+
+        # Generate recommendations
+        report.recommendations = generate_recommendations(report, issues)
+        report.potential_issues = issues[:20]  # Limit issues shown
+
+        return report
+
+
+def generate_report(path: Path, role_map: dict[str, str] | None = None, workers: int = 1) -> DatasetReport:
+    """Generate comprehensive report for a dataset.
+
+    role_map (directory → role, see role_tagger.RoleCache) adds the number
+    of project directories per role.
+    """
+    return analyze_file(path, [partial(ReportVisitor, path, role_map)], workers)[0]
 
 
 def generate_recommendations(report: DatasetReport, issues: list[str]) -> list[str]:
@@ -318,6 +350,13 @@ def print_report(report: DatasetReport) -> None:
             print(f"  {source:30} {count:6,} ({pct:5.1f}%)")
         print()
     
+    # Directory roles
+    if report.directory_roles:
+        print("📂 PROJECT DIRECTORIES PER ROLE")
+        for role, count in report.directory_roles.items():
+            print(f"  {role:15} {count:6,}")
+        print()
+    
     # Quality scores
     if report.quality_score_stats:
         print("⭐ QUALITY SCORES")
@@ -409,6 +448,17 @@ def save_markdown_report(report: DatasetReport, output_path: Path) -> None:
         pct = count / max(report.total_samples, 1) * 100
         md_lines.append(f"| {role} | {count:,} | {pct:.1f}% |")
     
+    if report.directory_roles:
+        md_lines.extend([
+            "",
+            "### Project Directories per Role",
+            "",
+            "| Role | Directories |",
+            "|------|-------------|",
+        ])
+        for role, count in report.directory_roles.items():
+            md_lines.append(f"| {role} | {count:,} |")
+    
     md_lines.extend([
         "",
         "---",
@@ -494,13 +544,26 @@ def main():
         default=None,
         help="Output path for JSON report (optional)"
     )
+    parser.add_argument(
+        "--role-map",
+        type=Path,
+        default=None,
+        help="Role map JSON written by data.pipeline (optional)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Analyze in N processes over byte-range shards (default: 1, serial)"
+    )
     args = parser.parse_args()
     
     if not args.input_file.exists():
         print(f"File not found: {args.input_file}")
         sys.exit(1)
     
-    report = generate_report(args.input_file)
+    role_map = load_role_map(args.role_map) if args.role_map else None
+    report = generate_report(args.input_file, role_map, args.workers)
     print_report(report)
     
     if args.output:
@@ -2,33 +2,48 @@
 
 Usage:
     python -m data.validate.schema output/datasets/gastown_train.jsonl
+    python -m data.validate.schema output/datasets/gastown_train.jsonl --workers 32
+    python -m data.validate.schema output/datasets/gastown_train.jsonl --cache
 """
 
 from __future__ import annotations
 
+import argparse
 import json
 import sys
+from functools import partial
 from pathlib import Path
 
+from data.validate.engine import SampleView, Visitor, analyze_file
+from data.validate.validation_cache import ValidationCache
+
 VALID_ROLES = {"system", "human", "gpt"}
 
+# Bump when the checks below change; invalidates cached results.
+VALIDATOR_VERSION = "1"
+
 
 def validate_sample(sample: dict, line_num: int) -> list[str]:
     """Validate a single training sample. Returns list of errors."""
+    return [f"line {line_num}{error}" for error in sample_errors(sample)]
+
+
+def sample_errors(sample: dict) -> list[str]:
+    """Errors of a sample without the line prefix (": ..." or ", msg i: ...")."""
     errors = []
 
     conversations = sample.get("conversations")
     if not isinstance(conversations, list):
-        errors.append(f"line {line_num}: 'conversations' must be a list")
+        errors.append(": 'conversations' must be a list")
         return errors
 
     if len(conversations) < 2:
-        errors.append(f"line {line_num}: need at least 2 conversation turns")
+        errors.append(": need at least 2 conversation turns")
         return errors
 
     # Check first message is system.
     if conversations[0].get("from") != "system":
-        errors.append(f"line {line_num}: first message must be 'system'")
+        errors.append(": first message must be 'system'")
 
     # Check alternation: after system, should alternate human/gpt.
     prev_role = "system"
@@ -37,69 +52,89 @@ def validate_sample(sample: dict, line_num: int) -> list[str]:
         value = msg.get("value")
 
         if from_role not in VALID_ROLES:
-            errors.append(f"line {line_num}, msg {i}: invalid role '{from_role}'")
+            errors.append(f", msg {i}: invalid role '{from_role}'")
 
         if not isinstance(value, str) or not value.strip():
-            errors.append(f"line {line_num}, msg {i}: empty or non-string value")
+            errors.append(f", msg {i}: empty or non-string value")
 
         # Check alternation (after system).
         if i > 0:
             if prev_role == "human" and from_role != "gpt":
-                errors.append(f"line {line_num}, msg {i}: expected 'gpt' after 'human', got '{from_role}'")
+                errors.append(f", msg {i}: expected 'gpt' after 'human', got '{from_role}'")
             elif prev_role == "gpt" and from_role != "human":
-                errors.append(f"line {line_num}, msg {i}: expected 'human' after 'gpt', got '{from_role}'")
+                errors.append(f", msg {i}: expected 'human' after 'gpt', got '{from_role}'")
             elif prev_role == "system" and from_role != "human":
-                errors.append(f"line {line_num}, msg {i}: expected 'human' after 'system', got '{from_role}'")
+                errors.append(f", msg {i}: expected 'human' after 'system', got '{from_role}'")
 
         prev_role = from_role
 
     # Must end with gpt.
     if conversations[-1].get("from") != "gpt":
-        errors.append(f"line {line_num}: conversation must end with 'gpt' turn")
+        errors.append(": conversation must end with 'gpt' turn")
 
     return errors
 
 
-def validate_file(path: Path) -> tuple[int, int, list[str]]:
+def make_cache(path: Path | None = None) -> ValidationCache:
+    """Validation cache for this validator version."""
+    return ValidationCache("schema", VALIDATOR_VERSION, path)
+
+
+class SchemaVisitor(Visitor):
+    """Engine visitor: finish() returns (total, valid, errors).
+
+    With a cache, samples whose content hash was validated before reuse
+    the cached errors.
+    """
+
+    def __init__(self, cache: ValidationCache | None = None):
+        self.total = 0
+        self.valid = 0
+        self.errors: list[str] = []
+        self.cache = cache
+
+    def visit(self, view: SampleView) -> None:
+        self.total += 1
+        if self.cache is None:
+            errors = sample_errors(view.sample)
+        else:
+            errors = self.cache.get(view.digest)
+            if errors is None:
+                errors = sample_errors(view.sample)
+                self.cache.put(view.digest, errors)
+        if errors:
+            self.errors.extend(f"line {view.line_num}{error}" for error in errors)
+        else:
+            self.valid += 1
+
+    def visit_invalid(self, line_num: int, error: json.JSONDecodeError) -> None:
+        self.total += 1
+        self.errors.append(f"line {line_num}: invalid JSON: {error}")
+
+    def merge(self, other: "SchemaVisitor") -> None:
+        self.total += other.total
+        self.valid += other.valid
+        self.errors.extend(other.errors)
+        if self.cache is not None:
+            self.cache.merge(other.cache)
+
+    def __getstate__(self) -> dict:
+        # Shard visitors share their worker's cache; send back only this shard's results.
+        return {**self.__dict__, "cache": self.cache.take_new() if self.cache is not None else None}
+
+    def finish(self) -> tuple[int, int, list[str]]:
+        if self.cache is not None:
+            self.cache.save()
+        return self.total, self.valid, self.errors
+
+
+def validate_file(path: Path, workers: int = 1, cache: ValidationCache | None = None) -> tuple[int, int, list[str]]:
     """Validate a JSONL file. Returns (total, valid, errors)."""
-    total = 0
-    valid = 0
-    all_errors: list[str] = []
-
-    with open(path, "r") as f:
-        for line_num, line in enumerate(f, 1):
-            line = line.strip()
-            if not line:
-                continue
-
-            total += 1
-            try:
-                sample = json.loads(line)
-            except json.JSONDecodeError as e:
-                all_errors.append(f"line {line_num}: invalid JSON: {e}")
-                continue
-
-            errors = validate_sample(sample, line_num)
-            if errors:
-                all_errors.extend(errors)
-            else:
-                valid += 1
+    return analyze_file(path, [partial(SchemaVisitor, cache)], workers)[0]
 
-    return total, valid, all_errors
-
-
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python -m data.validate.schema <file.jsonl>")
-        sys.exit(1)
-
-    path = Path(sys.argv[1])
-    if not path.exists():
-        print(f"File not found: {path}")
-        sys.exit(1)
-
-    total, valid, errors = validate_file(path)
 
+def print_summary(path: Path, total: int, valid: int, errors: list[str]) -> None:
+    """Print validation results to console."""
     print(f"\nValidation: {path}")
     print(f"  Total samples: {total}")
     print(f"  Valid: {valid}")
@@ -111,10 +146,27 @@ def main():
             print(f"    {err}")
         if len(errors) > 20:
             print(f"    ... and {len(errors) - 20} more")
-        sys.exit(1)
     else:
         print("  All samples valid.")
 
 
+def main():
+    parser = argparse.ArgumentParser(description="Validate training data format against Axolotl's sharegpt expectations")
+    parser.add_argument("input_file", type=Path, help="Input JSONL file")
+    parser.add_argument("--workers", type=int, default=1, help="Validate in N processes over byte-range shards (default: 1, serial)")
+    parser.add_argument("--cache", action="store_true", help="Reuse results for samples validated before (output/cache)")
+    args = parser.parse_args()
+
+    path = args.input_file
+    if not path.exists():
+        print(f"File not found: {path}")
+        sys.exit(1)
+
+    total, valid, errors = validate_file(path, args.workers, make_cache() if args.cache else None)
+    print_summary(path, total, valid, errors)
+    if errors:
+        sys.exit(1)
+
+
 if __name__ == "__main__":
     main()
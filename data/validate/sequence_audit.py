@@ -0,0 +1,227 @@
+"""Audit a dataset against an Axolotl config's sequence_len before training.
+
+Axolotl truncates samples longer than sequence_len, so their tail never
+reaches the loss, and with sample_packing the leftover space of every
+packed row is padding. This audit reads the config (base_model,
+sequence_len, sample_packing, datasets), tokenizes every sample the way
+the chatml template renders it, and reports per role:
+
+    over_sequence_len   fraction of samples longer than sequence_len
+    truncated_tokens    tokens cut off (and how many of them were trainable)
+    packing             best-fit packing efficiency (see data.transform.packing)
+
+Segments are counted with data.transform.token_counter, so repeated text
+(system prompts, chatml framing) is encoded once, misses are batch-encoded
+and counts are cached on disk across runs. Runs on CPU; --approx uses the
+chars/4 estimate when no tokenizer is available.
+
+Usage:
+    python -m data.validate.sequence_audit configs/base.yml
+    python -m data.validate.sequence_audit configs/roles/deacon.yml configs/roles/witness.yml --report output/datasets/sequence_audit.json
+    python -m data.validate.sequence_audit configs/base.yml --dataset output/datasets/gastown_val.jsonl --max-overflow 0.01
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import yaml
+
+from data.transform.chatml import chatml_segments
+from data.transform.packing import DEFAULT_SEQUENCE_LEN, packing_efficiency
+from data.transform.prompt_table import iter_expanded
+from data.transform.token_counter import TokenCounter, make_counter
+
+# Conversations whose segments are counted per TokenCounter call.
+DEFAULT_BATCH = 256
+
+# Templates rendered exactly by data.transform.chatml.
+CHATML_TEMPLATES = {"chatml", None}
+
+
+def load_config(path: Path) -> dict:
+    """The audit-relevant fields of an Axolotl config."""
+    with open(path, "r") as f:
+        config = yaml.safe_load(f) or {}
+    datasets = config.get("datasets") or []
+    return {
+        "config": str(path),
+        "base_model": config.get("base_model"),
+        "sequence_len": int(config.get("sequence_len") or DEFAULT_SEQUENCE_LEN),
+        "sample_packing": bool(config.get("sample_packing", False)),
+        "datasets": [Path(d["path"]) for d in datasets if d.get("path")],
+        "chat_template": next((d.get("chat_template") for d in datasets if d.get("chat_template")), None),
+    }
+
+
+def sample_lengths(
+    conversations: list[dict], counts: Iterator[int], sequence_len: int,
+) -> tuple[int, int, int]:
+    """(tokens, trainable tokens, trainable tokens past sequence_len) of one conversation.
+
+    counts yields the token count of each chatml segment in order.
+    """
+    tokens = trainable = lost_trainable = 0
+    for _, is_trainable in chatml_segments(conversations):
+        n = next(counts)
+        if is_trainable:
+            trainable += n
+            lost_trainable += max(0, tokens + n - max(tokens, sequence_len))
+        tokens += n
+    return tokens, trainable, lost_trainable
+
+
+def iter_sample_lengths(
+    samples: Iterable[dict],
+    counter: TokenCounter,
+    sequence_len: int,
+    batch_size: int = DEFAULT_BATCH,
+) -> Iterator[tuple[str, int, int, int]]:
+    """(role, tokens, trainable, lost trainable) per sample, counting in batches."""
+    batch: list[dict] = []
+
+    def flush():
+        texts = [text for s in batch for text, _ in chatml_segments(s.get("conversations", []))]
+        counts = iter(counter.count_many(texts))
+        for s in batch:
+            role = s.get("metadata", {}).get("role", "unknown")
+            yield (role, *sample_lengths(s.get("conversations", []), counts, sequence_len))
+        batch.clear()
+
+    for sample in samples:
+        batch.append(sample)
+        if len(batch) >= batch_size:
+            yield from flush()
+    yield from flush()
+
+
+def audit_lengths(lengths: list[int], trainable: int, lost_trainable: int, sequence_len: int, sample_packing: bool) -> dict:
+    """Overflow and packing summary for one group of samples."""
+    over = [n for n in lengths if n > sequence_len]
+    result = {
+        "samples": len(lengths),
+        "over_sequence_len": len(over),
+        "over_fraction": round(len(over) / max(len(lengths), 1), 4),
+        "max_tokens": max(lengths, default=0),
+        "total_tokens": sum(lengths),
+        "truncated_tokens": sum(n - sequence_len for n in over),
+        "trainable_tokens": trainable,
+        "truncated_trainable_tokens": lost_trainable,
+    }
+    if sample_packing:
+        packing = packing_efficiency(lengths, sequence_len)
+        result["packing"] = {k: packing[k] for k in ("bins", "total_slots", "efficiency")}
+    return result
+
+
+def audit_dataset(
+    path: Path,
+    counter: TokenCounter,
+    sequence_len: int = DEFAULT_SEQUENCE_LEN,
+    sample_packing: bool = True,
+) -> dict:
+    """Per-role (and "all") overflow and packing report for a dataset."""
+    lengths: dict[str, list[int]] = defaultdict(list)
+    trainable: dict[str, int] = defaultdict(int)
+    lost: dict[str, int] = defaultdict(int)
+    for role, tokens, role_trainable, role_lost in iter_sample_lengths(iter_expanded(path), counter, sequence_len):
+        lengths[role].append(tokens)
+        trainable[role] += role_trainable
+        lost[role] += role_lost
+    counter.save()
+
+    by_role = {
+        role: audit_lengths(lengths[role], trainable[role], lost[role], sequence_len, sample_packing)
+        for role in sorted(lengths)
+    }
+    all_lengths = [n for role in sorted(lengths) for n in lengths[role]]
+    overall = audit_lengths(all_lengths, sum(trainable.values()), sum(lost.values()), sequence_len, sample_packing)
+    return {"dataset": str(path), "all": overall, "by_role": by_role}
+
+
+def audit_config(config: dict, counter: TokenCounter, datasets: list[Path] | None = None) -> dict:
+    """Audit every dataset of a loaded config (or the given datasets instead)."""
+    return {
+        **{k: v for k, v in config.items() if k != "datasets"},
+        "tokenizer": counter.stats()["tokenizer"],
+        "template_exact": config["chat_template"] in CHATML_TEMPLATES,
+        "datasets": [
+            audit_dataset(path, counter, config["sequence_len"], config["sample_packing"])
+            for path in (datasets or config["datasets"])
+        ],
+    }
+
+
+def print_audit(audit: dict) -> None:
+    """Print one config's audit to console."""
+    print(f"\n--- Sequence audit: {audit['config']} "
+          f"(sequence_len {audit['sequence_len']}, {audit['tokenizer']}) ---")
+    if not audit["template_exact"]:
+        print(f"  note: counted with chatml, config uses chat_template {audit['chat_template']}")
+    for dataset in audit["datasets"]:
+        print(f"\n  {dataset['dataset']}")
+        print(f"    {'role':<12} {'samples':>8} {'over':>7} {'over%':>7} {'max':>7} "
+              f"{'cut tokens':>11} {'cut trainable':>14} {'packing':>8}")
+        rows = [*dataset["by_role"].items(), ("all", dataset["all"])]
+        for role, r in rows:
+            packing = f"{r['packing']['efficiency']:.1%}" if "packing" in r else "-"
+            print(f"    {role:<12} {r['samples']:>8} {r['over_sequence_len']:>7} {r['over_fraction']:>7.2%} "
+                  f"{r['max_tokens']:>7} {r['truncated_tokens']:>11} {r['truncated_trainable_tokens']:>14} {packing:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report samples that overflow an Axolotl config's sequence_len")
+    parser.add_argument("configs", type=Path, nargs="+", help="Axolotl config YAML files")
+    parser.add_argument("--dataset", type=Path, action="append", default=None,
+                        help="Audit this JSONL instead of the config's datasets (repeatable)")
+    parser.add_argument("--tokenizer", default=None, help="Tokenizer to count with (default: the config's base_model)")
+    parser.add_argument("--approx", action="store_true", help="Count chars/4 instead of loading a tokenizer")
+    parser.add_argument("--report", type=Path, default=None, help="Write the audit as JSON")
+    parser.add_argument("--max-overflow", type=float, default=None,
+                        help="Exit 1 if any role has more than this fraction of samples over sequence_len")
+    args = parser.parse_args()
+
+    audits = []
+    counters: dict[str | None, TokenCounter] = {}
+    for config_path in args.configs:
+        if not config_path.exists():
+            print(f"File not found: {config_path}")
+            sys.exit(1)
+        config = load_config(config_path)
+        for path in args.dataset or config["datasets"]:
+            if not path.exists():
+                print(f"File not found: {path}")
+                sys.exit(1)
+        tokenizer_name = None if args.approx else (args.tokenizer or config["base_model"])
+        if tokenizer_name not in counters:
+            counters[tokenizer_name] = make_counter(tokenizer_name)
+        audit = audit_config(config, counters[tokenizer_name], args.dataset)
+        print_audit(audit)
+        audits.append(audit)
+
+    if args.report:
+        args.report.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.report, "w") as f:
+            json.dump(audits, f, indent=2)
+        print(f"\n  Report written to {args.report}")
+
+    if args.max_overflow is not None:
+        worst = max(
+            ((r["over_fraction"], role, audit["config"])
+             for audit in audits for dataset in audit["datasets"] for role, r in dataset["by_role"].items()),
+            default=(0.0, "", ""),
+        )
+        if worst[0] > args.max_overflow:
+            print(f"\n❌ {worst[1]} ({worst[2]}): {worst[0]:.2%} of samples exceed sequence_len "
+                  f"(max {args.max_overflow:.2%})")
+            sys.exit(1)
+        print(f"\n✓ Every role is within {args.max_overflow:.2%} overflow")
+
+
+if __name__ == "__main__":
+    main()
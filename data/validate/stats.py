@@ -1,111 +1,207 @@
 """Print dataset statistics for a training JSONL file.
 
+All statistics are streamed in constant memory and merge exactly across
+--workers shards (see data.validate.streaming). Besides the totals they
+include p50/p90/p99 token length per role (within 1%), a role × quality ×
+token length joint distribution and tool-call density. Token lengths are
+tokenizer counts with --tokenizer, chars / 4 otherwise.
+
 Usage:
     python -m data.validate.stats output/datasets/gastown_train.jsonl
+    python -m data.validate.stats output/datasets/gastown_train.jsonl --tokenizer Qwen/Qwen2.5-7B-Instruct
+    python -m data.validate.stats output/datasets/gastown_train.jsonl --role-map output/datasets/role_map.json
 """
 
 from __future__ import annotations
 
-import json
+import argparse
 import sys
 from collections import Counter
+from functools import partial
 from pathlib import Path
 
+from data.transform.role_tagger import directory_role_counts, load_role_map
+from data.transform.token_counter import TokenCounter, make_counter
+from data.validate.engine import SampleView, Visitor, analyze_file
+from data.validate.streaming import DatasetProfile, QuantileSketch, Summary, ValueHistogram
+
+
+class StatsVisitor(Visitor):
+    """Engine visitor: finish() returns the stats dict. Unparseable lines are skipped."""
+
+    def __init__(self, token_counter: TokenCounter | None = None, role_map: dict[str, str] | None = None):
+        self.token_counter = token_counter
+        self.role_map = role_map
+        # Counts a shard visitor computed, handed back to the parent's counter.
+        self.new_counts: dict[str, int] = {}
+        self.total = 0
+        self.role_counts: Counter = Counter()
+        self.turns = ValueHistogram()
+        self.chars = Summary()
+        self.quality = Summary()
+        self.tool_call_samples = 0
+        self.source_counts: Counter = Counter()
+        self.tokens = QuantileSketch()
+        self.profile = DatasetProfile()
+
+    def visit(self, view: SampleView) -> None:
+        self.total += 1
+
+        meta = view.metadata
+        role = meta.get("role", "unknown")
+        self.role_counts[role] += 1
+
+        score = meta.get("quality_score", 0.0)
+        if score:
+            self.quality.add(score)
+
+        self.source_counts[meta.get("source", "unknown")] += 1
+
+        # Count non-system turns.
+        turn_stats = view.turn_stats
+        self.turns.add(turn_stats["turns"])
+        self.chars.add(turn_stats["chars"])
+
+        if self.token_counter is not None:
+            tokens = self.token_counter.count_conversation(view.conversations)
+            self.tokens.add(tokens)
+        else:
+            tokens = turn_stats["chars"] // 4
+        self.profile.add(role, tokens, score or None, turn_stats["turns"], turn_stats["tool_calls"])
+
+        # Check for tool calls.
+        if turn_stats["tool_calls"]:
+            self.tool_call_samples += 1
+
+    def merge(self, other: "StatsVisitor") -> None:
+        self.total += other.total
+        self.role_counts.update(other.role_counts)
+        self.turns.merge(other.turns)
+        self.chars.merge(other.chars)
+        self.quality.merge(other.quality)
+        self.tool_call_samples += other.tool_call_samples
+        self.source_counts.update(other.source_counts)
+        self.tokens.merge(other.tokens)
+        self.profile.merge(other.profile)
+        if self.token_counter is not None:
+            self.token_counter.merge(other.new_counts)
+
+    def __getstate__(self) -> dict:
+        # Shard visitors share their worker's counter; send back only the
+        # counts it computed since, so the parent alone appends to the cache.
+        new_counts = self.token_counter.take_new() if self.token_counter is not None else {}
+        return {**self.__dict__, "token_counter": None, "new_counts": new_counts}
+
+    def finish(self) -> dict:
+        total = self.total
+        turns = self.turns.counts
+        chars = self.chars
+        quality = self.quality
+        tokens = self.tokens.summary
+        tool_call_samples = self.tool_call_samples
+
+        stats = {
+            "total_samples": total,
+            "role_distribution": dict(self.role_counts.most_common()),
+            "source_distribution": dict(self.source_counts.most_common()),
+            "turns_per_sample": {
+                "min": min(turns) if turns else 0,
+                "max": max(turns) if turns else 0,
+                "mean": round(sum(t * n for t, n in turns.items()) / max(self.turns.count, 1), 1),
+                "median": self.turns.quantile(0.5),
+            },
+            "chars_per_sample": {
+                "min": chars.min or 0,
+                "max": chars.max or 0,
+                "mean": round(chars.mean(), 0),
+                "total_mb": round(chars.total / 1_000_000, 2),
+            },
+            "approx_tokens_per_sample": {
+                "mean": round(chars.mean() / 4, 0),
+            },
+            "quality_score": {
+                "min": round(quality.min, 3) if quality.count else 0,
+                "max": round(quality.max, 3) if quality.count else 0,
+                "mean": round(quality.mean(), 3),
+            },
+            "samples_with_tool_calls": tool_call_samples,
+            "tool_call_ratio": round(tool_call_samples / max(total, 1), 3),
+            "tool_call_density": self.profile.tool_call_density(),
+            "token_length_by_role": self.profile.token_quantiles(),
+            "joint_distribution": self.profile.joint_distribution(),
+        }
+
+        if self.token_counter is not None:
+            stats["tokens_per_sample"] = {
+                "tokenizer": self.token_counter.stats()["tokenizer"],
+                "min": tokens.min or 0,
+                "max": tokens.max or 0,
+                "mean": round(tokens.mean(), 0),
+                "median": round(self.tokens.quantile(0.5)),
+                "total": round(tokens.total),
+            }
+            self.token_counter.save()
+
+        if self.role_map is not None:
+            stats["directory_roles"] = directory_role_counts(self.role_map)
+            stats["untagged_directories"] = sorted(d for d, r in self.role_map.items() if r in ("unknown", "mixed"))
+
+        return stats
+
+
+def compute_stats(
+    path: Path,
+    token_counter: TokenCounter | None = None,
+    role_map: dict[str, str] | None = None,
+    workers: int = 1,
+) -> dict:
+    """Compute statistics for a training JSONL file.
+
+    With a token_counter, also reports real (chatml-rendered) token
+    counts per sample in "tokens_per_sample" (the median to within 1%,
+    like the per-role quantiles). With a role_map (see
+    role_tagger.RoleCache), also reports project directories per role.
+    """
+    return analyze_file(path, [partial(StatsVisitor, token_counter, role_map)], workers)[0]
+
+
+def print_stats(path: Path, stats: dict) -> None:
+    """Print stats to console."""
+    print(f"\n--- Dataset Statistics: {path.name} ---\n")
+    _print_items(stats, 1)
 
-def compute_stats(path: Path) -> dict:
-    """Compute statistics for a training JSONL file."""
-    total = 0
-    role_counts: Counter = Counter()
-    turn_counts: list[int] = []
-    char_counts: list[int] = []
-    quality_scores: list[float] = []
-    tool_call_samples = 0
-    source_counts: Counter = Counter()
-
-    with open(path, "r") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-
-            sample = json.loads(line)
-            total += 1
-
-            meta = sample.get("metadata", {})
-            role = meta.get("role", "unknown")
-            role_counts[role] += 1
-
-            score = meta.get("quality_score", 0.0)
-            if score:
-                quality_scores.append(score)
-
-            source = meta.get("source", "unknown")
-            source_counts[source] += 1
-
-            conversations = sample.get("conversations", [])
-            # Count non-system turns.
-            turns = [m for m in conversations if m.get("from") != "system"]
-            turn_counts.append(len(turns))
-
-            total_chars = sum(len(m.get("value", "")) for m in conversations)
-            char_counts.append(total_chars)
-
-            # Check for tool calls.
-            for msg in conversations:
-                if msg.get("from") == "gpt" and "<tool_call" in msg.get("value", ""):
-                    tool_call_samples += 1
-                    break
-
-    return {
-        "total_samples": total,
-        "role_distribution": dict(role_counts.most_common()),
-        "source_distribution": dict(source_counts.most_common()),
-        "turns_per_sample": {
-            "min": min(turn_counts) if turn_counts else 0,
-            "max": max(turn_counts) if turn_counts else 0,
-            "mean": round(sum(turn_counts) / max(len(turn_counts), 1), 1),
-            "median": sorted(turn_counts)[len(turn_counts) // 2] if turn_counts else 0,
-        },
-        "chars_per_sample": {
-            "min": min(char_counts) if char_counts else 0,
-            "max": max(char_counts) if char_counts else 0,
-            "mean": round(sum(char_counts) / max(len(char_counts), 1), 0),
-            "total_mb": round(sum(char_counts) / 1_000_000, 2),
-        },
-        "approx_tokens_per_sample": {
-            "mean": round(sum(char_counts) / max(len(char_counts), 1) / 4, 0),
-        },
-        "quality_score": {
-            "min": round(min(quality_scores), 3) if quality_scores else 0,
-            "max": round(max(quality_scores), 3) if quality_scores else 0,
-            "mean": round(sum(quality_scores) / max(len(quality_scores), 1), 3),
-        },
-        "samples_with_tool_calls": tool_call_samples,
-        "tool_call_ratio": round(tool_call_samples / max(total, 1), 3),
-    }
 
+def _print_items(items: dict, depth: int) -> None:
+    indent = "  " * depth
+    for key, value in items.items():
+        if isinstance(value, dict):
+            print(f"{indent}{key}:")
+            _print_items(value, depth + 1)
+        else:
+            print(f"{indent}{key}: {value}")
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python -m data.validate.stats <file.jsonl>")
-        sys.exit(1)
 
-    path = Path(sys.argv[1])
+def main():
+    parser = argparse.ArgumentParser(description="Print dataset statistics for a training JSONL file")
+    parser.add_argument("input_file", type=Path, help="Input JSONL file")
+    parser.add_argument(
+        "--tokenizer",
+        default=None,
+        help="HuggingFace tokenizer for exact token counts (e.g. Qwen/Qwen2.5-7B-Instruct)",
+    )
+    parser.add_argument("--role-map", type=Path, default=None, help="Role map JSON written by data.pipeline")
+    parser.add_argument("--workers", type=int, default=1, help="Compute in N processes over byte-range shards (default: 1, serial)")
+    args = parser.parse_args()
+
+    path = args.input_file
     if not path.exists():
         print(f"File not found: {path}")
         sys.exit(1)
 
-    stats = compute_stats(path)
-
-    print(f"\n--- Dataset Statistics: {path.name} ---\n")
-    for key, value in stats.items():
-        if isinstance(value, dict):
-            print(f"  {key}:")
-            for k, v in value.items():
-                print(f"    {k}: {v}")
-        else:
-            print(f"  {key}: {value}")
-
+    counter = make_counter(args.tokenizer) if args.tokenizer else None
+    role_map = load_role_map(args.role_map) if args.role_map else None
+    stats = compute_stats(path, token_counter=counter, role_map=role_map, workers=args.workers)
+    print_stats(path, stats)
 
 if __name__ == "__main__":
     main()
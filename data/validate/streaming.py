@@ -0,0 +1,258 @@
+"""Constant-memory, mergeable statistics for the data.validate tools.
+
+Every accumulator here has an add() for one value and a merge() for an
+accumulator of the same shape, and merging gives exactly the result of
+adding all values to one accumulator, whatever the split. That keeps
+sharded runs (data.validate.engine, --workers) identical to serial ones.
+
+    Summary          count / exact sum / min / max
+    ValueHistogram   exact distribution of discrete values (turn counts,
+                     rounded scores); memory grows with distinct values only
+    QuantileSketch   relative-error quantiles of positive values (DDSketch:
+                     log-spaced buckets, 1% relative accuracy by default)
+    BucketHistogram  counts over fixed bucket edges
+
+DatasetProfile combines them into the per-role token-length quantiles,
+the role × quality × length joint distribution and the tool-call density
+reported by data.validate.stats.
+"""
+
+from __future__ import annotations
+
+import bisect
+import math
+from collections import Counter
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+QUALITY_EDGES = [0.2, 0.4, 0.6, 0.8]
+TOKEN_LENGTH_EDGES = [256, 512, 1024, 2048, 4096, 8192]
+# Tool-call messages per non-system turn.
+TOOL_DENSITY_EDGES = [0.1, 0.25, 0.5, 0.75]
+
+REPORTED_QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Summary:
+    """Count, sum, min and max.
+
+    The sum is kept as non-overlapping float partials (Shewchuk), so it is
+    exact and independent of the order values and shards are combined in.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.min: float | None = None
+        self.max: float | None = None
+        self._partials: list[float] = []
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        if self.min is None or x < self.min:
+            self.min = x
+        if self.max is None or x > self.max:
+            self.max = x
+        self._add_partial(x)
+
+    def _add_partial(self, x: float) -> None:
+        partials = self._partials
+        i = 0
+        for y in partials:
+            if abs(x) < abs(y):
+                x, y = y, x
+            hi = x + y
+            lo = y - (hi - x)
+            if lo:
+                partials[i] = lo
+                i += 1
+            x = hi
+        partials[i:] = [x]
+
+    def merge(self, other: "Summary") -> None:
+        if not other.count:
+            return
+        self.count += other.count
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        for partial in other._partials:
+            self._add_partial(partial)
+
+    @property
+    def total(self) -> float:
+        return math.fsum(self._partials)
+
+    def mean(self) -> float:
+        return self.total / max(self.count, 1)
+
+
+class ValueHistogram:
+    """Exact distribution of discrete values, e.g. turns per sample."""
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+        self.count = 0
+
+    def add(self, value) -> None:
+        self.counts[value] += 1
+        self.count += 1
+
+    def merge(self, other: "ValueHistogram") -> None:
+        self.counts.update(other.counts)
+        self.count += other.count
+
+    def quantile(self, q: float):
+        """Value at rank int(q * count) of the sorted values (q=0.5: upper median)."""
+        if not self.count:
+            return 0
+        rank = min(int(q * self.count), self.count - 1)
+        seen = 0
+        for value in sorted(self.counts):
+            seen += self.counts[value]
+            if seen > rank:
+                return value
+        return value
+
+
+class QuantileSketch:
+    """DDSketch for non-negative values: quantiles within relative_accuracy.
+
+    Values in (gamma^(k-1), gamma^k] share bucket k; zeros are counted
+    apart. Bucket counts add on merge, so merged sketches equal the
+    sketch of the concatenated stream.
+    """
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Counter = Counter()
+        self.zeros = 0
+        self.summary = Summary()
+
+    @property
+    def count(self) -> int:
+        return self.summary.count
+
+    def add(self, x: float) -> None:
+        self.summary.add(x)
+        if x <= 0:
+            self.zeros += 1
+        else:
+            self.buckets[math.ceil(math.log(x) / self._log_gamma)] += 1
+
+    def merge(self, other: "QuantileSketch") -> None:
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        self.buckets.update(other.buckets)
+        self.zeros += other.zeros
+        self.summary.merge(other.summary)
+
+    def quantile(self, q: float) -> float:
+        """Approximate value at rank int(q * count), clamped to the exact min/max."""
+        if not self.count:
+            return 0.0
+        rank = min(int(q * self.count), self.count - 1)
+        if rank < self.zeros:
+            return 0.0
+        seen = self.zeros
+        for k in sorted(self.buckets):
+            seen += self.buckets[k]
+            if seen > rank:
+                estimate = 2 * self.gamma ** k / (self.gamma + 1)
+                return min(max(estimate, self.summary.min), self.summary.max)
+        return self.summary.max
+
+
+class BucketHistogram:
+    """Counts over fixed edges: [<e0], [e0, e1), ..., [>=en]."""
+
+    def __init__(self, edges: list[float]):
+        self.edges = list(edges)
+        self.counts = [0] * (len(self.edges) + 1)
+
+    def bucket(self, x: float) -> int:
+        return bisect.bisect_right(self.edges, x)
+
+    def label(self, i: int) -> str:
+        if i == 0:
+            return f"<{self.edges[0]}"
+        if i == len(self.edges):
+            return f">={self.edges[-1]}"
+        return f"{self.edges[i - 1]}-{self.edges[i]}"
+
+    def add(self, x: float) -> None:
+        self.counts[self.bucket(x)] += 1
+
+    def merge(self, other: "BucketHistogram") -> None:
+        if other.edges != self.edges:
+            raise ValueError("Cannot merge histograms with different edges")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+
+    def as_dict(self) -> dict[str, int]:
+        return {self.label(i): count for i, count in enumerate(self.counts)}
+
+
+class DatasetProfile:
+    """Per-role token lengths, role × quality × length counts, tool-call density."""
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.tokens_by_role: dict[str, QuantileSketch] = {}
+        self._quality = BucketHistogram(QUALITY_EDGES)
+        self._length = BucketHistogram(TOKEN_LENGTH_EDGES)
+        self.joint: Counter = Counter()
+        self.tool_density = BucketHistogram(TOOL_DENSITY_EDGES)
+        self.turns = 0
+        self.tool_call_turns = 0
+
+    def add(self, role: str, tokens: int, quality: float | None, turns: int, tool_calls: int) -> None:
+        sketch = self.tokens_by_role.get(role)
+        if sketch is None:
+            sketch = self.tokens_by_role[role] = QuantileSketch(self.relative_accuracy)
+        sketch.add(tokens)
+
+        quality_bucket = self._quality.bucket(quality) if quality is not None else None
+        self.joint[(role, quality_bucket, self._length.bucket(tokens))] += 1
+
+        self.turns += turns
+        self.tool_call_turns += tool_calls
+        self.tool_density.add(tool_calls / turns if turns else 0.0)
+
+    def merge(self, other: "DatasetProfile") -> None:
+        for role, sketch in other.tokens_by_role.items():
+            if role in self.tokens_by_role:
+                self.tokens_by_role[role].merge(sketch)
+            else:
+                mine = self.tokens_by_role[role] = QuantileSketch(self.relative_accuracy)
+                mine.merge(sketch)
+        self.joint.update(other.joint)
+        self.tool_density.merge(other.tool_density)
+        self.turns += other.turns
+        self.tool_call_turns += other.tool_call_turns
+
+    def token_quantiles(self) -> dict[str, dict[str, int]]:
+        return {
+            role: {
+                **{f"p{round(q * 100)}": round(sketch.quantile(q)) for q in REPORTED_QUANTILES},
+                "max": round(sketch.summary.max),
+                "samples": sketch.count,
+            }
+            for role, sketch in sorted(self.tokens_by_role.items())
+        }
+
+    def joint_distribution(self) -> dict[str, dict[str, dict[str, int]]]:
+        """role → quality bucket → token-length bucket → samples."""
+        out: dict[str, dict[str, dict[str, int]]] = {}
+        for (role, quality_bucket, length_bucket), count in sorted(
+            self.joint.items(), key=lambda item: (item[0][0], -1 if item[0][1] is None else item[0][1], item[0][2]),
+        ):
+            quality_label = "unscored" if quality_bucket is None else self._quality.label(quality_bucket)
+            by_length = out.setdefault(role, {}).setdefault(quality_label, {})
+            by_length[self._length.label(length_bucket)] = count
+        return out
+
+    def tool_call_density(self) -> dict:
+        return {
+            "tool_call_turns_per_turn": round(self.tool_call_turns / max(self.turns, 1), 3),
+            "per_sample": self.tool_density.as_dict(),
+        }
@@ -0,0 +1,91 @@
+"""Unit tests for cli_validator.py: the linear command engine against the original regexes."""
+
+import random
+import re
+
+from data.validate.cli_validator import (
+    detect_anti_patterns,
+    detect_workflows,
+    extract_commands,
+    validate_sample,
+)
+
+# The backtracking regexes the command engine replaced.
+REFERENCE_WORKFLOWS = {
+    "polecat_startup": r"gt\s+(prime|hook).*bd\s+mol\s+current",
+    "polecat_completion": r"git\s+(status|add|commit|push).*gt\s+done",
+    "mail_workflow": r"gt\s+mail\s+(inbox|read|send)",
+    "bead_lifecycle": r"bd\s+(show|update|close)",
+    "git_commit_cycle": r"git\s+status.*git\s+add.*git\s+commit.*git\s+push",
+    "escalation": r"gt\s+(escalate|mail\s+send.*(?:witness|mayor))",
+    "molecule_workflow": r"bd\s+mol\s+current.*bd\s+close",
+}
+REFERENCE_ANTI_PATTERNS = {
+    "wrong_git_workflow": r"git\s+push\s+origin\s+main",
+    "bd_close_root": r"bd\s+close.*root",
+    "waiting_for_approval": r"(wait.*approval|waiting.*human|ask.*confirmation)",
+    "wrong_done_command": r"gt\s+(unsling|exit|quit)",
+}
+
+
+def reference_detect(patterns, text):
+    return [name for name, pattern in patterns.items() if re.search(pattern, text, re.IGNORECASE | re.DOTALL)]
+
+
+def reference_extract(text):
+    found = []
+    for match in re.finditer(r"gt\s+\w+(?:\s+\w+)*", text):
+        cmd = match.group(0).strip()
+        if any(cmd.startswith(base) for base in ["gt mail", "gt mol", "gt handoff"]):
+            found.append(cmd)
+        else:
+            parts = cmd.split()
+            found.append(f"{parts[0]} {parts[1]}")
+    for tool, pattern in (("bd", r"bd\s+\w+(?:\s+\w+)*"), ("git", r"git\s+\w+(?:\s+[\w\-]+)*")):
+        for match in re.finditer(pattern, text):
+            parts = match.group(0).split()
+            found.append(f"{parts[0]} {parts[1]}")
+    return found
+
+
+WORDS = [
+    "gt", "bd", "git", "Gt", "GIT", "gtx", "legit", "bdd", "mail", "send", "inbox", "read", "mol",
+    "current", "prime", "hook", "handoff", "status", "add", "commit", "push", "origin", "main",
+    "close", "show", "update", "root", "escalate", "done", "unsling", "witness", "mayor",
+    "wait", "waiting", "approval", "human", "ask", "confirmation", "-f", "--amend", "x1", "",
+]
+PHRASES = [
+    "gt prime", "gt hook", "bd mol current", "git status", "git add .", "git commit -m x", "git push",
+    "gt done", "gt mail send", "gt mail inbox", "bd close gt-4tp", "git push origin main", "gt escalate",
+]
+SEPARATORS = [" ", " ", " ", "\n", "  ", "\t", ".", "/", "-", ": "]
+
+
+def _fuzz_texts(n, seed=0):
+    rng = random.Random(seed)
+    for _ in range(n):
+        yield "".join(rng.choice(PHRASES if rng.random() < 0.3 else WORDS) + rng.choice(SEPARATORS)
+                      for _ in range(rng.randint(1, 40)))
+
+
+def test_matches_reference_regexes_on_fuzzed_text():
+    for text in _fuzz_texts(3000):
+        assert extract_commands(text) == reference_extract(text), text
+        assert detect_workflows(text) == reference_detect(REFERENCE_WORKFLOWS, text), text
+        assert detect_anti_patterns(text) == reference_detect(REFERENCE_ANTI_PATTERNS, text), text
+
+
+def test_overlapping_tool_runs():
+    assert extract_commands("gt show bd ready and git status -s") == ["gt show", "bd ready", "git status"]
+    assert extract_commands("gt mail send mayor gt done") == ["gt mail send mayor gt done"]
+
+
+def test_validate_sample_flags_anti_pattern():
+    sample = {
+        "conversations": [{"from": "human", "value": "ship it"}, {"from": "gpt", "value": "git push origin main"}],
+        "metadata": {"role": "polecat"},
+    }
+    result = validate_sample(sample, 1)
+    assert not result.is_valid
+    assert "Anti-pattern detected: wrong_git_workflow" in result.errors
+    assert result.commands_found == ["git push"]
@@ -0,0 +1,86 @@
+"""Unit tests for diff.py covering the merge-join and spilled sorted runs."""
+
+import json
+
+from data.validate.diff import IndexEntry, diff_datasets, join
+
+
+def _entry(key, digest, sid=None):
+    return IndexEntry(key, digest, "witness", None, 10, sid or f"{key}-{digest}")
+
+
+def _statuses(old, new):
+    return [(status, o and o.digest, n and n.digest) for status, o, n in join(iter(old), iter(new))]
+
+
+class TestJoin:
+    def test_disjoint_and_shared_keys(self):
+        old = [_entry("a", "1"), _entry("b", "2"), _entry("d", "4")]
+        new = [_entry("b", "2"), _entry("c", "3"), _entry("d", "5")]
+        assert _statuses(old, new) == [
+            ("removed", "1", None),
+            ("unchanged", "2", "2"),
+            ("added", None, "3"),
+            ("changed", "4", "5"),
+        ]
+
+    def test_duplicate_keys_pair_identical_digests_first(self):
+        old = [_entry("k", "x"), _entry("k", "y"), _entry("k", "z")]
+        new = [_entry("k", "z"), _entry("k", "w"), _entry("k", "x")]
+        assert _statuses(old, new) == [
+            ("unchanged", "z", "z"),
+            ("unchanged", "x", "x"),
+            ("changed", "y", "w"),
+        ]
+
+    def test_duplicate_key_leftovers(self):
+        assert _statuses([_entry("k", "x")], [_entry("k", "y"), _entry("k", "x"), _entry("k", "v")]) == [
+            ("unchanged", "x", "x"),
+            ("added", None, "y"),
+            ("added", None, "v"),
+        ]
+        assert _statuses([_entry("k", "x"), _entry("k", "x")], [_entry("k", "x")]) == [
+            ("unchanged", "x", "x"),
+            ("removed", "x", None),
+        ]
+
+    def test_empty_sides(self):
+        assert _statuses([], [_entry("a", "1")]) == [("added", None, "1")]
+        assert _statuses([_entry("a", "1")], []) == [("removed", "1", None)]
+        assert _statuses([], []) == []
+
+
+def _sample(session, chunk, text, quality=0.5, role="witness"):
+    return {
+        "conversations": [{"from": "human", "value": "go"}, {"from": "gpt", "value": text}],
+        "metadata": {"role": role, "session_id": session, "chunk_index": chunk, "quality_score": quality},
+    }
+
+
+def _write(path, samples):
+    path.write_text("".join(json.dumps(s) + "\n" for s in samples))
+    return path
+
+
+class TestDiffDatasets:
+    def test_counts_with_spilled_runs(self, tmp_path):
+        old = [_sample(f"s{i}", 0, f"reply {i}") for i in range(40)]
+        new = [_sample(f"s{i}", 0, f"reply {i}" + (" edited" if i % 5 == 0 else "")) for i in range(10, 50)]
+        old_path = _write(tmp_path / "old.jsonl", old)
+        new_path = _write(tmp_path / "new.jsonl", new)
+
+        expected = {"added": 10, "removed": 10, "changed": 6, "unchanged": 24}
+        for run_size in (3, 1000):
+            diff = diff_datasets(old_path, new_path, run_size=run_size, tmp_dir=tmp_path)
+            assert diff["totals"] == expected
+            assert diff["by_role"]["witness"]["changed_chars_delta_mean"] == 7
+
+    def test_ids_file(self, tmp_path):
+        old_path = _write(tmp_path / "old.jsonl", [_sample("s1", 0, "a"), _sample("s2", 0, "b")])
+        new_path = _write(tmp_path / "new.jsonl", [_sample("s2", 0, "b", role="deacon"), _sample("s3", 0, "c")])
+        ids = tmp_path / "ids.jsonl"
+        with open(ids, "w") as f:
+            diff = diff_datasets(old_path, new_path, ids_file=f, tmp_dir=tmp_path)
+        records = sorted((r["status"], r["id"], r["role"]) for r in map(json.loads, ids.read_text().splitlines()))
+        assert records == [("added", "s3#0", "witness"), ("changed", "s2#0", "deacon"), ("removed", "s1#0", "witness")]
+        assert diff["example_ids"]["changed"] == ["s2#0"]
@@ -0,0 +1,139 @@
+"""Unit tests for engine.py covering SampleView, dispatch and sharded runs."""
+
+import json
+from functools import partial
+
+import pytest
+
+from data.validate import cli_validator, reporter, schema, stats
+from data.validate.engine import (
+    SampleView,
+    Visitor,
+    analyze_file,
+    run_visitors,
+    run_visitors_parallel,
+    shard_ranges,
+)
+
+
+def _sample(i, role="witness"):
+    gpt = f'<tool_call>{{"name": "bash", "arguments": {{"command": "gt peek {i}"}}}}</tool_call>' if i % 3 else f"done {i}"
+    return {
+        "conversations": [
+            {"from": "system", "value": f"[GAS TOWN ROLE: {role}]"},
+            {"from": "human", "value": f"patrol {i}"},
+            {"from": "gpt", "value": gpt},
+        ],
+        "metadata": {"role": role, "quality_score": (i % 10) / 10},
+    }
+
+
+def _write(path, lines):
+    path.write_text("".join(line + "\n" for line in lines))
+    return path
+
+
+class RecordingVisitor(Visitor):
+    def __init__(self):
+        self.seen = []
+
+    def visit(self, view):
+        self.seen.append((view.line_num, view.turn_stats["turns"]))
+
+    def visit_invalid(self, line_num, error):
+        self.seen.append((line_num, "invalid"))
+
+    def merge(self, other):
+        self.seen.extend(other.seen)
+
+    def finish(self):
+        return self.seen
+
+
+class TestSampleView:
+    def test_turn_stats(self):
+        view = SampleView(1, _sample(1))
+        assert view.turn_stats == {"turns": 2, "chars": sum(len(m["value"]) for m in _sample(1)["conversations"]),
+                                   "tool_calls": 1}
+
+    def test_non_string_values_skipped(self):
+        sample = {"conversations": [{"from": "system", "value": None},
+                                    {"from": "human", "value": ["not", "text"]},
+                                    {"from": "gpt", "value": "ok"}]}
+        view = SampleView(1, sample)
+        assert view.turn_stats == {"turns": 2, "chars": 2, "tool_calls": 0}
+        assert view.full_text == "ok"
+
+    def test_digest_uses_raw_line(self):
+        raw = json.dumps(_sample(1))
+        assert SampleView(1, _sample(1), raw).digest == SampleView(2, json.loads(raw), raw).digest
+        assert SampleView(1, _sample(1), raw).digest != SampleView(1, _sample(2), json.dumps(_sample(2))).digest
+
+
+class TestRunVisitors:
+    def test_visitor_is_abstract(self):
+        class Incomplete(Visitor):
+            def visit(self, view):
+                pass
+
+        with pytest.raises(TypeError):
+            Incomplete()
+
+    def test_dispatch_in_file_order(self, tmp_path):
+        path = _write(tmp_path / "d.jsonl", [json.dumps(_sample(0)), "", "{broken", json.dumps(_sample(1))])
+        first, second = run_visitors(path, [RecordingVisitor(), RecordingVisitor()])
+        assert first == second == [(1, 2), (3, "invalid"), (4, 2)]
+
+
+def _dataset(path):
+    lines = []
+    for i in range(60):
+        role = ("witness", "deacon", "refinery")[i % 3]
+        lines.append(json.dumps(_sample(i, role)))
+        if i % 17 == 5:
+            lines.append("{not json")
+        if i % 23 == 7:
+            lines.append("")
+    return _write(path, lines)
+
+
+class TestParallel:
+    def test_shard_ranges_cover_file_on_line_boundaries(self, tmp_path):
+        path = _dataset(tmp_path / "d.jsonl")
+        data = path.read_bytes()
+        for shards in (1, 2, 7, 64, 1000):
+            ranges = shard_ranges(path, shards)
+            assert len(ranges) <= shards
+            assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+            for (_, end), (start, _) in zip(ranges, ranges[1:]):
+                assert end == start and data[end - 1:end] == b"\n"
+
+    def test_shard_ranges_small_files(self, tmp_path):
+        assert shard_ranges(_write(tmp_path / "empty.jsonl", []), 4) == []
+        one = tmp_path / "one.jsonl"
+        one.write_text("{}")
+        assert shard_ranges(one, 4) == [(0, 2)]
+
+    def test_line_numbers_are_global(self, tmp_path):
+        path = _dataset(tmp_path / "d.jsonl")
+        serial = run_visitors(path, [RecordingVisitor()])[0]
+        parallel = run_visitors_parallel(path, [RecordingVisitor], workers=2, shards=9)[0]
+        assert parallel == serial
+        assert (7, "invalid") in serial
+
+    def test_parallel_matches_serial(self, tmp_path):
+        path = _dataset(tmp_path / "d.jsonl")
+        factories = [
+            schema.SchemaVisitor,
+            cli_validator.CliVisitor,
+            partial(reporter.ReportVisitor, path, None),
+            stats.StatsVisitor,
+        ]
+        serial = analyze_file(path, factories)
+        parallel = run_visitors_parallel(path, factories, workers=3, shards=11)
+        assert parallel[0] == serial[0]
+        assert parallel[1] == serial[1]
+        report, serial_report = ({k: v for k, v in r.__dict__.items() if k != "generated_at"}
+                                 for r in (parallel[2], serial[2]))
+        assert report == serial_report
+        assert parallel[3] == serial[3]
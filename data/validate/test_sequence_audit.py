@@ -0,0 +1,102 @@
+"""Unit tests for sequence_audit.py covering truncation arithmetic and config loading."""
+
+import json
+
+from data.transform.chatml import chatml_segments
+from data.transform.token_counter import approx_tokens, make_counter
+from data.validate.sequence_audit import (
+    audit_dataset,
+    audit_lengths,
+    iter_sample_lengths,
+    load_config,
+    sample_lengths,
+)
+
+CONVERSATION = [
+    {"from": "system", "value": "S"},
+    {"from": "human", "value": "H"},
+    {"from": "gpt", "value": "G"},
+    {"from": "human", "value": "H2"},
+    {"from": "gpt", "value": "G2"},
+]
+# Per chatml segment: system, user, assistant header, G (trainable), newline,
+# user, assistant header, G2 (trainable), newline.
+COUNTS = [10, 5, 3, 20, 1, 5, 3, 30, 1]
+
+
+def test_segments_layout():
+    assert [trainable for _, trainable in chatml_segments(CONVERSATION)] == [
+        False, False, False, True, False, False, False, True, False,
+    ]
+
+
+def test_sample_lengths_truncation():
+    # G covers tokens 18-38 and G2 47-77.
+    assert sample_lengths(CONVERSATION, iter(COUNTS), 100) == (78, 50, 0)
+    assert sample_lengths(CONVERSATION, iter(COUNTS), 78) == (78, 50, 0)
+    assert sample_lengths(CONVERSATION, iter(COUNTS), 30) == (78, 50, 8 + 30)
+    assert sample_lengths(CONVERSATION, iter(COUNTS), 10) == (78, 50, 50)
+    assert sample_lengths(CONVERSATION, iter(COUNTS), 60) == (78, 50, 17)
+
+
+def test_audit_lengths():
+    result = audit_lengths([100, 300, 500], trainable=600, lost_trainable=250, sequence_len=256, sample_packing=True)
+    assert result["over_sequence_len"] == 2
+    assert result["truncated_tokens"] == 44 + 244
+    assert result["truncated_trainable_tokens"] == 250
+    assert result["max_tokens"] == 500
+    assert "packing" in result
+    assert "packing" not in audit_lengths([100], 0, 0, 256, sample_packing=False)
+
+
+def _sample(i, role):
+    conversations = [
+        {"from": "system", "value": "[GAS TOWN ROLE] " * 4},
+        {"from": "human", "value": "check " * (i * 10)},
+        {"from": "gpt", "value": "reply " * (i * 30)},
+    ]
+    return {"conversations": conversations, "metadata": {"role": role}}
+
+
+def test_batched_counts_match_per_sample(tmp_path):
+    samples = [_sample(i, ("witness", "deacon")[i % 2]) for i in range(7)]
+    counter = make_counter(None, cache_path=tmp_path / "counts.jsonl")
+    batched = list(iter_sample_lengths(samples, counter, sequence_len=64, batch_size=3))
+    expected = [
+        (s["metadata"]["role"], *sample_lengths(
+            s["conversations"],
+            iter(approx_tokens(text) for text, _ in chatml_segments(s["conversations"])),
+            64,
+        ))
+        for s in samples
+    ]
+    assert batched == expected
+
+
+def test_audit_dataset_by_role(tmp_path):
+    path = tmp_path / "d.jsonl"
+    path.write_text("".join(json.dumps(_sample(i, ("witness", "deacon")[i % 2])) + "\n" for i in range(7)))
+    audit = audit_dataset(path, make_counter(None, cache_path=tmp_path / "counts.jsonl"), sequence_len=64)
+    assert set(audit["by_role"]) == {"witness", "deacon"}
+    assert audit["all"]["samples"] == 7
+    assert audit["all"]["over_sequence_len"] == sum(r["over_sequence_len"] for r in audit["by_role"].values())
+    assert audit["all"]["truncated_trainable_tokens"] == sum(
+        r["truncated_trainable_tokens"] for r in audit["by_role"].values())
+
+
+def test_load_config(tmp_path):
+    path = tmp_path / "config.yml"
+    path.write_text(
+        "base_model: Qwen/Qwen2.5-7B-Instruct\n"
+        "sequence_len: 4096\n"
+        "sample_packing: true\n"
+        "datasets:\n"
+        "  - path: output/datasets/witness_train.jsonl\n"
+        "    type: chat_template\n"
+        "    chat_template: chatml\n"
+    )
+    config = load_config(path)
+    assert config["sequence_len"] == 4096
+    assert config["sample_packing"] is True
+    assert [str(p) for p in config["datasets"]] == ["output/datasets/witness_train.jsonl"]
+    assert config["chat_template"] == "chatml"
@@ -0,0 +1,103 @@
+"""Unit tests for streaming.py: merged accumulators equal serial accumulation."""
+
+import random
+
+import pytest
+
+from data.validate.streaming import (
+    BucketHistogram,
+    DatasetProfile,
+    QuantileSketch,
+    Summary,
+    ValueHistogram,
+)
+
+
+def _values(n=5000, seed=0):
+    rng = random.Random(seed)
+    return [rng.choice([0, 0.1, 1e-3, 1e12]) if i % 97 == 0 else rng.lognormvariate(6, 1.5) for i in range(n)]
+
+
+def _split(values, parts, seed=1):
+    rng = random.Random(seed)
+    cuts = sorted(rng.sample(range(1, len(values)), parts - 1))
+    return [values[a:b] for a, b in zip([0] + cuts, cuts + [len(values)])]
+
+
+def _serial_and_merged(make, values, parts=7):
+    serial = make()
+    for x in values:
+        serial.add(x)
+    merged = make()
+    for chunk in _split(values, parts):
+        shard = make()
+        for x in chunk:
+            shard.add(x)
+        merged.merge(shard)
+    return serial, merged
+
+
+def test_summary_merge_is_exact():
+    values = _values()
+    serial, merged = _serial_and_merged(Summary, values)
+    assert (merged.count, merged.min, merged.max) == (serial.count, serial.min, serial.max)
+    assert merged.total == serial.total == pytest.approx(sum(values))
+    assert Summary().mean() == 0
+
+
+def test_value_histogram_merge():
+    values = [round(x) % 13 for x in _values()]
+    serial, merged = _serial_and_merged(ValueHistogram, values)
+    assert merged.counts == serial.counts
+    ordered = sorted(values)
+    for q in (0, 0.5, 0.9, 0.99, 1):
+        assert merged.quantile(q) == serial.quantile(q) == ordered[min(int(q * len(values)), len(values) - 1)]
+
+
+def test_quantile_sketch_merge_and_accuracy():
+    values = _values()
+    serial, merged = _serial_and_merged(QuantileSketch, values)
+    assert merged.buckets == serial.buckets and merged.zeros == serial.zeros
+    ordered = sorted(values)
+    for q in (0.01, 0.5, 0.9, 0.99):
+        exact = ordered[int(q * len(values))]
+        assert merged.quantile(q) == serial.quantile(q)
+        assert merged.quantile(q) == pytest.approx(exact, rel=0.01)
+    assert merged.quantile(1) == pytest.approx(max(values), rel=0.01)
+    assert merged.quantile(1) <= max(values)
+
+
+def test_quantile_sketch_rejects_other_accuracy():
+    with pytest.raises(ValueError):
+        QuantileSketch(0.01).merge(QuantileSketch(0.02))
+
+
+def test_bucket_histogram_merge():
+    edges = [10, 100, 1000]
+    serial, merged = _serial_and_merged(lambda: BucketHistogram(edges), _values())
+    assert merged.counts == serial.counts
+    assert list(merged.as_dict()) == ["<10", "10-100", "100-1000", ">=1000"]
+    with pytest.raises(ValueError):
+        merged.merge(BucketHistogram([1, 2]))
+
+
+def test_dataset_profile_merge():
+    rng = random.Random(2)
+    rows = [
+        (rng.choice(["witness", "deacon", "mayor"]), rng.randint(0, 9000),
+         rng.choice([None, rng.random()]), rng.randint(0, 12), rng.randint(0, 4))
+        for _ in range(2000)
+    ]
+    rows = [(role, tokens, quality, turns, min(calls, turns)) for role, tokens, quality, turns, calls in rows]
+    serial = DatasetProfile()
+    for row in rows:
+        serial.add(*row)
+    merged = DatasetProfile()
+    for chunk in _split(rows, 5):
+        shard = DatasetProfile()
+        for row in chunk:
+            shard.add(*row)
+        merged.merge(shard)
+    assert merged.token_quantiles() == serial.token_quantiles()
+    assert merged.joint_distribution() == serial.joint_distribution()
+    assert merged.tool_call_density() == serial.tool_call_density()
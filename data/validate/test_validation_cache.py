@@ -0,0 +1,96 @@
+"""Unit tests for validation_cache.py and its use by the schema and CLI validators."""
+
+import json
+import pickle
+
+from data.validate import cli_validator, schema
+from data.validate.validation_cache import ValidationCache
+
+
+def _sample(text, role="witness"):
+    return {
+        "conversations": [{"from": "human", "value": "go"}, {"from": "gpt", "value": text}],
+        "metadata": {"role": role},
+    }
+
+
+def _dataset(path):
+    lines = [json.dumps(_sample(f"gt hook then bd ready {i}")) for i in range(8)]
+    lines.append(json.dumps({"conversations": [{"from": "gpt", "value": "no human"}]}))
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+class TestValidationCache:
+    def test_hits_after_save(self, tmp_path):
+        path = tmp_path / "validation-x.jsonl"
+        cache = ValidationCache("x", "1", path)
+        assert cache.get("aa") is None
+        cache.put("aa", [])
+        cache.put("bb", ["error"])
+        assert cache.save() == 2
+
+        reloaded = ValidationCache("x", "1", path)
+        assert reloaded.get("aa") == []
+        assert reloaded.get("bb") == ["error"]
+        assert reloaded.get("cc") is None
+        assert (reloaded.hits, reloaded.misses) == (2, 1)
+
+    def test_version_bump_hides_old_entries(self, tmp_path):
+        path = tmp_path / "validation-x.jsonl"
+        old = ValidationCache("x", "1", path)
+        old.put("aa", ["old error"])
+        old.save()
+
+        bumped = ValidationCache("x", "2", path)
+        assert bumped.get("aa") is None
+        bumped.put("aa", [])
+        bumped.save()
+        assert ValidationCache("x", "2", path).get("aa") == []
+        assert ValidationCache("x", "1", path).get("aa") == ["old error"]
+
+    def test_pickle_carries_only_new_results(self, tmp_path):
+        path = tmp_path / "validation-x.jsonl"
+        seed = ValidationCache("x", "1", path)
+        seed.put("aa", [])
+        seed.save()
+
+        parent = ValidationCache("x", "1", path)
+        parent.get("aa")
+        worker = pickle.loads(pickle.dumps(parent))
+        assert worker._results == {}
+        worker.put("bb", ["error"])
+        parent.merge(worker)
+        assert parent.save() == 1
+        assert ValidationCache("x", "1", path).get("bb") == ["error"]
+
+    def test_take_new_hands_off_shard_results(self, tmp_path):
+        shared = ValidationCache("x", "1", tmp_path / "validation-x.jsonl")
+        shared.get("aa")
+        shared.put("aa", [])
+        shard = shared.take_new()
+        assert shard._pending == {"aa": []} and shard.misses == 1
+        assert shared._pending == {} and shared.misses == 0
+        assert shared.get("aa") == []  # still cached for later shards of the worker
+
+
+class TestValidatorsWithCache:
+    def test_schema_results_reused(self, tmp_path):
+        path = _dataset(tmp_path / "d.jsonl")
+        expected = schema.validate_file(path)
+        cache_path = tmp_path / "validation-schema.jsonl"
+        assert schema.validate_file(path, cache=schema.make_cache(cache_path)) == expected
+
+        cache = schema.make_cache(cache_path)
+        assert schema.validate_file(path, workers=2, cache=cache) == expected
+        assert (cache.hits, cache.misses) == (9, 0)
+
+    def test_cli_results_reused(self, tmp_path):
+        path = _dataset(tmp_path / "d.jsonl")
+        expected = cli_validator.validate_file(path)
+        cache_path = tmp_path / "validation-cli.jsonl"
+        cli_validator.validate_file(path, cache=cli_validator.make_cache(cache_path))
+
+        cache = cli_validator.make_cache(cache_path)
+        assert cli_validator.validate_file(path, cache=cache) == expected
+        assert cache.hits == 9 and cache.misses == 0
@@ -0,0 +1,120 @@
+"""Persistent per-sample validation results, keyed by sample content hash.
+
+Rebuilt datasets are mostly identical to the previous build, so schema and
+cli_validator look up each sample's result by the hash of its JSONL line
+and only validate samples they have not seen. Results are stored without
+line numbers (those are re-applied per run), together with the validator
+version that produced them; bumping a validator's VALIDATOR_VERSION makes
+its old entries invisible.
+
+On disk each validator has an append-only JSONL file, like the token-count
+cache:
+
+    output/cache/validation-schema.jsonl   {"h": "<16-hex sha256>", "v": "1", "r": [...]}
+    output/cache/validation-cli.jsonl      {"h": ..., "v": ..., "r": {...}}
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from pathlib import Path
+from typing import Any
+
+from data.transform.token_counter import DEFAULT_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+
+def default_cache_path(name: str, cache_dir: Path = DEFAULT_CACHE_DIR) -> Path:
+    """Cache file for a validator, e.g. output/cache/validation-cli.jsonl."""
+    return cache_dir / f"validation-{name}.jsonl"
+
+
+class ValidationCache:
+    """Content-hash → validation result map for one validator version.
+
+    The file is read on first lookup. In parallel validation each worker
+    process gets one copy (without the parent's results; it reads the file
+    itself) shared by its shards; take_new() hands a shard's new results
+    and hit counts back, and merge() folds them into the parent.
+    """
+
+    def __init__(self, name: str, version: str, path: Path | None = None):
+        self.name = name
+        self.version = str(version)
+        self.path = Path(path) if path else default_cache_path(name)
+        self._results: dict[str, Any] = {}
+        self._pending: dict[str, Any] = {}
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest: str) -> Any | None:
+        if not self._loaded:
+            self._load()
+        result = self._results.get(digest)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def put(self, digest: str, result: Any) -> None:
+        self._results[digest] = result
+        self._pending[digest] = result
+
+    def merge(self, other: "ValidationCache") -> None:
+        """Take over results computed by another copy of this cache."""
+        for digest, result in other._pending.items():
+            if digest not in self._pending:
+                self.put(digest, result)
+        self.hits += other.hits
+        self.misses += other.misses
+
+    def take_new(self) -> "ValidationCache":
+        """Move new results and hit counts into a copy and reset them here."""
+        shard = ValidationCache(self.name, self.version, self.path)
+        shard._pending, self._pending = self._pending, {}
+        shard.hits, shard.misses = self.hits, self.misses
+        self.hits = self.misses = 0
+        return shard
+
+    def save(self) -> int:
+        """Append new results to the cache file. Returns count written."""
+        if not self._pending:
+            return 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            for digest, result in self._pending.items():
+                f.write(json.dumps({"h": digest, "v": self.version, "r": result}) + "\n")
+        written = len(self._pending)
+        self._pending.clear()
+        logger.info("Saved %d %s validation results to %s", written, self.name, self.path)
+        return written
+
+    def stats(self) -> dict:
+        return {"path": str(self.path), "version": self.version, "hits": self.hits, "misses": self.misses}
+
+    def __getstate__(self) -> dict:
+        state = {**self.__dict__, "_results": {}, "_loaded": False}
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._results.update(self._pending)
+
+    def _load(self) -> None:
+        """Load results of the current version, skipping malformed lines."""
+        self._loaded = True
+        if not self.path.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    if record["v"] == self.version:
+                        self._results.setdefault(record["h"], record["r"])
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    continue
+        logger.debug("Loaded %d cached %s validation results from %s", len(self._results), self.name, self.path)
@@ -3,14 +3,18 @@ from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig
 from peft import PeftModel
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+from prefix_cache import PrefixCache
+
 ADAPTER = str(Path(__file__).parent.parent / "output/checkpoints/deacon-v3")
 PROMPTS = str(Path(__file__).parent.parent / "data/transform/gt_prime_prompts.json")
 
 _model = None
 _tok = None
+_prefix = None
 
 def load():
-    global _model, _tok
+    global _model, _tok, _prefix
     if _model is not None:
         return
     _tok = AutoTokenizer.from_pretrained("Qwen/Qwen3.5-2B")
@@ -18,15 +22,21 @@ def load():
     base = AutoModelForCausalLM.from_pretrained("Qwen/Qwen3.5-2B", quantization_config=bnb, device_map="auto")
     _model = PeftModel.from_pretrained(base, ADAPTER)
     _model.eval()
+    # The gt prime prompt is the same for every call: prefill it once.
+    system = json.loads(Path(PROMPTS).read_text())["deacon"]
+    _prefix = PrefixCache(_model, _tok, system)
 
 def call_api(prompt, options, context):
     load()
-    system = json.loads(Path(PROMPTS).read_text())["deacon"]
-    messages = [{"role": "system", "content": system}, {"role": "user", "content": prompt}]
-    text = _tok.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
-    inputs = _tok(text, return_tensors="pt").to(_model.device)
-    with torch.no_grad():
-        out = _model.generate(**inputs, max_new_tokens=300, do_sample=False, pad_token_id=_tok.eos_token_id)
+    messages = [{"role": "user", "content": prompt}]
+    gen = dict(max_new_tokens=300, do_sample=False, pad_token_id=_tok.eos_token_id)
+    # Opt-in via `config: {prefix_cache: true}` on the provider in promptfooconfig.yaml.
+    if options.get("config", {}).get("prefix_cache"):
+        inputs, out = _prefix.generate(messages, **gen)
+    else:
+        inputs = _prefix.encode(messages)
+        with torch.no_grad():
+            out = _model.generate(**inputs, **gen)
     new_tokens = out[0][inputs["input_ids"].shape[1]:]
     response = _tok.decode(new_tokens, skip_special_tokens=True).strip()
     return {"output": response}
@@ -12,6 +12,12 @@ Usage:
         --output-dir output/datasets/rejection_lora \\
         --role mayor
 
+    # Compact output (system prompts stored once, expand on the GPU box):
+    python -m mayor.rig.training.rejection_to_lora --compact
+
+    # Skip rejection samples already shipped (shared dedup index):
+    python -m mayor.rig.training.rejection_to_lora --dedup-index output/dedup_index.bin
+
     # All roles at once:
     python -m mayor.rig.training.rejection_to_lora \\
         --rejection-dir output/rejection_data \\
@@ -182,7 +188,8 @@ def compute_kl_divergence(
 def load_general_data(general_dir: Path, role: str) -> list[dict]:
     """Load general training data for a role.
 
-    Looks for {role}_train.jsonl or gastown_train.jsonl as fallback.
+    Looks for {role}_train.jsonl or gastown_train.jsonl as fallback, in
+    plain or compact (*.compact.jsonl) form.
 
     Args:
         general_dir: Directory containing general training JSONL.
@@ -191,23 +198,21 @@ def load_general_data(general_dir: Path, role: str) -> list[dict]:
     Returns:
         List of sharegpt-formatted dicts.
     """
+    from data.transform.prompt_table import compact_path_for, iter_expanded
+
     role_file = general_dir / f"{role}_train.jsonl"
     fallback_file = general_dir / "gastown_train.jsonl"
 
-    target_file = role_file if role_file.exists() else fallback_file
-    if not target_file.exists():
+    candidates = [role_file, compact_path_for(role_file), fallback_file, compact_path_for(fallback_file)]
+    target_file = next((p for p in candidates if p.exists()), None)
+    if target_file is None:
         logger.warning("No general data found for role=%s in %s", role, general_dir)
         return []
 
-    records = []
-    with open(target_file, "r") as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                records.append(json.loads(line))
+    records = list(iter_expanded(target_file))
 
     # Filter to matching role if using the combined file.
-    if target_file == fallback_file:
+    if target_file in (fallback_file, compact_path_for(fallback_file)):
         records = [
             r for r in records
             if r.get("metadata", {}).get("role") == role
@@ -277,8 +282,20 @@ def mix_datasets(
     return mixed
 
 
-def write_training_jsonl(samples: list[dict], output_path: Path) -> None:
-    """Write training samples to JSONL file."""
+def write_training_jsonl(samples: list[dict], output_path: Path, compact: bool = False) -> None:
+    """Write training samples to JSONL file.
+
+    With compact=True, writes <name>.compact.jsonl plus a sidecar prompt
+    table instead (expand with `python -m data.transform.prompt_table expand`).
+    """
+    if compact:
+        from data.transform.prompt_table import compact_path_for, write_compact_jsonl
+
+        compact_path = compact_path_for(output_path)
+        write_compact_jsonl(samples, compact_path)
+        logger.info("Wrote %d samples to %s (compact)", len(samples), compact_path)
+        return
+
     output_path.parent.mkdir(parents=True, exist_ok=True)
     with open(output_path, "w") as f:
         for sample in samples:
@@ -359,9 +376,19 @@ def process_role(
     general_dir: Path,
     output_dir: Path,
     seed: int = 42,
+    compact: bool = False,
+    dedup_index: Any = None,
+    dataset_version: str | None = None,
+    since_version: str | None = None,
 ) -> dict[str, Any] | None:
     """Process rejection data for a single role.
 
+    With compact=True the training JSONL is written in compact form; the
+    generated config still points at the expanded path. With a dedup_index
+    (data.transform.dedup_index.DedupIndex), rejection samples shipped in
+    an earlier version (or at/before since_version) are dropped before
+    mixing; general data is mixed in regardless.
+
     Returns:
         Summary dict with stats, or None if no data.
     """
@@ -383,6 +410,15 @@ def process_role(
             if sample["metadata"].get("has_soft_labels"):
                 has_soft_labels = True
 
+    if dedup_index is not None:
+        from data.transform.dedup_index import default_version
+
+        before = len(rejection_samples)
+        rejection_samples = dedup_index.filter_new(
+            rejection_samples, dataset_version or default_version("rejection_lora"), since=since_version,
+        )
+        logger.info("Dedup index kept %d/%d rejection samples for role=%s", len(rejection_samples), before, role)
+
     if not rejection_samples:
         logger.info("No valid samples for role=%s after conversion", role)
         return None
@@ -395,7 +431,7 @@ def process_role(
 
     # Write training data.
     train_path = output_dir / f"{role}_rejection_train.jsonl"
-    write_training_jsonl(mixed, train_path)
+    write_training_jsonl(mixed, train_path, compact=compact)
 
     # Generate training config.
     config = generate_training_config(
@@ -480,6 +516,27 @@ def main(argv: list[str] | None = None) -> None:
         default=42,
         help="Random seed for reproducible mixing",
     )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Write training data with system prompts in a sidecar prompt table",
+    )
+    parser.add_argument(
+        "--dedup-index",
+        type=Path,
+        default=None,
+        help="Persistent dedup index shared with the data pipeline (e.g. output/dedup_index.bin)",
+    )
+    parser.add_argument(
+        "--dataset-version",
+        default=None,
+        help="Version label recorded in the dedup index (default: run timestamp)",
+    )
+    parser.add_argument(
+        "--since",
+        default=None,
+        help="With --dedup-index, keep only rejection samples first shipped after this version",
+    )
     parser.add_argument(
         "-v", "--verbose",
         action="store_true",
@@ -495,6 +552,12 @@ def main(argv: list[str] | None = None) -> None:
     roles = [args.role] if args.role else list(ROLES)
     results = []
 
+    index = None
+    if args.dedup_index:
+        from data.transform.dedup_index import DedupIndex
+
+        index = DedupIndex(args.dedup_index)
+
     for role in roles:
         result = process_role(
             role=role,
@@ -502,10 +565,17 @@ def main(argv: list[str] | None = None) -> None:
             general_dir=args.general_dir,
             output_dir=args.output_dir,
             seed=args.seed,
+            compact=args.compact,
+            dedup_index=index,
+            dataset_version=args.dataset_version,
+            since_version=args.since,
         )
         if result:
             results.append(result)
 
+    if index is not None:
+        index.flush()
+
     if not results:
         logger.warning("No rejection data processed for any role")
         sys.exit(0)
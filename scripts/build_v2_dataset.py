@@ -22,7 +22,9 @@ import random
 import sys
 
 sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 from synthetic_scenarios import generate_examples
+from data.transform.dedup_index import DedupIndex, default_version
 
 DEACON_SYSTEM = """[GAS TOWN ROLE: deacon]
 You are the Deacon, an autonomous patrol and coordination agent. You monitor system health, manage patrol cycles, dispatch work to polecats, and maintain the beads database. You operate without human prompting.
@@ -83,6 +85,10 @@ def main():
     parser.add_argument("--output", type=str, required=True,
                         help="Output JSONL path")
     parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dedup-index", default=None,
+                        help="Persistent dedup index (e.g. output/dedup_index.bin); drops samples already shipped")
+    parser.add_argument("--dataset-version", default=None, help="Version label for the dedup index (default: run timestamp)")
+    parser.add_argument("--since", default=None, help="With --dedup-index, keep samples first shipped after this version")
     args = parser.parse_args()
 
     system_prompt = DEACON_SYSTEM if args.role == "deacon" else WITNESS_SYSTEM
@@ -133,6 +139,13 @@ def main():
     print(f"\n  Total combined: {len(combined)} examples")
     print(f"  Breakdown: {len(existing)} existing + {len(synthetic)} synthetic")
 
+    if args.dedup_index:
+        index = DedupIndex(args.dedup_index)
+        before = len(combined)
+        combined = index.filter_new(combined, args.dataset_version or default_version("build_v2"), since=args.since)
+        index.flush()
+        print(f"  Dedup index: kept {len(combined)}/{before} not shipped before")
+
     # Write output
     os.makedirs(os.path.dirname(args.output) if os.path.dirname(args.output) else ".", exist_ok=True)
     with open(args.output, "w") as f:
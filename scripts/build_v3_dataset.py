@@ -13,6 +13,7 @@ Usage:
     cd /home/ubuntu/gt/loraforge/mayor/rig
     python scripts/build_v3_dataset.py --role deacon --output output/datasets/deacon_v3.jsonl
     python scripts/build_v3_dataset.py --role witness --output output/datasets/witness_v3.jsonl
+    python scripts/build_v3_dataset.py --role witness --output output/datasets/witness_v3.jsonl --compact
 """
 
 import argparse
@@ -24,7 +25,10 @@ from pathlib import Path
 from collections import Counter
 
 sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 from synthetic_scenarios import generate_examples
+from data.transform.dedup_index import DedupIndex, default_version
+from data.transform.prompt_table import compact_path_for, write_compact_jsonl
 
 # Load real gt prime system prompts
 _PROMPTS_FILE = Path(__file__).parent.parent / "data/transform/gt_prime_prompts.json"
@@ -69,6 +73,12 @@ def main():
     parser.add_argument("--scenario-format", choices=["legacy", "rich", "both"], default="both")
     parser.add_argument("--output", type=str, required=True)
     parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dedup-index", default=None,
+                        help="Persistent dedup index (e.g. output/dedup_index.bin); drops samples already shipped")
+    parser.add_argument("--dataset-version", default=None, help="Version label for the dedup index (default: run timestamp)")
+    parser.add_argument("--since", default=None, help="With --dedup-index, keep samples first shipped after this version")
+    parser.add_argument("--compact", action="store_true",
+                        help="Write <output>.compact.jsonl with the system prompt stored once")
     args = parser.parse_args()
 
     system_prompt = _load_system_prompt(args.role)
@@ -99,14 +109,27 @@ def main():
     rng = random.Random(args.seed)
     rng.shuffle(examples)
 
+    if args.dedup_index:
+        index = DedupIndex(args.dedup_index)
+        before = len(examples)
+        examples = index.filter_new(examples, args.dataset_version or default_version("build_v3"), since=args.since)
+        index.flush()
+        print(f"Dedup index: kept {len(examples)}/{before} not shipped before")
+
     # Write output
     out_path = Path(args.output)
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(out_path, "w") as f:
-        for ex in examples:
-            f.write(json.dumps(ex) + "\n")
-
-    print(f"\nWritten {len(examples)} examples to {args.output}")
+    if args.compact:
+        out_path = compact_path_for(out_path)
+        write_compact_jsonl(examples, out_path)
+    else:
+        with open(out_path, "w") as f:
+            for ex in examples:
+                f.write(json.dumps(ex) + "\n")
+
+    print(f"\nWritten {len(examples)} examples to {out_path}")
+    if not examples:
+        return
 
     # Show sample
     sample = next(
@@ -32,6 +32,7 @@ from peft import PeftModel
 # Import scenarios and snapshot helpers from evaluate.py
 sys.path.insert(0, os.path.dirname(__file__))
 from evaluate import SCENARIOS_RICH, SCENARIOS_LEGACY, VALID_TOOLS
+from prefix_cache import PrefixCache
 
 BASE_MODEL = "Qwen/Qwen3.5-2B"
 
@@ -87,24 +88,30 @@ def load_model(adapter_path: str):
 
 
 def generate_response(model, tokenizer, messages: list, system_prompt: str,
-                      max_new_tokens: int = 200) -> tuple:
-    """Generate a response and return (text, latency_ms)."""
-    full_messages = [{"role": "system", "content": system_prompt}] + messages
-    prompt = tokenizer.apply_chat_template(
-        full_messages, tokenize=False, add_generation_prompt=True
-    )
-    inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+                      max_new_tokens: int = 200, prefix_cache: PrefixCache | None = None) -> tuple:
+    """Generate a response and return (text, latency_ms).
 
+    With a prefix_cache (built for system_prompt), only the tokens after
+    the system prompt are prefilled.
+    """
+    generate_kwargs = dict(
+        max_new_tokens=max_new_tokens,
+        do_sample=False,
+        temperature=None,
+        top_p=None,
+        pad_token_id=tokenizer.pad_token_id or tokenizer.eos_token_id,
+    )
     start = time.perf_counter()
-    with torch.no_grad():
-        out = model.generate(
-            **inputs,
-            max_new_tokens=max_new_tokens,
-            do_sample=False,
-            temperature=None,
-            top_p=None,
-            pad_token_id=tokenizer.pad_token_id or tokenizer.eos_token_id,
+    if prefix_cache is not None:
+        inputs, out = prefix_cache.generate(messages, **generate_kwargs)
+    else:
+        full_messages = [{"role": "system", "content": system_prompt}] + messages
+        prompt = tokenizer.apply_chat_template(
+            full_messages, tokenize=False, add_generation_prompt=True
         )
+        inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+        with torch.no_grad():
+            out = model.generate(**inputs, **generate_kwargs)
     latency = (time.perf_counter() - start) * 1000
 
     generated = tokenizer.decode(
@@ -200,7 +207,8 @@ def _map_tool_name(name: str, args: dict) -> str:
     return name.lower()
 
 
-def evaluate_scenarios(model, tokenizer, system_prompt: str, scenarios: list) -> list:
+def evaluate_scenarios(model, tokenizer, system_prompt: str, scenarios: list,
+                       prefix_cache: PrefixCache | None = None) -> list:
     """Run scenario-based evaluation."""
     results = []
     print(f"\n{'='*70}")
@@ -208,7 +216,8 @@ def evaluate_scenarios(model, tokenizer, system_prompt: str, scenarios: list) ->
     print(f"{'='*70}")
 
     for scenario in scenarios:
-        output, latency = generate_response(model, tokenizer, scenario["messages"], system_prompt)
+        output, latency = generate_response(model, tokenizer, scenario["messages"], system_prompt,
+                                            prefix_cache=prefix_cache)
         parsed = parse_output(output)
 
         is_valid = parsed is not None
@@ -249,6 +258,8 @@ def main():
     parser.add_argument("--scenarios", choices=["rich", "legacy"], default="rich")
     parser.add_argument("--max-tokens", type=int, default=200)
     parser.add_argument("--output", type=str, default=None)
+    parser.add_argument("--prefix-cache", action="store_true",
+                        help="Reuse the system prompt's KV cache across scenarios instead of prefilling the full prompt")
     args = parser.parse_args()
 
     system_prompt = SYSTEM_DEACON if args.role == "deacon" else SYSTEM_WITNESS
@@ -258,7 +269,8 @@ def main():
     print(f"Role: {args.role} | Scenarios: {args.scenarios} ({len(scenarios)} total)")
 
     model, tokenizer = load_model(args.adapter)
-    results = evaluate_scenarios(model, tokenizer, system_prompt, scenarios)
+    prefix_cache = PrefixCache(model, tokenizer, system_prompt) if args.prefix_cache else None
+    results = evaluate_scenarios(model, tokenizer, system_prompt, scenarios, prefix_cache)
 
     # Summary
     n = len(results)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Reuse the KV cache of a constant system prompt across generate() calls.
+
+Every patrol / eval inference renders the same system prompt before a
+varying user turn, and prefill over that prompt dominates latency on CPU
+(and for the multi-thousand-token gt prime prompts). PrefixCache runs the
+model over the chat-templated system prompt once per loaded model and
+hands a copy of its past_key_values to each generate() call, so only the
+tokens after the prefix are prefilled.
+
+The cache is used only when the system-only rendering is an exact token
+prefix of the full prompt. If prefilling or generating with the cache
+fails (e.g. a model whose cache type can't be reused this way), the cache
+is disabled and that call is retried with a full prefill. Greedy outputs
+are the same either way.
+
+Opt-in: serve.py / evaluate_lora.py --prefix-cache, or `prefix_cache: true`
+in the deacon provider's promptfoo config.
+
+Usage:
+    prefix = PrefixCache(model, tokenizer, SYSTEM_PROMPT)
+    inputs, out = prefix.generate([{"role": "user", "content": context}], max_new_tokens=100, do_sample=False)
+    generated = out[0][inputs["input_ids"].shape[1]:]
+"""
+
+import copy
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class PrefixCache:
+    """KV cache of the chat-templated system prompt for one model."""
+
+    def __init__(self, model, tokenizer, system_prompt: str):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.system_prompt = system_prompt
+        self.enabled = True
+        self._prefix_ids = None
+        self._past = None
+        self.hits = 0
+        self.misses = 0
+
+    def encode(self, messages: list):
+        """Tokenize system prompt + messages for generation."""
+        full_messages = [{"role": "system", "content": self.system_prompt}] + messages
+        prompt = self.tokenizer.apply_chat_template(
+            full_messages, tokenize=False, add_generation_prompt=True
+        )
+        return self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
+
+    def generate(self, messages: list, **generate_kwargs) -> tuple:
+        """model.generate() over system prompt + messages. Returns (inputs, output ids)."""
+        import torch
+
+        inputs = self.encode(messages)
+        with torch.no_grad():
+            past = self._past_for(inputs["input_ids"]) if self.enabled else None
+            if past is not None:
+                try:
+                    out = self.model.generate(**inputs, past_key_values=past, **generate_kwargs)
+                    self.hits += 1
+                    return inputs, out
+                except Exception as e:  # cache rejected by this model: fall back for good
+                    self._disable(e)
+            self.misses += 1
+            return inputs, self.model.generate(**inputs, **generate_kwargs)
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled,
+                "prefix_tokens": 0 if self._prefix_ids is None else self._prefix_ids.shape[1],
+                "hits": self.hits, "misses": self.misses}
+
+    def _past_for(self, input_ids):
+        """A copy of the prefix cache if input_ids start with the prefix, else None."""
+        import torch
+
+        try:
+            if self._past is None:
+                self._prefill()
+            n = self._prefix_ids.shape[1]
+            ids = input_ids[0]
+            if ids.shape[0] > n and torch.equal(ids[:n], self._prefix_ids[0]):
+                return copy.deepcopy(self._past)
+        except Exception as e:
+            self._disable(e)
+        return None
+
+    def _prefill(self) -> None:
+        """Run the model once over the system-only rendering."""
+        text = self.tokenizer.apply_chat_template(
+            [{"role": "system", "content": self.system_prompt}], tokenize=False
+        )
+        prefix_ids = self.tokenizer(text, return_tensors="pt").input_ids.to(self.model.device)
+        out = self.model(input_ids=prefix_ids, use_cache=True)
+        self._prefix_ids = prefix_ids
+        self._past = out.past_key_values
+        log.info("Cached system prompt prefix: %d tokens", prefix_ids.shape[1])
+
+    def _disable(self, error: Exception) -> None:
+        log.warning("Prefix cache disabled, using full prefill: %s", error)
+        self.enabled = False
+        self._past = None
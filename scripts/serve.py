@@ -10,9 +10,11 @@ Usage:
     python serve.py --checkpoint ./checkpoints/... --shadow        # observe only
     python serve.py --checkpoint ./checkpoints/... --once          # single cycle
     python serve.py --checkpoint ./checkpoints/... --interval 60   # fixed interval
+    python serve.py --checkpoint ./checkpoints/... --rig gastown --repeat-policy reuse  # no inference on repeated snapshots
 """
 
 import argparse
+import hashlib
 import json
 import logging
 import os
@@ -21,10 +23,10 @@ import shlex
 import subprocess
 import sys
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
-import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
-
+from prefix_cache import PrefixCache
 from snapshot_format import format_snapshot
 
 SYSTEM_PROMPT = """You are a Witness agent. You respond ONLY with JSON tool calls.
@@ -49,6 +51,9 @@ log = logging.getLogger("witness-shim")
 
 def load_model(checkpoint_path: str):
     """Load model and tokenizer from checkpoint."""
+    import torch
+    from transformers import AutoTokenizer, AutoModelForCausalLM
+
     log.info("Loading model from %s", checkpoint_path)
     tokenizer = AutoTokenizer.from_pretrained(checkpoint_path, trust_remote_code=True)
     if tokenizer.pad_token is None:
@@ -65,26 +70,30 @@ def load_model(checkpoint_path: str):
     return model, tokenizer
 
 
-def model_decide(model, tokenizer, context: str) -> dict:
-    """Run inference on patrol context, return parsed tool call dict."""
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user", "content": context},
-    ]
-
-    prompt = tokenizer.apply_chat_template(
-        messages, tokenize=False, add_generation_prompt=True
-    )
-    inputs = tokenizer(prompt, return_tensors="pt")
+def model_decide(model, tokenizer, context: str, prefix_cache: PrefixCache | None = None) -> dict:
+    """Run inference on patrol context, return parsed tool call dict.
 
+    With a prefix_cache, the system prompt's KV cache is reused and only the
+    context tokens are prefilled.
+    """
+    generate_kwargs = {"max_new_tokens": 100, "do_sample": False, "pad_token_id": tokenizer.pad_token_id}
     start = time.perf_counter()
-    with torch.no_grad():
-        out = model.generate(
-            **inputs,
-            max_new_tokens=100,
-            do_sample=False,
-            pad_token_id=tokenizer.pad_token_id,
+    if prefix_cache is not None:
+        inputs, out = prefix_cache.generate([{"role": "user", "content": context}], **generate_kwargs)
+    else:
+        import torch
+
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": context},
+        ]
+
+        prompt = tokenizer.apply_chat_template(
+            messages, tokenize=False, add_generation_prompt=True
         )
+        inputs = tokenizer(prompt, return_tensors="pt")
+        with torch.no_grad():
+            out = model.generate(**inputs, **generate_kwargs)
     latency_ms = (time.perf_counter() - start) * 1000
 
     generated = tokenizer.decode(
@@ -187,48 +196,85 @@ def save_state(state: dict, decision: dict) -> None:
 # Rich context gathering (10 commands → structured snapshot)
 # ---------------------------------------------------------------------------
 
-def gather_patrol_context_rich(rig: str) -> str:
-    """Gather rich patrol context via 10 gt CLI commands."""
-    timeout = 10
+# All context commands share one deadline; they run concurrently, so a
+# cycle takes about as long as its slowest command.
+CONTEXT_DEADLINE = 10
+MAX_MAIL_READS = 3
+CONTEXT_WORKERS = 7 + MAX_MAIL_READS
 
-    # 1. Polecat status
-    polecats = run_cmd(f"gt polecat list {shlex.quote(rig)}", timeout=timeout)
 
-    # 2. Inbox summary
-    inbox = run_cmd("gt mail inbox --unread", timeout=timeout)
-
-    # 3. Read unread messages (max 3)
-    inbox_detail = ""
-    if inbox and "[error]" not in inbox:
-        # Extract mail IDs from inbox output (lines with IDs like hq-xxx)
-        mail_ids = re.findall(r'\b([a-z]+-[a-z0-9]{4,})\b', inbox)
-        for mid in mail_ids[:3]:
-            msg = run_cmd(f"gt mail read {shlex.quote(mid)}", timeout=timeout)
+def _timed_cmd(cmd: str, timeout: float) -> tuple[str, float]:
+    """run_cmd plus its wall time in milliseconds."""
+    start = time.perf_counter()
+    out = run_cmd(cmd, timeout=timeout)
+    return out, (time.perf_counter() - start) * 1000
+
+
+def gather_patrol_context_rich(rig: str, deadline: float = CONTEXT_DEADLINE) -> str:
+    """Gather rich patrol context via 10 gt CLI commands, run concurrently."""
+    t0 = time.perf_counter()
+
+    def remaining() -> float:
+        return max(deadline - (time.perf_counter() - t0), 0)
+
+    commands = {
+        # 1. Polecat status
+        "polecats": f"gt polecat list {shlex.quote(rig)}",
+        # 2. Inbox summary
+        "inbox": "gt mail inbox --unread",
+        # 4. Cleanup wisps
+        "cleanup": "bd list --label=cleanup --status=open",
+        # 5. Refinery status
+        "refinery": f"gt session status {shlex.quote(rig)}/refinery",
+        # 6. Deacon health
+        "deacon": "tmux has-session -t hq-deacon 2>/dev/null && echo alive || echo dead",
+        # 7. Active beads
+        "active_beads": "bd list --status=in_progress",
+        # 8. Timer gates
+        "timer_gates": "bd gate check --type=timer",
+    }
+    timings: dict[str, float] = {}
+
+    with ThreadPoolExecutor(max_workers=CONTEXT_WORKERS) as pool:
+        futures = {name: pool.submit(_timed_cmd, cmd, remaining()) for name, cmd in commands.items()}
+
+        # 3. Read unread messages (max 3) as soon as the inbox is in
+        inbox, timings["inbox"] = futures.pop("inbox").result()
+        mail_futures = {}
+        if inbox and "[error]" not in inbox and remaining() > 0:
+            # Extract mail IDs from inbox output (lines with IDs like hq-xxx)
+            mail_ids = re.findall(r'\b([a-z]+-[a-z0-9]{4,})\b', inbox)
+            mail_futures = {
+                mid: pool.submit(_timed_cmd, f"gt mail read {shlex.quote(mid)}", remaining())
+                for mid in mail_ids[:MAX_MAIL_READS]
+            }
+
+        results = {}
+        for name, future in futures.items():
+            results[name], timings[name] = future.result()
+        inbox_detail = ""
+        for mid, future in mail_futures.items():
+            msg, timings[f"mail_read {mid}"] = future.result()
             if msg and "[error]" not in msg:
                 inbox_detail += f"\n--- {mid} ---\n{msg[:200]}"
 
+    slowest = max(timings, key=timings.get)
+    log.info("Context gathered in %.0fms (slowest: %s %.0fms)",
+             (time.perf_counter() - t0) * 1000, slowest, timings[slowest])
+    log.debug("Context command latency (ms): %s",
+              ", ".join(f"{name}={ms:.0f}" for name, ms in timings.items()))
+
+    polecats = results["polecats"]
+    cleanup = results["cleanup"]
+    refinery = results["refinery"]
+    deacon = results["deacon"]
+    active_beads = results["active_beads"]
+    timer_gates = results["timer_gates"]
+
     inbox_full = inbox or "No unread messages."
     if inbox_detail:
         inbox_full += inbox_detail
 
-    # 4. Cleanup wisps
-    cleanup = run_cmd("bd list --label=cleanup --status=open", timeout=timeout)
-
-    # 5. Refinery status
-    refinery = run_cmd(
-        f"gt session status {shlex.quote(rig)}/refinery", timeout=timeout
-    )
-
-    # 6. Deacon health
-    deacon = run_cmd("tmux has-session -t hq-deacon 2>/dev/null && echo alive || echo dead",
-                     timeout=timeout)
-
-    # 7. Active beads
-    active_beads = run_cmd("bd list --status=in_progress", timeout=timeout)
-
-    # 8. Timer gates
-    timer_gates = run_cmd("bd gate check --type=timer", timeout=timeout)
-
     # Build infrastructure summary
     deacon_status = "alive" if deacon and "alive" in deacon else "dead"
     refinery_status = refinery if refinery and "[error]" not in refinery else "unknown"
@@ -391,20 +437,81 @@ def _build_command(tool: str, args: dict) -> str | None:
     return None
 
 
+# ---------------------------------------------------------------------------
+# Decision cache (repeated snapshots)
+# ---------------------------------------------------------------------------
+
+# What to do when a snapshot repeats a cached one (ignoring volatile fields):
+#   infer  run the model anyway (only hit rates are logged)
+#   reuse  reuse the cached decision without inference
+#   skip   skip inference and take no action this cycle
+REPEAT_POLICIES = ("infer", "reuse", "skip")
+DECISION_CACHE_SIZE = 64
+
+# Fields that change every cycle without changing what the model should do:
+# the State counters and absolute clock times. Relative ages ("3 minutes
+# ago") stay, so a stalled polecat changes the key as its age grows.
+_VOLATILE_PATTERNS = [
+    (re.compile(r"\b(patrol_count|idle_cycles): \d+"), r"\1: #"),
+    (re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?"), "<time>"),
+    # Bare clock times only as HH:MM:SS, HH:MM am/pm or "at HH:MM", never path:line:col.
+    (re.compile(r"(?<![\w.:/-])(?:\d{1,2}:\d{2}:\d{2}|\d{1,2}:\d{2} ?[AaPp][Mm]\b)(?![\w:])"), "<time>"),
+    (re.compile(r"\b(at|since|until) \d{1,2}:\d{2}\b(?!:)"), r"\1 <time>"),
+]
+
+
+def snapshot_key(context: str) -> str:
+    """Hash of a snapshot with counters and timestamps masked out."""
+    for pattern, repl in _VOLATILE_PATTERNS:
+        context = pattern.sub(repl, context)
+    return hashlib.sha256(context.encode("utf-8")).hexdigest()[:16]
+
+
+class DecisionCache:
+    """LRU map from normalized snapshot hash to the model's decision."""
+
+    def __init__(self, max_size: int = DECISION_CACHE_SIZE):
+        self.max_size = max_size
+        self._decisions: OrderedDict[str, dict] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> dict | None:
+        decision = self._decisions.get(key)
+        if decision is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._decisions.move_to_end(key)
+        return decision
+
+    def put(self, key: str, decision: dict) -> None:
+        self._decisions[key] = decision
+        self._decisions.move_to_end(key)
+        while len(self._decisions) > self.max_size:
+            self._decisions.popitem(last=False)
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
 # ---------------------------------------------------------------------------
 # Main patrol loop
 # ---------------------------------------------------------------------------
 
 def patrol_loop(model, tokenizer, *, shadow: bool = False,
                 once: bool = False, fixed_interval: int | None = None,
-                rig: str | None = None):
+                rig: str | None = None, repeat_policy: str = "infer",
+                prefix_cache: PrefixCache | None = None):
     """Run the patrol loop with exponential backoff."""
     interval = fixed_interval or BACKOFF_MIN
     cycle = 0
     use_rich = rig is not None
+    cache = DecisionCache()
 
-    log.info("Starting patrol loop (shadow=%s, once=%s, interval=%s, rig=%s, rich=%s)",
-             shadow, once, fixed_interval or "adaptive", rig, use_rich)
+    log.info("Starting patrol loop (shadow=%s, once=%s, interval=%s, rig=%s, rich=%s, repeat=%s)",
+             shadow, once, fixed_interval or "adaptive", rig, use_rich, repeat_policy)
 
     try:
         while True:
@@ -419,11 +526,21 @@ def patrol_loop(model, tokenizer, *, shadow: bool = False,
             ctx_summary = context[:120].replace("\n", " ")
             log.info("[%s] cycle=%d context=%s", ts, cycle, ctx_summary)
 
-            # 2. Inference
-            decision = model_decide(model, tokenizer, context)
+            # 2. Inference (unless the snapshot repeats a cached one)
+            key = snapshot_key(context)
+            cached = cache.get(key)
+            if cached is not None and repeat_policy == "reuse":
+                decision = {**cached, "_latency_ms": 0, "_cached": True}
+            elif cached is not None and repeat_policy == "skip":
+                decision = {"tool": "none", "args": {}, "_latency_ms": 0, "_skipped": True}
+            else:
+                decision = model_decide(model, tokenizer, context, prefix_cache)
+                cache.put(key, decision)
             tool = decision.get("tool", "none")
             latency = decision.get("_latency_ms", 0)
-            log.info("[%s] decision: tool=%s latency=%.0fms", ts, tool, latency)
+            log.info("[%s] decision: tool=%s latency=%.0fms snapshot=%s (cache hit rate %.0f%%, %d/%d)",
+                     ts, tool, latency, "repeat" if cached is not None else "new",
+                     cache.hit_rate() * 100, cache.hits, cache.hits + cache.misses)
 
             # 3. Execute
             result = execute_tool(decision, shadow=shadow)
@@ -472,6 +589,11 @@ def main():
                         help="Run a single patrol cycle then exit")
     parser.add_argument("--interval", type=int, default=None,
                         help="Fixed sleep interval in seconds (disables adaptive backoff)")
+    parser.add_argument("--repeat-policy", choices=REPEAT_POLICIES, default="infer",
+                        help="On a snapshot that repeats a previous one (counters and timestamps "
+                             "ignored): infer anyway, reuse the cached decision, or skip the cycle")
+    parser.add_argument("--prefix-cache", action="store_true",
+                        help="Reuse the system prompt's KV cache across cycles instead of prefilling the full prompt")
     parser.add_argument("--verbose", "-v", action="store_true",
                         help="Enable debug logging")
     args = parser.parse_args()
@@ -483,8 +605,10 @@ def main():
     )
 
     model, tokenizer = load_model(args.checkpoint)
+    prefix_cache = PrefixCache(model, tokenizer, SYSTEM_PROMPT) if args.prefix_cache else None
     patrol_loop(model, tokenizer, shadow=args.shadow,
-                once=args.once, fixed_interval=args.interval, rig=args.rig)
+                once=args.once, fixed_interval=args.interval, rig=args.rig,
+                repeat_policy=args.repeat_policy, prefix_cache=prefix_cache)
 
 
 if __name__ == "__main__":
@@ -1,6 +1,10 @@
 #!/bin/bash
 # Sync training data to a remote GPU machine.
 # Usage: ./scripts/sync_data.sh user@gpu-host
+#        COMPACT=1 ./scripts/sync_data.sh user@gpu-host
+#
+# With COMPACT=1, only *.compact.jsonl datasets (system prompts stored once in
+# a sidecar table) are transferred and expanded to plain sharegpt on the remote.
 
 set -euo pipefail
 
@@ -15,8 +19,16 @@ ssh "$REMOTE" "mkdir -p ${REMOTE_DIR}/output/datasets ${REMOTE_DIR}/configs/role
 # Sync configs
 rsync -avz configs/ "${REMOTE}:${REMOTE_DIR}/configs/"
 
-# Sync all datasets (per-role + combined), excluding Axolotl cache
-rsync -avz --exclude='prepared*' output/datasets/ "${REMOTE}:${REMOTE_DIR}/output/datasets/"
+if [ "${COMPACT:-0}" = "1" ]; then
+    # Sync compact datasets + prompt tables and the expander, then expand remotely
+    rsync -avz --exclude='prepared*' --include='*/' --include='*.compact.jsonl' --include='*.compact.prompts.json' \
+        --exclude='*' output/datasets/ "${REMOTE}:${REMOTE_DIR}/output/datasets/"
+    rsync -avz --exclude='__pycache__' data/ "${REMOTE}:${REMOTE_DIR}/data/"
+    ssh "$REMOTE" "cd ${REMOTE_DIR} && for f in \$(find output/datasets -name '*.compact.jsonl'); do python3 -m data.transform.prompt_table expand \"\$f\"; done"
+else
+    # Sync all datasets (per-role + combined), excluding Axolotl cache
+    rsync -avz --exclude='prepared*' output/datasets/ "${REMOTE}:${REMOTE_DIR}/output/datasets/"
+fi
 
 # Sync eval framework and optuna rig
 rsync -avz eval/ "${REMOTE}:${REMOTE_DIR}/eval/"
@@ -0,0 +1,74 @@
+"""Tests for prefix_cache: cached and uncached greedy generation must agree."""
+
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+from prefix_cache import PrefixCache
+
+SYSTEM_PROMPT = "You are the witness. Reply with one JSON tool call."
+
+
+class ByteTokenizer:
+    """Byte-level tokenizer with a chatml-style template, enough for generate()."""
+
+    eos_token_id = 0
+    pad_token_id = 0
+
+    def apply_chat_template(self, messages, tokenize=False, add_generation_prompt=False):
+        text = "".join(f"<{m['role']}>{m['content']}\n" for m in messages)
+        return text + "<assistant>" if add_generation_prompt else text
+
+    def __call__(self, text, return_tensors="pt"):
+        ids = torch.tensor([[b % 255 + 1 for b in text.encode("utf-8")]])
+        return transformers.BatchEncoding({"input_ids": ids, "attention_mask": torch.ones_like(ids)})
+
+
+@pytest.fixture(scope="module")
+def model():
+    torch.manual_seed(0)
+    config = transformers.LlamaConfig(
+        vocab_size=256, hidden_size=32, intermediate_size=64, num_hidden_layers=2,
+        num_attention_heads=4, num_key_value_heads=2, max_position_embeddings=512,
+    )
+    return transformers.LlamaForCausalLM(config).eval()
+
+
+GENERATE = dict(max_new_tokens=12, do_sample=False, pad_token_id=0)
+CONTEXTS = ["polecat alpha stalled 12m", "inbox: 2 unread", "all clear"]
+
+
+def _uncached(model, tokenizer, context):
+    inputs = PrefixCache(model, tokenizer, SYSTEM_PROMPT).encode([{"role": "user", "content": context}])
+    with torch.no_grad():
+        return model.generate(**inputs, **GENERATE)
+
+
+def test_greedy_outputs_match_uncached(model):
+    tokenizer = ByteTokenizer()
+    prefix = PrefixCache(model, tokenizer, SYSTEM_PROMPT)
+    for context in CONTEXTS:
+        _, cached = prefix.generate([{"role": "user", "content": context}], **GENERATE)
+        assert torch.equal(cached, _uncached(model, tokenizer, context))
+    assert prefix.stats() == {"enabled": True, "prefix_tokens": prefix._prefix_ids.shape[1],
+                              "hits": len(CONTEXTS), "misses": 0}
+
+
+def test_generate_failure_disables_cache_and_retries(model, monkeypatch, caplog):
+    tokenizer = ByteTokenizer()
+    prefix = PrefixCache(model, tokenizer, SYSTEM_PROMPT)
+    generate = model.generate
+
+    def reject_cache(*args, **kwargs):
+        if "past_key_values" in kwargs:
+            raise TypeError("unsupported cache")
+        return generate(*args, **kwargs)
+
+    monkeypatch.setattr(model, "generate", reject_cache)
+    for context in CONTEXTS[:2]:
+        _, out = prefix.generate([{"role": "user", "content": context}], **GENERATE)
+        assert torch.equal(out, _uncached(model, tokenizer, context))
+    assert not prefix.enabled
+    assert prefix.stats()["misses"] == 2
+    assert "Prefix cache disabled" in caplog.text
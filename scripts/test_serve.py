@@ -0,0 +1,163 @@
+"""Tests for serve.py's patrol context gathering and decision cache (no model needed)."""
+
+import threading
+import time
+
+import pytest
+
+import serve
+
+INBOX = "hq-abc1  from mayor: merge queue\nhq-def2  from deacon: restart\nhq-ghi3  ping\nhq-jkl4  old"
+
+
+class FakeShell:
+    """Stands in for run_cmd: fixed outputs and delays, honouring timeouts."""
+
+    def __init__(self, outputs=None, delays=None):
+        self.outputs = outputs or {}
+        self.delays = delays or {}
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, cmd, timeout=15):
+        with self.lock:
+            self.calls.append((cmd, timeout, time.perf_counter()))
+        delay = next((d for prefix, d in self.delays.items() if cmd.startswith(prefix)), 0)
+        time.sleep(min(delay, timeout))
+        if delay > timeout:
+            return "[error] command timed out"
+        return next((out for prefix, out in self.outputs.items() if cmd.startswith(prefix)), "")
+
+    def commands(self, prefix):
+        return [call for call in self.calls if call[0].startswith(prefix)]
+
+
+@pytest.fixture
+def shell(monkeypatch, tmp_path):
+    monkeypatch.setattr(serve, "STATE_FILE", str(tmp_path / "state.json"))
+
+    def install(**kwargs):
+        fake = FakeShell(**kwargs)
+        monkeypatch.setattr(serve, "run_cmd", fake)
+        return fake
+
+    return install
+
+
+def test_reads_first_unread_mails_after_inbox(shell):
+    fake = shell(
+        outputs={"gt mail inbox": INBOX, "gt mail read hq-abc1": "please merge gt-4tp",
+                 "gt polecat list": "furiosa  working"},
+        delays={"gt mail inbox": 0.05},
+    )
+    snapshot = serve.gather_patrol_context_rich("gastown", deadline=5)
+
+    reads = fake.commands("gt mail read")
+    assert [cmd for cmd, _, _ in reads] == [f"gt mail read hq-{mid}" for mid in ("abc1", "def2", "ghi3")]
+    inbox_done = fake.commands("gt mail inbox")[0][2] + 0.05
+    assert all(started >= inbox_done for _, _, started in reads)
+    assert "--- hq-abc1 ---\nplease merge gt-4tp" in snapshot
+    assert "hq-def2 ---" not in snapshot  # empty read output is left out
+    assert "furiosa  working" in snapshot
+
+
+def test_no_mail_reads_when_inbox_fails(shell):
+    fake = shell(outputs={"gt mail inbox": "[error] mail store locked"})
+    serve.gather_patrol_context_rich("gastown", deadline=5)
+    assert fake.commands("gt mail read") == []
+    assert len(fake.calls) == 7
+
+
+def test_commands_share_one_deadline(shell):
+    fake = shell(
+        outputs={"gt mail inbox": INBOX, "gt session status": "merging"},
+        delays={"gt mail inbox": 0.3, "bd gate check": 5, "gt mail read": 5, "gt polecat list": 0.2},
+    )
+    start = time.perf_counter()
+    snapshot = serve.gather_patrol_context_rich("gastown", deadline=0.6)
+    elapsed = time.perf_counter() - start
+
+    # Concurrent: bounded by the deadline, not the sum of the delays.
+    assert elapsed < 1.2
+    assert all(timeout <= 0.6 for _, timeout, _ in fake.calls)
+    # Mail reads only get what is left after the inbox.
+    assert all(timeout <= 0.31 for _, timeout, _ in fake.commands("gt mail read"))
+    assert "Refinery: merging" in snapshot
+    assert "Timer gates" not in snapshot
+
+
+SNAPSHOT = """## Polecats
+furiosa  working  gt-4tp  last activity 3 minutes ago
+nux      idle
+## Inbox
+2 unread, newest at 2026-10-18T09:14:02Z
+## State
+patrol_count: {count}, idle_cycles: {idle}, last_action: none
+"""
+
+
+def test_snapshot_key_ignores_counters_and_times():
+    a = serve.snapshot_key(SNAPSHOT.format(count=4, idle=1) + "hooked at 09:14, seen 09:14:02\n")
+    b = serve.snapshot_key(SNAPSHOT.format(count=5, idle=2).replace("09:14:02", "10:02:59")
+                           + "hooked at 10:02, seen 10:02:59\n")
+    assert a == b
+    assert len(a) == 16
+
+
+def test_snapshot_key_keeps_relative_ages():
+    base = SNAPSHOT.format(count=4, idle=1)
+    assert serve.snapshot_key(base.replace("3 minutes", "12 minutes")) != serve.snapshot_key(base)
+
+
+def test_snapshot_key_keeps_line_numbers():
+    base = SNAPSHOT.format(count=4, idle=1)
+    assert (serve.snapshot_key(base + "error in serve.py:12:34\n")
+            != serve.snapshot_key(base + "error in serve.py:12:35\n"))
+    assert serve.snapshot_key(base + "failed 1:02\n") != serve.snapshot_key(base + "failed 1:03\n")
+
+
+def test_snapshot_key_keeps_content():
+    base = SNAPSHOT.format(count=4, idle=1)
+    key = serve.snapshot_key(base)
+    assert serve.snapshot_key(base.replace("nux      idle", "nux      stuck")) != key
+    assert serve.snapshot_key(base.replace("2 unread", "3 unread")) != key
+    assert serve.snapshot_key(base.replace("last_action: none", "last_action: nudge")) != key
+
+
+def test_decision_cache_lru():
+    cache = serve.DecisionCache(max_size=2)
+    cache.put("a", {"tool": "nudge"})
+    cache.put("b", {"tool": "none"})
+    assert cache.get("a") == {"tool": "nudge"}  # a is now most recent
+    cache.put("c", {"tool": "escalate"})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"tool": "nudge"}
+    assert cache.get("c") == {"tool": "escalate"}
+    assert (cache.hits, cache.misses) == (3, 1)
+    assert cache.hit_rate() == 0.75
+    assert serve.DecisionCache().hit_rate() == 0.0
+
+
+@pytest.mark.parametrize("policy, inferences, tools", [
+    ("infer", 3, ["nudge", "nudge", "nudge"]),
+    ("reuse", 1, ["nudge", "nudge", "nudge"]),
+    ("skip", 1, ["nudge", "none", "none"]),
+])
+def test_repeat_policy(monkeypatch, policy, inferences, tools):
+    contexts = iter(SNAPSHOT.format(count=n, idle=0) for n in range(3))
+    decided, executed = [], []
+    monkeypatch.setattr(serve, "gather_patrol_context", lambda: next(contexts))
+    monkeypatch.setattr(serve, "model_decide",
+                        lambda *args: decided.append(1) or {"tool": "nudge", "args": {"target": "nux"}})
+    monkeypatch.setattr(serve, "execute_tool", lambda decision, shadow: executed.append(decision["tool"]) or "")
+
+    cycles = iter(range(2))
+
+    def sleep(seconds):
+        if next(cycles, None) is None:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(serve.time, "sleep", sleep)
+    serve.patrol_loop(None, None, shadow=True, repeat_policy=policy)
+    assert len(decided) == inferences
+    assert executed == tools
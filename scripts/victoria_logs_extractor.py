@@ -23,6 +23,10 @@ from typing import List, Optional
 
 from data.extract.sessions import extract_session, discover_sessions
 from data.transform.chat_formatter import format_sharegpt, write_jsonl
+from data.transform.token_counter import TokenCounter, make_counter
+
+# Sessions longer than this are skipped as unusable.
+MAX_SESSION_TOKENS = 50000
 
 
 def setup_logging(verbose: bool = False) -> None:
@@ -34,23 +38,24 @@ def setup_logging(verbose: bool = False) -> None:
     )
 
 
-def filter_quality_sessions(sessions: List) -> List:
+def filter_quality_sessions(sessions: List, token_counter: Optional[TokenCounter] = None) -> List:
     """
     Filter sessions for quality based on:
     - Completed tasks (non-empty turns)
-    - Reasonable token counts (< 50k tokens)
+    - Reasonable token counts (< 50k tokens; exact if token_counter is given)
     - No obvious error loops
     """
+    if token_counter is None:
+        token_counter = make_counter(None)
+
     filtered = []
     for session in sessions:
         if not session.turns:
             continue
             
-        # Estimate token count (rough approximation)
-        total_chars = sum(len(turn.content) for turn in session.turns)
-        estimated_tokens = total_chars // 4  # Rough estimate: 4 chars per token
+        total_tokens = sum(token_counter.count_many([turn.content for turn in session.turns]))
         
-        if estimated_tokens > 50000:  # Skip very long sessions
+        if total_tokens > MAX_SESSION_TOKENS:  # Skip very long sessions
             continue
             
         # Skip sessions that look like error loops (repetitive content)
@@ -114,6 +119,12 @@ def main():
         default=1000,
         help="Maximum number of sessions to process"
     )
+    parser.add_argument(
+        "--tokenizer",
+        type=str,
+        default=None,
+        help="HuggingFace tokenizer for exact token budgets (default: chars/4 estimate)"
+    )
     parser.add_argument(
         "--verbose",
         action="store_true",
@@ -162,7 +173,9 @@ def main():
     
     # Filter for quality
     logger.info("Filtering sessions for quality...")
-    quality_sessions = filter_quality_sessions(extracted_sessions)
+    token_counter = make_counter(args.tokenizer)
+    quality_sessions = filter_quality_sessions(extracted_sessions, token_counter)
+    token_counter.save()
     logger.info(f"Filtered down to {len(quality_sessions)} quality sessions")
     
     # Format and write output